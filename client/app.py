@@ -42,7 +42,11 @@ def graph_mode(client: MasterApiClient, args):
         )
         print('Created graph "{}", revision {}.'.format(name, rev))
     elif args.action == 'info':
-        if args.list_all:
+        if args.list_all and args.cursor is not None:
+            graphs, next_cursor = client.list_graphs_page(args.name, limit=args.limit, cursor=args.cursor)
+            print(json.dumps({'items': [_.to_json() for _ in graphs], 'next_cursor': next_cursor},
+                             indent=2, ensure_ascii=False))
+        elif args.list_all:
             print(json.dumps([_.to_json() for _ in client.list_graphs(args.name, args.revision)],
                              indent=2, ensure_ascii=False))
         else:
@@ -68,8 +72,23 @@ def instance_mode(client: MasterApiClient, args):
             logging.exception('Unsupported target state: {}'.format(args.target_state))
             exit(1)
         print('State for instance {} changed from {} to {}.'.format(args.id, answer[0].name, answer[1].name))
+    elif args.action == 'list':
+        filters = dict(state=args.state, graph_name=args.name, revision=args.revision,
+                       started_after=args.started_after, started_before=args.started_before)
+        if args.cursor is not None:
+            instances, next_cursor = client.list_instances_page(limit=args.limit or 100, cursor=args.cursor,
+                                                                with_info=args.with_info, **filters)
+            print(json.dumps({'items': [_.to_json() for _ in instances], 'next_cursor': next_cursor},
+                             indent=2, ensure_ascii=False))
+        else:
+            instances = client.list_instances(offset=args.offset, limit=args.limit, with_info=args.with_info,
+                                              **filters)
+            print(json.dumps([_.to_json() for _ in instances], indent=2, ensure_ascii=False))
     elif args.action == 'logs':
-        print(client.instance_logs(args.id, args.task_name, args.host, args.log_type), end='')
+        for chunk in client.stream_instance_logs(args.id, args.task_name, args.host, args.log_type, offset=args.offset,
+                                                 limit=args.limit, tail_lines=args.tail, follow=args.follow):
+            sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
     else:
         logging.error('Not supported action for instance mode: %s', args.action)
         exit(1)
@@ -117,6 +136,10 @@ if __name__ == '__main__':
                                    help='Sets graph revision to gather info about. If not set, last revision used')
     graph_info_action.add_argument('--list-all', default=False, action='store_const', const=True,
                                    help='If set, then will gather info about all graph revisions')
+    graph_info_action.add_argument('--cursor', default=None,
+                                   help='If set with --list-all, one page is listed starting from this cursor, '
+                                        'pass empty string for the first page')
+    graph_info_action.add_argument('--limit', default=100, type=int, help='Page size for --cursor')
 
     graph_launch_action = graph_sub.add_parser('launch', help='Launch graph', formatter_class=fmt)
     graph_launch_action.add_argument('-n', '--name', required=True, help='Graph name to get info about')
@@ -131,6 +154,23 @@ if __name__ == '__main__':
     instance_info_action.add_argument('--list-all', default=False, action='store_const', const=True,
                                       help='If set, then will gather info about all graph instances')
 
+    instance_list_action = instance_sub.add_parser('list', help='List graph instances', formatter_class=fmt)
+    instance_list_action.add_argument('--state', default=None, help='List only instances in this state')
+    instance_list_action.add_argument('-n', '--name', default=None, help='List only instances of this graph')
+    instance_list_action.add_argument('-r', '--revision', default=None, type=int,
+                                      help='List only instances of this graph revision')
+    instance_list_action.add_argument('--started-after', default=None, type=float,
+                                      help='List only instances started at or after this unixtime')
+    instance_list_action.add_argument('--started-before', default=None, type=float,
+                                      help='List only instances started before this unixtime')
+    instance_list_action.add_argument('--offset', default=0, type=int, help='Number of instances to skip')
+    instance_list_action.add_argument('--cursor', default=None,
+                                      help='If set, one page is listed starting from this cursor instead of offset, '
+                                           'pass empty string for the first page')
+    instance_list_action.add_argument('--limit', default=None, type=int, help='Max number of instances to list')
+    instance_list_action.add_argument('--with-info', default=False, action='store_const', const=True,
+                                      help='If set, then full info about instances is listed')
+
     instance_ctrl_action = instance_sub.add_parser('ctrl', help='Switch graph instance to state', formatter_class=fmt)
     instance_ctrl_action.add_argument('-i', '--id', required=True, help='Graph instance id to control')
     instance_ctrl_action.add_argument('-t', '--target-state', default='start', choices=('start', 'stop'),
@@ -141,6 +181,12 @@ if __name__ == '__main__':
     instance_ctrl_action.add_argument('--task-name', required=True, help='Task name to get logs for')
     instance_ctrl_action.add_argument('--host', required=True, help='Host to get logs from')
     instance_ctrl_action.add_argument('--log-type', default='out', choices=('out', 'err'), help='Log type')
+    instance_ctrl_action.add_argument('--offset', type=int, default=0,
+                                      help='Byte offset to read log from, negative one is counted from the end')
+    instance_ctrl_action.add_argument('--limit', type=int, help='Max number of bytes to read')
+    instance_ctrl_action.add_argument('--tail', type=int, help='Read only this number of last lines')
+    instance_ctrl_action.add_argument('-f', '--follow', action='store_true', default=False,
+                                      help='Keep reading appended data until the task is finished')
     args = parser.parse_args()
     if args.mode is None:
         parser.print_help()
@@ -88,10 +88,19 @@ class CommonApi(metaclass=abc.ABCMeta):
         """Returns iterable collection of tuples: [(method, url, handler_name), ...]"""
         pass
 
+    @property
+    def raw_routes(self) -> Iterable[Tuple[str, str, str]]:
+        """Returns iterable collection of tuples: [(method, url, handler_name), ...], where handler is a coroutine
+        method of api itself, which gets aiohttp request and returns response without json wrapping.
+        """
+        return []
+
     def _fill_router(self):
         router = self.web_app.router
         for method, url, handler in self.routes:
             router.add_route(method, url, self.to(handler))
+        for method, url, handler in self.raw_routes:
+            router.add_route(method, url, getattr(self, handler))
 
     async def _wrap(self, func, request):
         try:
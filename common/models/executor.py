@@ -2,7 +2,42 @@ from util.config import Config, ConfigField
 from util.symver import SymVer
 
 
+# Size of compressed segment is read from gzip trailer, which keeps it modulo 4 GiB
+MAX_COMPRESSED_SEGMENT_SIZE = (1 << 32) - 1
+
+
+class LogPolicy(Config):
+    # Log is split into segments of segment_size bytes, 0 - log is kept in a single file
+    segment_size = ConfigField(type=int, required=True, default=0)
+    # Finished segments are compressed with gzip. Every segment is finished, when task ends. Requires segments
+    compress = ConfigField(type=bool, required=True, default=False)
+    # Max size of log in bytes (before compression), 0 - not limited. When log grows bigger, oldest segments are
+    # dropped, except the ones holding the first head_size bytes of log. Requires segments
+    max_size = ConfigField(type=int, required=True, default=0)
+    head_size = ConfigField(type=int, required=True, default=0)
+
+    def verify(self):
+        super().verify()
+        assert self.segment_size >= 0, '{}: segment_size should not be negative'.format(self.path_to_node)
+        assert self.max_size >= 0, '{}: max_size should not be negative'.format(self.path_to_node)
+        assert not self.max_size or self.segment_size, \
+            '{}: segment_size should be set, if max_size is set'.format(self.path_to_node)
+        assert not self.compress or 0 < self.segment_size <= MAX_COMPRESSED_SEGMENT_SIZE, \
+            '{}: segment_size should be set and less than 4 GiB, if compress is set'.format(self.path_to_node)
+        assert 0 <= self.head_size <= self.max_size, \
+            '{}: head_size should not be negative or greater than max_size'.format(self.path_to_node)
+
+
 class ExecutorInfo(Config):
     name = ConfigField(type=str, required=True, default='shell')
     min_version = SymVer()
     config = ConfigField(type=dict, required=True, default={})
+    # Applied to stdout and stderr logs of task separately
+    log_policy = LogPolicy()
+
+    def verify(self):
+        super().verify()
+        # output of shell executor in direct capture mode is written to log files by the task itself,
+        # so it is split into segments only when task ends and its size can not be limited while it runs
+        assert not self.log_policy.max_size or self.config.get('capture_mode') != 'direct', \
+            '{}: log_policy.max_size can not be used with direct capture_mode'.format(self.path_to_node)
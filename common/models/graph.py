@@ -1,11 +1,12 @@
 from itertools import chain
 from collections import Counter, defaultdict
+from numbers import Real
 from typing import Iterable, Tuple, Dict, List, Optional
 
 from common.models.task import TaskStruct
 from common.models.state import GraphInstanceState, TaskState
-from util.config import Config, ConfigField, create_dict_field_type, create_list_field_type, StrListConfigField, \
-    DateTimeField
+from util.config import Config, BaseConfig, ConfigField, create_dict_field_type, create_list_field_type, \
+    StrListConfigField, DateTimeField
 from util.dependency_loops import detect_loop
 
 
@@ -45,6 +46,8 @@ class ExtendedTaskStruct(Config):
     task_name = ConfigField(type=str, required=True, default=None)
     task_struct = TaskStruct()
     hosts = StrListConfigField()
+    # Expected task duration in seconds (int or float). If set, state of running task is not polled before it has passed
+    expected_duration = ConfigField(type=Real, required=False, default=None)
 
 
 class ExtendedTaskList(create_list_field_type(ExtendedTaskStruct)):
@@ -148,6 +151,13 @@ class GraphInstanceExecutionInfo(Config):
                                                                      parent_key=host
                                                                  ))
 
+    def header_to_json(self) -> dict:
+        """Serializes all fields except per_task_execution_info"""
+        return {
+            k: getattr(self, k).to_json() if issubclass(field.type, BaseConfig) else getattr(self, k)
+            for k, field in self._fields.items() if k != 'per_task_execution_info'
+        }
+
     def finish_execution(self, is_failed: bool = False, is_initiated_by_user: bool = False, fail_msg: str = None):
         self.finish_time.set_to_now()
         self.fail_msg = fail_msg
@@ -161,3 +171,14 @@ class GraphInstanceInfo(Config):
     instance_id = ConfigField(type=str, required=True, default=None)
     structure = GraphStruct()
     exec_stats = GraphInstanceExecutionInfo()
+
+    def header_to_json(self) -> dict:
+        """Serializes instance without structure and per task execution info"""
+        return {'instance_id': self.instance_id, 'exec_stats': self.exec_stats.header_to_json()}
+
+    @staticmethod
+    def join_json_parts(header: dict, structure: dict, per_task_execution_info: 'Dict[str, dict]') -> dict:
+        """Builds json of whole instance from parts produced by header_to_json"""
+        result = dict(header, structure=structure)
+        result['exec_stats'] = dict(header['exec_stats'], per_task_execution_info=per_task_execution_info)
+        return result
@@ -67,6 +67,19 @@ class StateMachine(BaseConfig):
     def is_failed(self) -> bool:
         return self.name in self.failed_states
 
+    def can_reach(self, new_state: str) -> bool:
+        """:returns true, if new_state can be reached from current one by a chain of allowed state changes"""
+        reached, front = set(), [self._state]
+        while front:
+            state = front.pop()
+            for next_state in self.links[state]:
+                if next_state == new_state:
+                    return True
+                if next_state not in reached:
+                    reached.add(next_state)
+                    front.append(next_state)
+        return False
+
     @classmethod
     def aggregate_states(cls, states: 'Set[str]'):
         for state in cls.states_aggregation_ordering:
@@ -86,6 +99,7 @@ class StateMachine(BaseConfig):
 
 class TaskState(StateMachine):
     idle = 'idle'
+    queued = 'queued'
     preparing = 'preparing'
     prepared = 'prepared'
     running = 'running'
@@ -95,7 +109,8 @@ class TaskState(StateMachine):
     prepfailed = 'prepfailed'
 
     links = {
-        idle: {preparing, stopped},
+        idle: {queued, preparing, stopped},
+        queued: {preparing, stopped},
         preparing: {prepfailed, prepared, stopped},
         prepared: {running, stopped},
         running: {finished, failed, stopped},
@@ -106,7 +121,7 @@ class TaskState(StateMachine):
     }
 
     states_aggregation_ordering = (
-        stopped, prepfailed, failed, running, prepared, preparing, idle, finished
+        stopped, prepfailed, failed, running, prepared, preparing, queued, idle, finished
     )
 
     failed_states = {stopped, prepfailed, failed}
@@ -1,9 +1,9 @@
-from typing import Optional
+from typing import List, Optional
 
 from common.models.executor import ExecutorInfo
 from common.models.resource import ResourceInfoList
 from common.models.state import TaskState
-from util.config import Config, ConfigField, BaseConfig, IncorrectFieldType, DateTimeField
+from util.config import Config, ConfigField, BaseConfig, IncorrectFieldType, DateTimeField, create_list_field_type
 
 
 class TaskReturnCode(BaseConfig):
@@ -35,6 +35,19 @@ class TaskReturnCode(BaseConfig):
                                                                          self._retcode.__class__.__name__)
 
 
+class ResourcePrepInfo(Config):
+    name = ConfigField(type=str, required=True, default=None)
+    # One of 'prepared', 'failed' and 'cancelled' (it was not started or was abandoned after failure of another
+    # resource or stop of task)
+    status = ConfigField(type=str, required=True, default=None)
+    # Seconds spent on preparation of resource, not set for cancelled ones
+    duration = ConfigField(type=float, required=False, default=None)
+    error = ConfigField(type=str, required=False, default=None)
+
+
+ResourcePrepInfoList = create_list_field_type(ResourcePrepInfo)
+
+
 class TaskExecutionInfo(Config):
     state = TaskState()
     retcode = TaskReturnCode()
@@ -42,20 +55,27 @@ class TaskExecutionInfo(Config):
     prep_start_time = DateTimeField()
     prep_finish_time = DateTimeField()
     prep_msg = ConfigField(type=str, required=False, default=None)
+    # Preparation results of task resources, in order of task structure
+    resources_prep = ResourcePrepInfoList()
 
     start_time = DateTimeField()
     finish_time = DateTimeField()
 
+    def enqueue(self):
+        self.state.change_state(TaskState.queued)
+
     def start_preparation(self):
         self.state.change_state(TaskState.preparing)
         self.prep_start_time.set_to_now()
 
-    def finish_preparation(self, success: bool, prep_msg: str = 'OK', is_initiated_by_user: bool = False):
+    def finish_preparation(self, success: bool, prep_msg: str = 'OK', is_initiated_by_user: bool = False,
+                           resources_prep: 'List[dict]' = None):
         new_status = TaskState.prepared if success else TaskState.prepfailed
         if is_initiated_by_user:
             new_status = TaskState.stopped
         self.state.change_state(new_status)
         self.prep_msg = prep_msg
+        self.resources_prep.from_json(resources_prep)
         self.prep_finish_time.set_to_now()
 
     def start_execution(self):
@@ -74,9 +94,13 @@ class TaskExecutionInfo(Config):
 class TaskStruct(Config):
     resources = ResourceInfoList()
     executor = ExecutorInfo()
+    # Tasks with higher priority are started first, when worker runs them in priority order and has no free slots
+    priority = ConfigField(type=int, required=True, default=0)
 
 
 class TaskInfo(Config):
     task_id = ConfigField(type=str, required=False, default=None)
+    # If set, worker pushes task state changes to this url
+    notify_url = ConfigField(type=str, required=False, default=None)
     structure = TaskStruct()
     exec_stats = TaskExecutionInfo()
@@ -0,0 +1,176 @@
+import abc
+import json
+import logging
+import os
+import shutil
+import time
+from collections import defaultdict
+from threading import Event, Lock, Thread
+from typing import Iterable, List, NamedTuple, Optional
+
+from util.config import Config, ConfigField
+
+
+class RetentionConfig(Config):
+    # Records are removed only if retention is enabled
+    enabled = ConfigField(type=bool, required=True, default=False)
+    # Seconds between retention runs
+    interval = ConfigField(type=float, required=True, default=3600.0)
+    # Finished records are removed max_age seconds after they have finished, failed and stopped ones -
+    # failed_max_age seconds after (max_age, if it is not set). Age is not limited, if it is not set
+    max_age = ConfigField(type=float, required=False, default=None)
+    failed_max_age = ConfigField(type=float, required=False, default=None)
+    # Only max_count most recently finished records are kept: per graph on master and in total on worker
+    max_count = ConfigField(type=int, required=False, default=None)
+    # If set, json of every removed record is appended to a daily file in this dir before removal
+    archive_dir = ConfigField(type=str, required=False, default=None)
+    # If set, backend storage is compacted after every run, which has removed something
+    compact = ConfigField(type=bool, required=True, default=True)
+
+    def verify(self):
+        super().verify()
+        assert self.interval > 0, '{}: interval should be positive'.format(self.path_to_node)
+        assert self.max_count is None or self.max_count >= 0, \
+            '{}: max_count should not be negative'.format(self.path_to_node)
+
+
+RetentionCandidate = NamedTuple('RetentionCandidate', [('record_id', str), ('group', str),
+                                                       ('finish_time', Optional[float]), ('is_failed', bool)])
+
+
+def select_expired(config: RetentionConfig, candidates: 'Iterable[RetentionCandidate]',
+                   now: float) -> 'List[RetentionCandidate]':
+    """:returns candidates, which should be removed according to config.
+    Candidates without finish time are treated as the oldest ones by max_count and are never too old by age
+    """
+    groups = defaultdict(list)
+    for candidate in candidates:
+        groups[candidate.group].append(candidate)
+    expired = []
+    for group in groups.values():
+        group.sort(key=lambda _: _.finish_time or 0.0, reverse=True)
+        for idx, candidate in enumerate(group):
+            if config.max_count is not None and idx >= config.max_count:
+                expired.append(candidate)
+                continue
+            max_age = config.max_age
+            if candidate.is_failed and config.failed_max_age is not None:
+                max_age = config.failed_max_age
+            if max_age is not None and candidate.finish_time is not None and now - candidate.finish_time > max_age:
+                expired.append(candidate)
+    return expired
+
+
+def remove_dir(path: str) -> int:
+    """Removes dir with all its contents, if it exists
+    :returns number of bytes taken by removed files
+    """
+    if not os.path.isdir(path):
+        return 0
+    size = 0
+    for dir_path, _, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                size += os.lstat(os.path.join(dir_path, file_name)).st_size
+            except OSError:
+                pass
+    shutil.rmtree(path, ignore_errors=True)
+    return size
+
+
+class RetentionService(Thread, metaclass=abc.ABCMeta):
+    """Background thread, which periodically removes (and optionally archives) records of finished executions
+    according to RetentionConfig and compacts backend storage afterwards. Is started only if retention is enabled.
+    """
+    archive_name = None  # type: str
+
+    def __init__(self, config: RetentionConfig, name: str) -> None:
+        super().__init__(name=name, daemon=True)
+        self.config = config
+        self.need_stop = Event()
+        self._stats_lock = Lock()
+        self._stats = {
+            'runs': 0,
+            'removed_records': 0,
+            'archived_records': 0,
+            'reclaimed_db_bytes': 0,
+            'reclaimed_files_bytes': 0,
+            'last_run_time': None,
+            'last_run_duration': None,
+        }
+        if self.config.enabled:
+            self.start()
+
+    @abc.abstractmethod
+    def _list_candidates(self) -> 'Iterable[RetentionCandidate]':
+        """:returns all records in terminal states, which are not used anymore"""
+        pass
+
+    @abc.abstractmethod
+    def _read_record(self, record_id: str) -> dict:
+        pass
+
+    @abc.abstractmethod
+    def _remove(self, record_id: str) -> int:
+        """Removes record with all its files
+        :returns number of bytes taken by removed files
+        """
+        pass
+
+    @abc.abstractmethod
+    def _compact(self) -> int:
+        """:returns number of bytes reclaimed by compaction of backend storage"""
+        pass
+
+    def shutdown(self):
+        self.need_stop.set()
+        if self.is_alive():
+            self.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats, enabled=self.config.enabled)
+
+    def run(self):
+        while not self.need_stop.is_set():
+            try:
+                self.run_once()
+            except Exception as ex:
+                logging.exception('Retention run of %s failed: %s', self.archive_name, ex)
+            self.need_stop.wait(timeout=self.config.interval)
+
+    def _archive(self, record_id: str):
+        archive_path = os.path.join(self.config.archive_dir,
+                                    '{}-{}.jsonl'.format(self.archive_name, time.strftime('%Y%m%d', time.gmtime())))
+        os.makedirs(self.config.archive_dir, exist_ok=True)
+        with open(archive_path, 'a') as archive_file:
+            print(json.dumps(self._read_record(record_id), ensure_ascii=False), file=archive_file)
+
+    def run_once(self, now: Optional[float] = None) -> dict:
+        """Removes all expired records
+        :returns counters of this run
+        """
+        start_time = time.time()
+        now = start_time if now is None else now
+        result = {'removed_records': 0, 'archived_records': 0, 'reclaimed_db_bytes': 0, 'reclaimed_files_bytes': 0}
+        for candidate in select_expired(self.config, self._list_candidates(), now):
+            if self.need_stop.is_set():
+                break
+            try:
+                if self.config.archive_dir:
+                    self._archive(candidate.record_id)
+                    result['archived_records'] += 1
+                result['reclaimed_files_bytes'] += self._remove(candidate.record_id)
+                result['removed_records'] += 1
+            except Exception as ex:
+                logging.exception('Failed to remove %s record %s: %s', self.archive_name, candidate.record_id, ex)
+        if result['removed_records'] and self.config.compact:
+            result['reclaimed_db_bytes'] = self._compact()
+        with self._stats_lock:
+            for key, value in result.items():
+                self._stats[key] += value
+            self._stats['runs'] += 1
+            self._stats['last_run_time'] = start_time
+            self._stats['last_run_duration'] = time.time() - start_time
+        logging.info('Retention of %s: %s', self.archive_name, result)
+        return result
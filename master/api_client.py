@@ -1,5 +1,5 @@
 import requests
-from typing import Optional, Tuple, List
+from typing import Iterator, Optional, Tuple, List
 from common.models.state import GraphInstanceState
 from common.models.graph import GraphStruct, GraphInstanceInfo
 import logging
@@ -18,6 +18,10 @@ class MasterApiException(Exception):
         return '{}\nResponse:\n{}'.format(self.msg, json.dumps(self.response, indent=2))
 
 
+class ListingFailed(MasterApiException):
+    msg = 'Failed to list objects.'
+
+
 class GraphCreationFailed(MasterApiException):
     msg = 'Graph creation failed.'
 
@@ -69,13 +73,32 @@ class MasterApiClient:
            If with_info is false, only graph_name and revision are received.
         :returns List[GraphStruct]: List of received graph structs
         """
-        data = {offset: offset, with_info: '1' if with_info else '0'}
+        data = {'offset': offset, 'with_info': '1' if with_info else '0'}
         if graph_name:
             data['graph_name'] = graph_name
         if limit is not None:
             data['limit'] = limit
         return [GraphStruct.create(_) for _ in requests.get(self._url_prefix + 'graphs', params=data).json()['payload']]
 
+    def _get_page(self, url: str, params: dict, limit: int, cursor: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+        params = dict(params, limit=limit, cursor=cursor or '')
+        data = requests.get(url, params=params).json()
+        if data.get('status') != 'ok':
+            raise ListingFailed(data)
+        return data['payload']['items'], data['payload']['next_cursor']
+
+    def list_graphs_page(self, graph_name: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None,
+                         with_info: bool = False) -> Tuple[List[GraphStruct], Optional[str]]:
+        """Same as list_graphs, but reads one page starting from the cursor returned with the previous page
+           (or the first page, if cursor is None). Cost of a page does not depend on number of previous pages.
+        :returns Tuple[List[GraphStruct], Optional[str]]: graph structs and cursor of the next page (None for the last)
+        """
+        params = {'with_info': '1' if with_info else '0'}
+        if graph_name:
+            params['graph_name'] = graph_name
+        items, next_cursor = self._get_page(self._url_prefix + 'graphs', params, limit, cursor)
+        return [GraphStruct.create(_) for _ in items], next_cursor
+
     def launch_graph(self, graph_name: str, graph_revision: Optional[int] = None) -> str:
         """Creates a new instance for specified graph's version. If graph_revision is not set, last revision is used.
         :returns str: created graph instance id
@@ -83,18 +106,48 @@ class MasterApiClient:
         data = requests.post(self._get_graph_url(graph_name, graph_revision) + '/launch')
         return data.json()['payload']['instance_id']
 
-    def list_instances(self, offset: int = 0, limit: Optional[int] = None,
-                       with_info: bool = False) -> List[GraphInstanceInfo]:
-        """List all known graph instances.
+    def list_instances(self, offset: int = 0, limit: Optional[int] = None, with_info: bool = False,
+                       state: Optional[str] = None, graph_name: Optional[str] = None, revision: Optional[int] = None,
+                       started_after: Optional[float] = None,
+                       started_before: Optional[float] = None) -> List[GraphInstanceInfo]:
+        """List known graph instances. Only instances matching all set filters are listed:
+           state, graph name and revision, start time in [started_after, started_before) range (in unixtime).
            If with_info is false, only instance_id will be received.
         :returns List[GraphInstanceInfo]: List of received graph instances
         """
-        data = {offset: offset, with_info: '1' if with_info else '0'}
+        data = {'offset': offset, 'with_info': '1' if with_info else '0'}
         if limit is not None:
             data['limit'] = limit
-        return [GraphInstanceInfo.create(_)
+        data.update(self._get_instance_filter_params(state, graph_name, revision, started_after, started_before))
+        return [GraphInstanceInfo.create(_, lazy=True)
                 for _ in requests.get(self._url_prefix + 'instances', params=data).json()['payload']]
 
+    def list_instances_page(self, limit: int = 100, cursor: Optional[str] = None, with_info: bool = False,
+                            state: Optional[str] = None, graph_name: Optional[str] = None,
+                            revision: Optional[int] = None, started_after: Optional[float] = None,
+                            started_before: Optional[float] = None) -> Tuple[List[GraphInstanceInfo], Optional[str]]:
+        """Same as list_instances, but reads one page starting from the cursor returned with the previous page
+           (or the first page, if cursor is None). Cost of a page does not depend on number of previous pages.
+        :returns Tuple[List[GraphInstanceInfo], Optional[str]]: graph instances and cursor of the next page
+                                                                (None for the last page)
+        """
+        params = {'with_info': '1' if with_info else '0'}
+        params.update(self._get_instance_filter_params(state, graph_name, revision, started_after, started_before))
+        items, next_cursor = self._get_page(self._url_prefix + 'instances', params, limit, cursor)
+        return [GraphInstanceInfo.create(_, lazy=True) for _ in items], next_cursor
+
+    @staticmethod
+    def _get_instance_filter_params(state: Optional[str], graph_name: Optional[str], revision: Optional[int],
+                                    started_after: Optional[float], started_before: Optional[float]) -> dict:
+        filters = {
+            'state': state,
+            'graph_name': graph_name,
+            'revision': revision,
+            'started_after': started_after,
+            'started_before': started_before,
+        }
+        return {k: v for k, v in filters.items() if v is not None}
+
     def read_instance(self, instance_id: str) -> GraphInstanceInfo:
         """Read info about a specified graph's instance.
         :returns GraphInstanceInfo: info about a graph's instance
@@ -123,13 +176,32 @@ class MasterApiClient:
                     GraphInstanceState().from_json(payload['new_state']))
         raise InstanceStateChangeFailed(data)
 
-    def instance_logs(self, instance_id: str, task_name: str, host: str, log_type: str = 'out') -> Optional[str]:
-        """Reads log from remote worker
+    def instance_logs(self, instance_id: str, task_name: str, host: str, log_type: str = 'out', offset: int = 0,
+                      limit: Optional[int] = None, tail_lines: Optional[int] = None) -> Optional[str]:
+        """Reads log from remote worker: whole log from offset (negative one is counted from the end of log)
+        or last tail_lines lines, at most limit bytes.
         :returns Optional[str]: The contents of the log. None, if log is empty or not found.
         """
-        data = requests.get('{}/logs/{}/{}/{}'.format(self._get_instance_url(instance_id), task_name, host, log_type))
-        if data.ok:
-            return data.json()['payload']['data']
+        data = b''.join(self.stream_instance_logs(instance_id, task_name, host, log_type,
+                                                  offset=offset, limit=limit, tail_lines=tail_lines))
+        return data.decode(errors='replace') or None
+
+    def stream_instance_logs(self, instance_id: str, task_name: str, host: str, log_type: str = 'out',
+                             offset: int = 0, limit: Optional[int] = None, tail_lines: Optional[int] = None,
+                             follow: bool = False, chunk_size: int = 64 << 10) -> Iterator[bytes]:
+        """Streams raw log from remote worker through master. If follow is set, stream lasts until
+        the task reaches terminal state.
+        :returns Iterator[bytes]: chunks of the log, nothing if log is not found
+        """
+        params = {'offset': offset, 'follow': '1' if follow else '0'}
+        if limit is not None:
+            params['limit'] = limit
+        if tail_lines is not None:
+            params['tail_lines'] = tail_lines
+        url = '{}/logs/{}/{}/{}/raw'.format(self._get_instance_url(instance_id), task_name, host, log_type)
+        with requests.get(url, params=params, stream=True) as result:
+            if result.ok:
+                yield from result.iter_content(chunk_size)
 
 # ('GET', '/ping', 'ping'),
 # ('GET', '/v1.0/graphs', 'list_graphs'),
@@ -145,3 +217,4 @@ class MasterApiClient:
 # ('POST', '/v1.0/instance/{instance_id}/start', 'start_instance'),
 # ('POST', '/v1.0/instance/{instance_id}/stop', 'stop_instance'),
 # ('GET', '/v1.0/instance/{instance_id}/logs/{task_name}/{host}/{log_type}', 'instance_logs'),
+# ('GET', '/v1.0/instance/{instance_id}/logs/{task_name}/{host}/{log_type}/raw', 'instance_logs_raw'),
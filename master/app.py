@@ -5,16 +5,22 @@ import asyncio
 import json as js
 import logging
 from itertools import islice
+from typing import Optional, Tuple
 from uuid import uuid4
 
+import aiohttp
+from aiohttp import web
 from aiohttp.web_reqrep import Request
 from common.models.state import GraphInstanceState
-from common.api import CommonApi, ResultOk, ResultError, ResultNotFound
-from master.backend import MasterBackends, GraphStructureNotFound
+from common.api import CommonApi, ResultOk, ResultError, ResultNotFound, json_response
+from master.backend import MasterBackends, GraphStructureNotFound, InstanceFilter
 from master.config import MasterConfig
 from master.engine import Engine
+from master.retention import InstanceRetentionService
 from master.scheduler import Scheduler
+from util.pagination import InvalidCursor
 from worker.api_client import WorkerApiClient
+from worker.task_log import MAX_READ_SIZE, STREAM_CHUNK_SIZE
 
 
 class MasterApp:
@@ -22,11 +28,13 @@ class MasterApp:
         self.config = config
         self.backend = MasterBackends(config.plugins.backends_dir).construct_backend(config.backend,
                                                                                      config.backend_config)
-        self.engine = Engine(self.backend)
+        self.engine = Engine(self.backend, config.engine)
         self.scheduler = Scheduler(self.backend, self.engine)
+        self.retention = InstanceRetentionService(self.backend, self.engine, config.retention)
 
     def shutdown(self):
         self.scheduler.shutdown()
+        self.retention.shutdown()
 
     @staticmethod
     def ping(*args):
@@ -37,12 +45,21 @@ class MasterApp:
         with_info = (args.get('with_info', '1') == '1')
         limit = int(args.get('limit', '-1'))
         offset = int(args.get('offset', '0'))
-        it = islice(self.backend.list_graph_struct(graph_name=graph_name, with_info=with_info),
-                    offset, offset + limit if limit >= 0 else None)
-        return ResultOk([
+        cursor = args.get('cursor', None)  # empty cursor requests the first page
+        if cursor is not None:
+            try:
+                it, next_cursor = self.backend.list_graph_struct_page(graph_name, limit, cursor or None,
+                                                                      with_info=with_info)
+            except InvalidCursor as ex:
+                return ResultError(error=str(ex))
+        else:
+            it = islice(self.backend.list_graph_struct(graph_name=graph_name, with_info=with_info),
+                        offset, offset + limit if limit >= 0 else None)
+        items = [
             graph_struct.to_json() if graph_struct else {'graph_name': graph_name, 'revision': revision}
             for graph_name, revision, graph_struct in it
-        ])
+        ]
+        return ResultOk(items=items, next_cursor=next_cursor) if cursor is not None else ResultOk(items)
 
     def create_graph(self, args: dict, request: Request):
         graph_name = request.match_info.get('graph_name', args.get('graph_name', None))
@@ -74,21 +91,43 @@ class MasterApp:
 
     def list_instances(self, args: dict, request: Request):
         with_info = (args.get('with_info', '1') == '1')
-        limit = int(args.get('limit', '-1'))
-        offset = int(args.get('offset', '0'))
-        it = islice(self.backend.list_graph_instance_info(with_info=with_info),
-                    offset, offset + limit if limit >= 0 else None)
-        return ResultOk([
+        try:
+            limit = int(args.get('limit', '-1'))
+            offset = int(args.get('offset', '0'))
+            instance_filter = InstanceFilter(
+                state=args.get('state', None),
+                graph_name=args.get('graph_name', None),
+                revision=int(args['revision']) if 'revision' in args else None,
+                started_after=float(args['started_after']) if 'started_after' in args else None,
+                started_before=float(args['started_before']) if 'started_before' in args else None,
+            )
+        except ValueError as ex:
+            return ResultError(error='limit, offset and revision should be integers, '
+                                     'started_after and started_before - numbers: {}'.format(ex))
+        if instance_filter.state is not None and instance_filter.state not in GraphInstanceState.links:
+            return ResultError(error='Unknown instance state', state=instance_filter.state)
+        cursor = args.get('cursor', None)  # empty cursor requests the first page
+        if cursor is not None:
+            try:
+                it, next_cursor = self.backend.find_graph_instance_info_page(instance_filter, limit, cursor or None,
+                                                                             with_info=with_info)
+            except InvalidCursor as ex:
+                return ResultError(error=str(ex))
+        else:
+            it = islice(self.backend.find_graph_instance_info(instance_filter, with_info=with_info),
+                        offset, offset + limit if limit >= 0 else None)
+        items = [
             instance_info.to_json() if instance_info else {'instance_id': instance_id}
             for instance_id, instance_info in it
-        ])
+        ]
+        return ResultOk(items=items, next_cursor=next_cursor) if cursor is not None else ResultOk(items)
 
     def read_instance(self, args: dict, request: Request):
         instance_id = request.match_info.get('instance_id', None)
         if not instance_id:
             return ResultError(error='Instance id should be set')
         try:
-            return ResultOk(self.backend.read_graph_instance_info(instance_id).to_json())
+            return ResultOk(self.backend.read_graph_instance_info(instance_id, lazy=True).to_json())
         except KeyError:
             return ResultNotFound(error='Instance with needed id is not found', instance_id=instance_id)
 
@@ -108,6 +147,19 @@ class MasterApp:
         prev_state = self.engine.set_graph_instance_state(instance_id, instance_state_name)
         return ResultOk(prev_state=prev_state, new_state=instance_state_name)
 
+    def notify_task_states(self, args: dict, request: Request):
+        instance_id = request.match_info.get('instance_id', None)
+        events = args.get('events', None)
+        if not instance_id:
+            return ResultError(error='instance_id field should be set')
+        if not isinstance(events, list) or not all(isinstance(_, dict) and 'task_id' in _ and 'state' in _
+                                                   for _ in events):
+            return ResultError(error='events field should be a list of objects with task_id and state fields')
+        return ResultOk(accepted=self.engine.notify_task_states(instance_id, events))
+
+    def stats(self, args: dict, request: Request):
+        return ResultOk(backend=self.backend.stats(), retention=self.retention.stats())
+
     # TODO: move this proxy to storage layer
     def instance_logs(self, args: dict, request: Request):
         instance_id = request.match_info.get('instance_id', None)
@@ -118,18 +170,40 @@ class MasterApp:
             return ResultError(error='All fields from (instance_id, task_name, host, log_type) should be set')
         if log_type not in ('err', 'out'):
             return ResultError(error='Log type can be only from (err, out)')
-        info = self.backend.read_graph_instance_info(instance_id)
+        try:
+            offset = int(args.get('offset', '0'))
+            limit = int(args['limit']) if args.get('limit') else None
+            tail_lines = int(args['tail_lines']) if args.get('tail_lines') else None
+        except ValueError as ex:
+            return ResultError(error='offset, limit and tail_lines should be integers: {}'.format(ex))
+        task_id, error = self.find_host_task(instance_id, task_name, host)
+        if error is not None:
+            return error
+        # at most one page of log is buffered here: reading goes on from next_offset, while it is less than size,
+        # or whole log can be streamed by instance_logs_raw
+        page = self.worker_client(host).get_task_log_page(task_id, log_type, offset=offset,
+                                                          limit=limit or MAX_READ_SIZE, tail_lines=tail_lines)
+        if page is None:
+            return ResultNotFound(error='Log is not found', instance_id=instance_id, task_name=task_name, host=host)
+        return ResultOk(instance_id=instance_id, task_name=task_name, host=host, log_type=log_type, **page)
+
+    def find_host_task(self, instance_id: str, task_name: str,
+                       host: str) -> 'Tuple[Optional[str], Optional[ResultNotFound]]':
+        """:returns id of task execution on the host or error, if there is no such execution"""
+        info = self.backend.read_graph_instance_info(instance_id, lazy=True)
         task_info = info.exec_stats.per_task_execution_info.get(task_name)
         if not task_info:
-            return ResultNotFound(error='Graph instance doesn\'t have task with this name',
-                                  instance_id=instance_id, task_name=task_name)
+            return None, ResultNotFound(error='Graph instance doesn\'t have task with this name',
+                                        instance_id=instance_id, task_name=task_name)
         host_info = task_info.per_host_info.get(host)
         if not host_info or not host_info.task_id:
-            return ResultNotFound(error='Specified task doesn\'t have an execution entry on specified host',
-                                  instance_id=instance_id, task_name=task_name, host=host)
-        # FIXME: Port is not passed
-        return ResultOk(instance_id=instance_id, task_name=task_name, host=host, log_type=log_type,
-                        data=WorkerApiClient(worker_host=host).get_task_log(host_info.task_id, log_type))
+            return None, ResultNotFound(error='Specified task doesn\'t have an execution entry on specified host',
+                                        instance_id=instance_id, task_name=task_name, host=host)
+        return host_info.task_id, None
+
+    def worker_client(self, host: str) -> WorkerApiClient:
+        return WorkerApiClient(worker_host=host, worker_port=self.config.engine.worker_port,
+                               timeout=self.config.engine.worker_request_timeout)
 
 
 class MasterApi(CommonApi):
@@ -155,9 +229,66 @@ class MasterApi(CommonApi):
             ('GET', '/v1.0/instance/{instance_id}', 'read_instance'),
             ('POST', '/v1.0/instance/{instance_id}/start', 'start_instance'),
             ('POST', '/v1.0/instance/{instance_id}/stop', 'stop_instance'),
+            ('POST', '/v1.0/instance/{instance_id}/task_states', 'notify_task_states'),
             ('GET', '/v1.0/instance/{instance_id}/logs/{task_name}/{host}/{log_type}', 'instance_logs'),
+            ('GET', '/v1.0/stats', 'stats'),
         ]
 
+    @property
+    def raw_routes(self):
+        return [
+            ('GET', '/v1.0/instance/{instance_id}/logs/{task_name}/{host}/{log_type}/raw', 'instance_logs_raw'),
+        ]
+
+    async def instance_logs_raw(self, request: Request):
+        """Streams raw task log from worker. Parameters offset, limit, tail_lines and follow are passed to worker
+        as is. Next chunk is read from worker only after the previous one is sent to client, so master holds
+        at most one chunk of log per request.
+        """
+        instance_id = request.match_info.get('instance_id', None)
+        task_name = request.match_info.get('task_name', None)
+        host = request.match_info.get('host', None)
+        log_type = request.match_info.get('log_type', None)
+        if log_type not in ('err', 'out'):
+            return json_response(ResultError(error='Log type can be only from (err, out)').to_dict(), status=500)
+        try:
+            task_id, error = await self.loop.run_in_executor(self.executor, self.app.find_host_task,
+                                                             instance_id, task_name, host)
+        except Exception as ex:
+            error = ResultNotFound(error=str(ex), instance_id=instance_id)
+        if error is not None:
+            return json_response(error.to_dict(), status=error.code)
+        params = {k: v for k, v in request.GET.items() if k in ('offset', 'limit', 'tail_lines', 'follow')}
+        session = aiohttp.ClientSession(loop=self.loop)
+        try:
+            try:
+                worker_response = await session.get(self.app.worker_client(host).task_log_raw_url(task_id, log_type),
+                                                    params=params)
+            except aiohttp.ClientError as ex:
+                error = ResultError(error='Failed to request log from worker: {}'.format(ex), host=host)
+                return json_response(error.to_dict(), status=error.code)
+            try:
+                if worker_response.status != 200:
+                    return web.Response(body=await worker_response.read(), status=worker_response.status,
+                                        content_type=worker_response.content_type)
+                response = web.StreamResponse()
+                response.content_type = 'text/plain'
+                response.charset = 'utf-8'
+                response.enable_chunked_encoding()
+                await response.prepare(request)
+                while True:
+                    chunk = await worker_response.content.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    response.write(chunk)
+                    await response.drain()
+                await response.write_eof()
+                return response
+            finally:
+                worker_response.close()
+        finally:
+            session.close()
+
 
 def main(config: MasterConfig, args):
     loop = asyncio.get_event_loop()
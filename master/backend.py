@@ -1,10 +1,12 @@
 import abc
-from typing import Iterator, Tuple, Optional
+from typing import Iterable, Iterator, Tuple, Optional
 
-from common.models.graph import GraphInstanceInfo, GraphStruct
+from common.models.graph import GraphInstanceInfo, GraphStruct, TaskExecutionInfo
 from common.models.schedule import ScheduledGraph
 from common.models.state import GraphInstanceState
 from util.config import Config
+from util.lru_cache import LRUCache, LRUCacheConfig, StripedLock, copy_json
+from util.pagination import Page, paginate_by_offset
 from util.plugins import PluginBase, PluginsMaster
 from util.symver import SymVer
 
@@ -25,6 +27,55 @@ class GraphStructureNotFound(Exception):
         return 'GraphStruct "{}" not found in backend'.format(self.graph_name)
 
 
+class InstanceFilter:
+    """Conditions on graph instances to list. Conditions that are None are not checked.
+    Instance matches, if it was started in [started_after, started_before) time range (in unixtime).
+    """
+
+    def __init__(self, state: Optional[str] = None, graph_name: Optional[str] = None, revision: Optional[int] = None,
+                 started_after: Optional[float] = None, started_before: Optional[float] = None) -> None:
+        self.state = state
+        self.graph_name = graph_name
+        self.revision = revision
+        self.started_after = started_after
+        self.started_before = started_before
+
+    @property
+    def is_empty(self) -> bool:
+        return self.state is None and self.graph_name is None and self.revision is None and not self.has_time_range
+
+    @property
+    def has_time_range(self) -> bool:
+        return self.started_after is not None or self.started_before is not None
+
+    @staticmethod
+    def summarize(state: str, graph_name: str, revision: int, start_time: Optional[float]) -> dict:
+        """:returns json with all instance fields filter checks. Backends can store it in their indexes"""
+        return {'state': state, 'graph_name': graph_name, 'revision': revision, 'start_time': start_time}
+
+    @classmethod
+    def summarize_instance(cls, instance_info: GraphInstanceInfo) -> dict:
+        return cls.summarize(instance_info.exec_stats.state.name, instance_info.structure.graph_name,
+                             instance_info.structure.revision, instance_info.exec_stats.start_time.to_json())
+
+    def matches(self, summary: dict) -> bool:
+        if self.state is not None and summary['state'] != self.state:
+            return False
+        if self.graph_name is not None and summary['graph_name'] != self.graph_name:
+            return False
+        if self.revision is not None and summary['revision'] != self.revision:
+            return False
+        if self.has_time_range:
+            start_time = summary['start_time']
+            if start_time is None:
+                return False
+            if self.started_after is not None and start_time < self.started_after:
+                return False
+            if self.started_before is not None and start_time >= self.started_before:
+                return False
+        return True
+
+
 class MasterBackend(PluginBase, metaclass=abc.ABCMeta):
     def __init__(self, backend_config: dict) -> None:
         self.config = self.config_class()
@@ -37,8 +88,10 @@ class MasterBackend(PluginBase, metaclass=abc.ABCMeta):
         return Config()
 
     @abc.abstractmethod
-    def read_graph_instance_info(self, instance_id: str) -> GraphInstanceInfo:
-        """Read graph instance info by instance_id
+    def read_graph_instance_info(self, instance_id: str, lazy: bool = False) -> GraphInstanceInfo:
+        """Read graph instance info by instance_id.
+        If lazy is set, parts of info are parsed on first access (see Config.create), so reads of a few fields
+        and serialization of the whole info do not pay for building all objects.
         :raises GraphInstanceInfoNotFound: if graph instance info has not been found
         """
         pass
@@ -48,14 +101,61 @@ class MasterBackend(PluginBase, metaclass=abc.ABCMeta):
         """Create or replace graph instance info by instance_id"""
         pass
 
+    @abc.abstractmethod
+    def delete_graph_instance_info(self, instance_id: str):
+        """Deletes graph instance with all its execution info. Deleting not existing instance does nothing"""
+        pass
+
+    def update_graph_instance_info(self, instance_id: str, instance_info: GraphInstanceInfo,
+                                   task_names: Iterable[str] = ()):
+        """Saves changes of graph instance, where only execution info of tasks from task_names has been changed.
+        Instance header (everything except structure and per task execution info) is always saved.
+        Backends with per task storage layout should override it, so write cost depends only on what has changed.
+        """
+        self.write_graph_instance_info(instance_id, instance_info)
+
+    def read_task_execution_info(self, instance_id: str, task_name: str) -> TaskExecutionInfo:
+        """Read execution info of one task of graph instance
+        :raises GraphInstanceInfoNotFound: if graph instance info has not been found
+        :raises KeyError: if graph instance has no task with this name
+        """
+        return self.read_graph_instance_info(instance_id, lazy=True).exec_stats.per_task_execution_info[task_name]
+
     @abc.abstractmethod
     def list_graph_instance_info(self, with_info: bool = False) -> Iterator[Tuple[str, Optional[GraphInstanceInfo]]]:
-        """List all known graph infos.
+        """List all known graph infos. Listed infos may be read lazily (see read_graph_instance_info).
         :returns iterator over pairs of instance_id and instance_info.
                  If with_info is not set, all instance_infos will be None
         """
         pass
 
+    def find_graph_instance_info(self, instance_filter: InstanceFilter,
+                                 with_info: bool = False) -> Iterator[Tuple[str, Optional[GraphInstanceInfo]]]:
+        """List graph instances matching instance_filter.
+        Backends should override it with indexed lookup, so cost depends on number of found instances only
+        :returns iterator over pairs of instance_id and instance_info.
+                 If with_info is not set, all instance_infos will be None
+        """
+        for instance_id, instance_info in self.list_graph_instance_info(with_info=True):
+            if instance_filter.matches(InstanceFilter.summarize_instance(instance_info)):
+                yield instance_id, instance_info if with_info else None
+
+    def find_graph_instance_info_page(self, instance_filter: InstanceFilter, limit: int, cursor: Optional[str] = None,
+                                      with_info: bool = False) -> 'Page[Tuple[str, Optional[GraphInstanceInfo]]]':
+        """Reads one page of graph instances matching instance_filter, starting from the cursor returned with
+        the previous page (or from the beginning, if cursor is None).
+        Backends should override it, so page is found without reading all previous ones.
+        :raises InvalidCursor: if cursor was not returned by this method
+        :returns pair of list of (instance_id, instance_info) and cursor of the next page (None for the last page)
+        """
+        return paginate_by_offset(self.find_graph_instance_info(instance_filter, with_info=with_info), limit, cursor)
+
+    def list_graph_instance_ids_by_state(self, state: str) -> Iterator[str]:
+        """List ids of graph instances, which are in the given state.
+        :returns iterator over instance_ids
+        """
+        return (instance_id for instance_id, _ in self.find_graph_instance_info(InstanceFilter(state=state)))
+
     @abc.abstractmethod
     def read_graph_struct(self, graph_name: str, revision: int = -1) -> GraphStruct:
         """Read graph struct by graph_name and revision. If revision == -1, last revision is selected
@@ -78,6 +178,13 @@ class MasterBackend(PluginBase, metaclass=abc.ABCMeta):
         """
         pass
 
+    def list_graph_struct_page(self, graph_name: Optional[str], limit: int, cursor: Optional[str] = None,
+                               with_info: bool = False) -> 'Page[Tuple[str, int, Optional[GraphStruct]]]':
+        """Reads one page of list_graph_struct results, see find_graph_instance_info_page for cursor semantics
+        :raises InvalidCursor: if cursor was not returned by this method
+        """
+        return paginate_by_offset(self.list_graph_struct(graph_name, with_info=with_info), limit, cursor)
+
     @abc.abstractmethod
     def write_schedule(self, graph_name: str, schedule: str):
         """Create or replace existing schedule for graph struct by graph_name. Schedule is in cron format."""
@@ -95,7 +202,7 @@ class MasterBackend(PluginBase, metaclass=abc.ABCMeta):
         :param instance_id: GraphInstanceInfo's id
         :return: Current graph instance state
         """
-        return self.read_graph_instance_info(instance_id).exec_stats.state
+        return self.read_graph_instance_info(instance_id, lazy=True).exec_stats.state
 
     def write_instance_state(self, instance_id: str, state: str) -> GraphInstanceState:
         """
@@ -106,15 +213,179 @@ class MasterBackend(PluginBase, metaclass=abc.ABCMeta):
         :return: Previous graph instance state
         """
         assert isinstance(state, GraphInstanceState)
-        instance_info = self.read_graph_instance_info(instance_id)
+        instance_info = self.read_graph_instance_info(instance_id, lazy=True)
         old_state = instance_info.exec_stats.name.change_state(state, force=False)
         self.write_graph_instance_info(instance_id, instance_info)
         return old_state
 
+    def compact(self) -> int:
+        """Reclaims storage space of deleted records, if backend does not do it by itself
+        :returns number of reclaimed bytes
+        """
+        return 0
+
+    def stats(self) -> dict:
+        """:returns backend specific counters"""
+        return dict()
+
+
+class CachingMasterBackend(MasterBackend):
+    """Write-through LRU cache of graph instances and graph structs in front of any master backend.
+    Json of records is cached and every read builds new objects from a copy of it, so read objects can be changed
+    in place. Writes replace it with a copy of json of written object. Reads of instance state and of execution info
+    of one task copy and parse only the needed part of cached json.
+    """
+
+    def __init__(self, backend: MasterBackend, cache_config: LRUCacheConfig) -> None:
+        # backend is already configured, so MasterBackend.__init__ is not called
+        self.backend = backend
+        self.config = backend.config
+        self.cache = LRUCache(cache_config.max_size)
+        self._key_lock = StripedLock()
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    @property
+    def version(self) -> SymVer:
+        return self.backend.version
+
+    @property
+    def config_class(self) -> type:
+        return self.backend.config_class
+
+    def _read_instance_json(self, instance_id: str) -> dict:
+        key = ('instance', instance_id)
+        instance_json = self.cache.get(key)
+        if instance_json is None:
+            with self._key_lock(key):
+                instance_json = self.backend.read_graph_instance_info(instance_id, lazy=True).to_json()
+                self.cache.put(key, instance_json)
+        return instance_json
+
+    def read_graph_instance_info(self, instance_id: str, lazy: bool = False) -> GraphInstanceInfo:
+        return GraphInstanceInfo.create(copy_json(self._read_instance_json(instance_id)), lazy=lazy)
+
+    def read_instance_state(self, instance_id: str) -> GraphInstanceState:
+        instance_json = self.cache.get(('instance', instance_id))
+        if instance_json is None:
+            return self.backend.read_instance_state(instance_id)
+        return GraphInstanceState().from_json(copy_json(instance_json['exec_stats']['state']))
+
+    def read_task_execution_info(self, instance_id: str, task_name: str) -> TaskExecutionInfo:
+        instance_json = self.cache.get(('instance', instance_id))
+        if instance_json is None:
+            return self.backend.read_task_execution_info(instance_id, task_name)
+        return TaskExecutionInfo.create(copy_json(instance_json['exec_stats']['per_task_execution_info'][task_name]))
+
+    def write_graph_instance_info(self, instance_id: str, instance_info: GraphInstanceInfo):
+        key = ('instance', instance_id)
+        with self._key_lock(key):
+            result = self.backend.write_graph_instance_info(instance_id, instance_info)
+            self.cache.put(key, copy_json(instance_info.to_json()))
+        return result
+
+    def update_graph_instance_info(self, instance_id: str, instance_info: GraphInstanceInfo,
+                                   task_names: Iterable[str] = ()):
+        key = ('instance', instance_id)
+        with self._key_lock(key):
+            result = self.backend.update_graph_instance_info(instance_id, instance_info, task_names)
+            cached_json = self.cache.pop(key)
+            if cached_json is not None:
+                # only header and changed tasks are serialized, like the backend does
+                per_task_execution_info = dict(cached_json['exec_stats']['per_task_execution_info'])
+                for task_name in task_names:
+                    per_task_execution_info[task_name] = \
+                        instance_info.exec_stats.per_task_execution_info[task_name].to_json()
+                self.cache.put(key, GraphInstanceInfo.join_json_parts(instance_info.header_to_json(),
+                                                                      cached_json['structure'],
+                                                                      per_task_execution_info))
+        return result
+
+    def delete_graph_instance_info(self, instance_id: str):
+        key = ('instance', instance_id)
+        with self._key_lock(key):
+            result = self.backend.delete_graph_instance_info(instance_id)
+            self.cache.pop(key)
+        return result
+
+    def compact(self) -> int:
+        return self.backend.compact()
+
+    def list_graph_instance_info(self, with_info: bool = False) -> Iterator[Tuple[str, Optional[GraphInstanceInfo]]]:
+        return self.backend.list_graph_instance_info(with_info)
+
+    def find_graph_instance_info(self, instance_filter: InstanceFilter,
+                                 with_info: bool = False) -> Iterator[Tuple[str, Optional[GraphInstanceInfo]]]:
+        return self.backend.find_graph_instance_info(instance_filter, with_info)
+
+    def find_graph_instance_info_page(self, instance_filter: InstanceFilter, limit: int, cursor: Optional[str] = None,
+                                      with_info: bool = False) -> 'Page[Tuple[str, Optional[GraphInstanceInfo]]]':
+        return self.backend.find_graph_instance_info_page(instance_filter, limit, cursor, with_info)
+
+    def list_graph_instance_ids_by_state(self, state: str) -> Iterator[str]:
+        return self.backend.list_graph_instance_ids_by_state(state)
+
+    def read_graph_struct(self, graph_name: str, revision: int = -1) -> GraphStruct:
+        if revision == -1:
+            head_key = ('graph_head', graph_name)
+            revision = self.cache.get(head_key)
+            if revision is None:
+                # head is read under the lock, so a concurrently added revision is not overwritten by an older one
+                with self._key_lock(head_key):
+                    revision = self.cache.get(head_key)
+                    if revision is None:
+                        graph_struct = self.backend.read_graph_struct(graph_name)
+                        self.cache.put(head_key, graph_struct.revision)
+                        self.cache.put(('graph', graph_name, graph_struct.revision),
+                                       copy_json(graph_struct.to_json()))
+                        return graph_struct
+        # revisions are never changed, so they are cached without locking
+        key = ('graph', graph_name, revision)
+        graph_struct_json = self.cache.get(key)
+        if graph_struct_json is None:
+            graph_struct = self.backend.read_graph_struct(graph_name, revision)
+            self.cache.put(key, copy_json(graph_struct.to_json()))
+            return graph_struct
+        return GraphStruct.create(copy_json(graph_struct_json))
+
+    def add_graph_struct(self, graph_name: str, graph_struct: GraphStruct) -> int:
+        key = ('graph_head', graph_name)
+        with self._key_lock(key):
+            revision = self.backend.add_graph_struct(graph_name, graph_struct)
+            self.cache.put(('graph', graph_name, revision), copy_json(graph_struct.to_json()))
+            if revision > self.cache.get(key, -1):
+                self.cache.put(key, revision)
+        return revision
+
+    def list_graph_struct(self, graph_name: Optional[str] = None, with_info: bool = False) -> Iterator[
+            Tuple[str, int, Optional[GraphStruct]]]:
+        return self.backend.list_graph_struct(graph_name, with_info)
+
+    def list_graph_struct_page(self, graph_name: Optional[str], limit: int, cursor: Optional[str] = None,
+                               with_info: bool = False) -> 'Page[Tuple[str, int, Optional[GraphStruct]]]':
+        return self.backend.list_graph_struct_page(graph_name, limit, cursor, with_info)
+
+    def write_schedule(self, graph_name: str, schedule: str):
+        return self.backend.write_schedule(graph_name, schedule)
+
+    def list_schedules(self) -> Iterator[ScheduledGraph]:
+        return self.backend.list_schedules()
+
+    def stats(self) -> dict:
+        return dict(self.backend.stats(), cache=self.cache.stats())
+
 
 class MasterBackends(PluginsMaster):
     plugin_base_class = MasterBackend
 
     def construct_backend(self, backend_type: str, backend_config: dict,
                           backend_min_version: SymVer = SymVer()) -> MasterBackend:
-        return self.find_plugin(backend_type, backend_min_version)(backend_config)
+        """If backend_config has cache section (LRUCacheConfig), backend is wrapped with CachingMasterBackend"""
+        backend_config = dict(backend_config)
+        cache_config = backend_config.pop('cache', None)
+        backend = self.find_plugin(backend_type, backend_min_version)(backend_config)
+        if cache_config is not None:
+            backend = CachingMasterBackend(backend, LRUCacheConfig.create(cache_config))
+        return backend
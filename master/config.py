@@ -1,4 +1,5 @@
 from common.api_config import CommonApiConfig
+from common.retention import RetentionConfig
 from util.config import Config, ConfigField
 
 
@@ -6,10 +7,61 @@ class PluginsConfig(Config):
     backends_dir = ConfigField(type=str, required=True, default='plugins/backends')
 
 
+class EngineConfig(Config):
+    # 'threads' - one thread per running graph instance, 'asyncio' - all instances share a fixed set of event loops
+    mode = ConfigField(type=str, required=True, default='threads')
+    event_loops = ConfigField(type=int, required=True, default=1)
+    tick_workers = ConfigField(type=int, required=True, default=8)
+    tick_interval = ConfigField(type=float, required=True, default=1.0)
+    worker_port = ConfigField(type=int, required=True, default=8081)
+    # Max number of simultaneous requests to workers, shared by all running instances
+    worker_rpc_concurrency = ConfigField(type=int, required=True, default=32)
+    # Seconds to wait for connection to a worker and for every read of its answer. Task on a host, which has not
+    # answered in time, is retried on a later tick instead of failing the instance
+    worker_request_timeout = ConfigField(type=float, required=True, default=30.0)
+    # If set, requests to the same worker from all running instances are grouped into batch requests
+    batch_worker_requests = ConfigField(type=bool, required=True, default=False)
+    worker_batch_window = ConfigField(type=float, required=True, default=0.01)
+    # Url of this master reachable from workers, like http://master-host:8080. If set, workers push task states to
+    # master and states are polled only once per reconcile_interval seconds to recover lost notifications
+    callback_url = ConfigField(type=str, required=False, default=None)
+    reconcile_interval = ConfigField(type=float, required=True, default=30.0)
+    # Task state changes of an instance are written to backend at most once per tick and at most once per
+    # flush_interval seconds, so up to flush_interval seconds of changes can be lost on master crash.
+    # Terminal state of an instance is always written right away.
+    flush_interval = ConfigField(type=float, required=True, default=0.0)
+    # Task state on a host is polled min_poll_interval seconds after it has changed, then polling interval grows
+    # poll_backoff times after every poll without changes, up to max_poll_interval. Instance is ticked on the earliest
+    # poll deadline of its tasks, but at least once per tick_interval seconds.
+    min_poll_interval = ConfigField(type=float, required=True, default=0.1)
+    max_poll_interval = ConfigField(type=float, required=True, default=30.0)
+    poll_backoff = ConfigField(type=float, required=True, default=2.0)
+    # Instances found running on master start are resumed one by one with this delay in seconds between them,
+    # so workers do not get requests of all of them at once
+    restart_stagger = ConfigField(type=float, required=True, default=0.05)
+
+    def verify(self):
+        super().verify()
+        assert self.mode in ('threads', 'asyncio'), \
+            '{}: mode should be one of (threads, asyncio), got {}'.format(self.path_to_node, self.mode)
+        assert self.event_loops > 0, '{}: event_loops should be positive'.format(self.path_to_node)
+        assert self.tick_workers > 0, '{}: tick_workers should be positive'.format(self.path_to_node)
+        assert self.worker_rpc_concurrency > 0, '{}: worker_rpc_concurrency should be positive'.format(self.path_to_node)
+        assert self.worker_request_timeout > 0, \
+            '{}: worker_request_timeout should be positive'.format(self.path_to_node)
+        assert 0 < self.min_poll_interval <= self.max_poll_interval, \
+            '{}: min_poll_interval should be positive and not greater than max_poll_interval'.format(self.path_to_node)
+        assert self.poll_backoff >= 1.0, '{}: poll_backoff should be at least 1.0'.format(self.path_to_node)
+
+
 class MasterConfig(Config):
     api = CommonApiConfig(common_logger='dedalus.master.api.common',
                           access_logger='dedalus.master.api.access',
                           port=8080)
     backend = ConfigField(type=str, required=True, default='leveldb')
+    # Config of backend plugin. Optional 'cache' section (util.lru_cache.LRUCacheConfig) enables LRU cache of records
     backend_config = ConfigField(type=dict, required=True, default=dict())
     plugins = PluginsConfig()
+    engine = EngineConfig()
+    # Removal of finished, failed and stopped graph instances, max_count is applied per graph
+    retention = RetentionConfig()
@@ -1,25 +1,98 @@
+import asyncio
 import time
-from typing import Dict, List
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import count
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from common.models.graph import GraphStruct, GraphInstanceInfo, TaskExecutionInfo, TaskOnHostExecutionInfo, \
     ExtendedTaskStruct
 from master.backend import MasterBackend
+from master.config import EngineConfig
 from threading import Lock, Thread, Event
 from common.models.state import GraphInstanceState, TaskState
-from worker.api_client import WorkerApiClient
+from worker.api_client import WorkerApiClientPool, BatchingWorkerApiClientPool, WorkerRequestTimeout
 import logging
 
 
+class InstanceWriter:
+    """Write-behind layer for GraphInstanceInfo persistence. Changes only mark instance (and changed tasks) as dirty,
+    and they are written to backend at most once per flush_interval seconds, unless flush is forced.
+    """
+
+    def __init__(self, backend: MasterBackend, instance_info: GraphInstanceInfo, flush_interval: float = 0.0):
+        self.backend = backend
+        self.instance_info = instance_info
+        self.flush_interval = flush_interval
+        self.writes_count = 0
+        self._dirty = False
+        self._dirty_tasks = set()
+        self._last_flush_time = 0.0
+
+    @property
+    def is_dirty(self) -> bool:
+        return self._dirty
+
+    def mark_dirty(self, task_name: Optional[str] = None):
+        self._dirty = True
+        if task_name is not None:
+            self._dirty_tasks.add(task_name)
+
+    def flush(self, force: bool = False):
+        if not self._dirty:
+            return
+        now = time.time()
+        if not force and now - self._last_flush_time < self.flush_interval:
+            return
+        self.backend.update_graph_instance_info(self.instance_info.instance_id, self.instance_info, self._dirty_tasks)
+        self.writes_count += 1
+        self._dirty = False
+        self._dirty_tasks = set()
+        self._last_flush_time = now
+
+
+class PollSchedule:
+    """Next state poll deadline of a task on a host. Polling interval starts from min_interval after every state
+    change and grows backoff times after every poll that has not found a change, up to max_interval.
+    """
+
+    def __init__(self, min_interval: float, max_interval: float, backoff: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.interval = min_interval
+        self.deadline = 0.0  # first poll is done right away
+
+    def reset(self, now: float, delay: Optional[float] = None):
+        """Is called on state change. Next poll is done in min_interval or in delay seconds, if it is given"""
+        self.interval = self.min_interval
+        if delay is None:
+            delay = self.interval
+        self.deadline = now + max(self.min_interval, min(delay, self.max_interval))
+
+    def back_off(self, now: float):
+        """Is called when poll request is sent"""
+        self.interval = min(self.interval * self.backoff, self.max_interval)
+        self.deadline = now + self.interval
+
+
 class TaskMentor:
     def __init__(self, task: ExtendedTaskStruct, graph_mentor: 'GraphMentor'):
         self.task = task
         self.task_name = task.task_name
         self.graph_mentor = graph_mentor
         self.backend = graph_mentor.backend
+        self.worker_clients = graph_mentor.worker_clients
         self.instance_info = graph_mentor.instance_info
         self._task_execution_info = self.instance_info.exec_stats.per_task_execution_info[self.task_name]  # type: TaskExecutionInfo
         self._per_host_info = self._task_execution_info.per_host_info
+        self._poll_schedules = {
+            host: graph_mentor.create_poll_schedule() for host in self._per_host_info
+        }  # type: Dict[str, PollSchedule]
         self._dependencies = self.instance_info.structure.deps.get(self.task_name, set())
         self._dependents = self._task_execution_info.dependents
+        self._remaining_deps_count = 0
+        aggregated_state = self._task_execution_info.aggregated_state
+        self._is_done = aggregated_state.is_terminal
+        self._is_failed = aggregated_state.is_failed
 
     def create_direct_refs(self):
         self._dependencies = {
@@ -28,50 +101,179 @@ class TaskMentor:
         self._dependents = {
             self.graph_mentor.task_mentors[_] for _ in self._dependents
         }
+        self._remaining_deps_count = sum(1 for _ in self._dependencies if not _.is_done)
 
-    def get_ready_dependents(self) -> 'List[TaskMentor]':
-        return [_ for _ in self._dependents if _.all_deps_ready]
+    def release_dependents(self) -> 'List[TaskMentor]':
+        """Is called once, when task is done. Decrements remaining dependencies counters of its dependents.
+        :returns dependents that have no more dependencies to wait for
+        """
+        ready_dependents = []
+        for dependent in self._dependents:
+            dependent._remaining_deps_count -= 1
+            if dependent.all_deps_ready and not dependent.is_done:
+                ready_dependents.append(dependent)
+        return ready_dependents
 
     def tick(self):
-        # TODO: use asyncio \ aiohttp instead of sequential requests
+        for _ in self.tick_steps():
+            pass
+
+    def tick_steps(self) -> 'Iterator[List[Future]]':
+        """Performs one tick phase by phase: yields futures of requests, which are sent by a phase, before waiting for
+        them and yields nothing after their answers are merged, so GraphMentor can send requests of all its tasks
+        before waiting for answers.
+        """
         # TODO: handle errors
-        for host, per_host_info in self._per_host_info.items():
-            assert isinstance(per_host_info, TaskOnHostExecutionInfo)
-            client = WorkerApiClient(worker_host=host)
-            if per_host_info.task_id is None:
-                per_host_info.task_id = client.create_task(self.task.task_struct.to_json())
-                per_host_info.state.change_state('idle', force=True)
-                self._save_to_backend()
-            if per_host_info.state.name == TaskState.idle:
-                per_host_info.state.change_state(client.start_task(per_host_info.task_id).name, force=True)
-                self._save_to_backend()
-            if not per_host_info.state.is_terminal:
-                new_state_name = client.get_task_state(per_host_info.task_id).name
-                if new_state_name != per_host_info.state.name:
-                    per_host_info.state.change_state(new_state_name, force=True)
-                    self._save_to_backend()
-                if per_host_info.state.is_failed:
-                    break
+        phases = (
+            (self._send_create_requests, self._on_task_created),
+            (self._send_start_requests, self._on_task_state),
+            (self._send_state_requests, self._on_task_state),
+        )
+        for send_requests, on_result in phases:
+            futures = send_requests()
+            yield list(futures.values())
+            self._merge_results(futures, on_result)
+            yield []
+
+    def _send_create_requests(self) -> 'Dict[str, Future]':
+        hosts_to_create = [host for host, info in self._per_host_info.items() if info.task_id is None]
+        if not hosts_to_create:
+            return {}
+        task_struct = self.task.task_struct.to_json()
+        return {
+            host: self.worker_clients.create_task(host, task_struct, self.graph_mentor.notify_url)
+            for host in hosts_to_create
+        }
+
+    def _send_start_requests(self) -> 'Dict[str, Future]':
+        return {
+            host: self.worker_clients.start_task(host, info.task_id)
+            for host, info in self._per_host_info.items() if info.state.name == TaskState.idle
+        }
+
+    def _send_state_requests(self) -> 'Dict[str, Future]':
+        now = time.time()
+        futures = {}
+        for host, info in self._per_host_info.items():
+            poll_schedule = self._poll_schedules[host]
+            if info.state.is_terminal or now < poll_schedule.deadline:
+                continue
+            poll_schedule.back_off(now)
+            futures[host] = self.worker_clients.get_task_state(host, info.task_id)
+        return futures
+
+    def _merge_results(self, futures: 'Dict[str, Future]',
+                       on_result: 'Callable[[str, Any], bool]'):
+        """Waits for all per-host requests and merges their results into per_host_info.
+        State is saved once if anything has changed. First error (if any) is raised after merging all results.
+        Hosts, which have not answered in time, are not errors: their requests are repeated on a later tick.
+        """
+        changed = False
+        error = None
+        for host, future in futures.items():
+            try:
+                result = future.result()
+            except WorkerRequestTimeout as ex:
+                logging.warning('Request to worker %s for task %s is retried later: %s', host, self.task_name, ex)
+                self._poll_schedules[host].back_off(time.time())
+                continue
+            except Exception as ex:
+                logging.warning('Request to worker %s for task %s failed: %s', host, self.task_name, ex)
+                error = error or ex
+                continue
+            changed = on_result(host, result) or changed
+        if changed:
+            self._update_state()
+            self._save_to_backend()
+        if error is not None:
+            raise error
+
+    def _on_task_created(self, host: str, task_id: str) -> bool:
+        per_host_info = self._per_host_info[host]
+        per_host_info.task_id = task_id
+        per_host_info.state.change_state(TaskState.idle, force=True)
+        self.graph_mentor.register_task(task_id, self, host)
+        return True
+
+    def _on_task_state(self, host: str, new_state: TaskState) -> bool:
+        per_host_info = self._per_host_info[host]
+        if new_state.name == per_host_info.state.name:
+            return False
+        # polled and pushed states can arrive out of order, so a stale one (e.g. running after finished) is ignored,
+        # while intermediate states missed by polling are skipped
+        if not per_host_info.state.can_reach(new_state.name):
+            logging.debug('Ignoring stale state %s of task %s on %s, which is in state %s',
+                          new_state.name, self.task_name, host, per_host_info.state.name)
+            return False
+        per_host_info.state.change_state(new_state.name, force=True)
+        expected_duration = self.task.expected_duration
+        if new_state.name == TaskState.running and expected_duration is not None:
+            self._poll_schedules[host].reset(time.time(), delay=float(expected_duration))
+        else:
+            self._poll_schedules[host].reset(time.time())
+        return True
+
+    def apply_task_state(self, host: str, new_state: TaskState):
+        if self._on_task_state(host, new_state):
+            self._update_state()
+            self._save_to_backend()
+
+    def get_task_ids(self) -> 'Iterator[Tuple[str, str]]':
+        """:returns iterator over pairs of host and task_id for hosts where task is already created"""
+        return ((host, info.task_id) for host, info in self._per_host_info.items() if info.task_id)
 
     def _save_to_backend(self):
-        self.backend.write_graph_instance_info(self.instance_info.instance_id, self.instance_info)
+        self.graph_mentor.writer.mark_dirty(self.task_name)
+
+    def _update_state(self):
+        """Recalculates cached aggregated state after per-host states were changed.
+        Task that became done is reported to GraphMentor, done task never goes back to work.
+        """
+        if self._is_done:
+            return
+        aggregated_state = self._task_execution_info.aggregated_state
+        if aggregated_state.is_terminal:
+            self._is_done = True
+            self._is_failed = aggregated_state.is_failed
+            self.graph_mentor.on_task_done(self)
+
+    @property
+    def next_poll_time(self) -> float:
+        """:returns the earliest poll deadline among hosts where task is not finished yet"""
+        return min((self._poll_schedules[host].deadline for host, info in self._per_host_info.items()
+                    if not info.state.is_terminal), default=float('inf'))
 
     @property
     def all_deps_ready(self) -> bool:
-        return all(_.is_done for _ in self._dependencies)
+        return self._remaining_deps_count == 0
 
     @property
     def is_done(self) -> bool:
-        return self._task_execution_info.aggregated_state.is_terminal
+        return self._is_done
 
     @property
     def is_failed(self) -> bool:
-        return self._task_execution_info.aggregated_state.is_failed
+        return self._is_failed
 
 
 class GraphMentor:
-    def __init__(self, instance_info: GraphInstanceInfo, backend: MasterBackend, shutdown: Event, user_stop: Event):
+    def __init__(self, instance_info: GraphInstanceInfo, backend: MasterBackend, worker_clients: WorkerApiClientPool,
+                 shutdown: Event, user_stop: Event, notify_url: Optional[str] = None, reconcile_interval: float = 30.0,
+                 flush_interval: float = 0.0, min_poll_interval: float = 0.1, max_poll_interval: float = 30.0,
+                 poll_backoff: float = 2.0):
         self.backend = backend
+        self.writer = InstanceWriter(backend, instance_info, flush_interval)
+        self.worker_clients = worker_clients
+        self.notify_url = notify_url
+        self.reconcile_interval = reconcile_interval
+        if notify_url:
+            # states are pushed by workers, polling is only a reconciliation fallback
+            min_poll_interval = max_poll_interval = reconcile_interval
+        self._poll_settings = (min_poll_interval, max_poll_interval, poll_backoff)
+        self._tasks_index = dict()  # type: Dict[str, Tuple[TaskMentor, str]]
+        self._pushed_states = dict()  # type: Dict[str, str]
+        self._pushed_states_lock = Lock()
+        self._done_mentors = []  # type: List[TaskMentor]
         self._shutdown = shutdown
         self._user_stop = user_stop
         self.instance_info = instance_info
@@ -81,6 +283,9 @@ class GraphMentor:
         }  # type: Dict[str, TaskMentor]
         for mentor in self.task_mentors.values():
             mentor.create_direct_refs()
+            for host, task_id in mentor.get_task_ids():
+                self.register_task(task_id, mentor, host)
+        self._failed_count = sum(1 for _ in self.task_mentors.values() if _.is_failed)
         self.working_mentors = {
             task_name: mentor
             for task_name, mentor in self.task_mentors.items()
@@ -88,77 +293,164 @@ class GraphMentor:
         }  # type: Dict[str, TaskMentor]
         assert self.working_mentors or not self.task_mentors, 'Graph has no tasks without dependencies'
 
-    def tick(self):
+    def create_poll_schedule(self) -> PollSchedule:
+        return PollSchedule(*self._poll_settings)
+
+    def register_task(self, task_id: str, mentor: TaskMentor, host: str):
+        self._tasks_index[task_id] = (mentor, host)
+
+    def push_task_states(self, events: 'List[dict]'):
+        """Accepts task state changes pushed by workers. Can be called from any thread, states are applied on tick"""
+        with self._pushed_states_lock:
+            for event in events:
+                self._pushed_states[event['task_id']] = event['state']
+
+    def _apply_pushed_states(self):
+        with self._pushed_states_lock:
+            pushed_states, self._pushed_states = self._pushed_states, dict()
+        for task_id, state_name in pushed_states.items():
+            mentor, host = self._tasks_index.get(task_id, (None, None))
+            if mentor is None or not isinstance(state_name, str) or state_name not in TaskState.links:
+                logging.warning('Skipping pushed state %s for unknown task %s', state_name, task_id)
+                continue
+            mentor.apply_task_state(host, TaskState(state_name))
+
+    def on_task_done(self, mentor: TaskMentor):
+        self._done_mentors.append(mentor)
+        if mentor.is_failed:
+            self._failed_count += 1
+
+    def _schedule_ready_mentors(self) -> 'List[TaskMentor]':
+        """Moves tasks that became done out of working set and puts their newly ready dependents to it.
+        :returns newly ready mentors
+        """
+        done_mentors, self._done_mentors = self._done_mentors, []
         ready_mentors = []
-        new_mentors = dict()
-        for task_name, mentor in self.working_mentors.items():
-            if self._shutdown.is_set() or self._user_stop.is_set():
-                self._stop_execution()
-                return
-            mentor.tick()
-            if mentor.is_done:
-                ready_mentors.append(task_name)
-                if mentor.is_failed:
-                    self._stop_execution()
-                    return
-                new_mentors.update({_.task_name: _ for _ in mentor.get_ready_dependents()})
-        for task_name, mentor in new_mentors.items():
-            self.working_mentors[task_name] = mentor
-        for task_name in ready_mentors:
-            del self.working_mentors[task_name]
+        for mentor in done_mentors:
+            self.working_mentors.pop(mentor.task_name, None)
+            if not mentor.is_failed:
+                ready_mentors.extend(mentor.release_dependents())
+        for mentor in ready_mentors:
+            self.working_mentors[mentor.task_name] = mentor
+        return ready_mentors
+
+    def tick(self):
+        for _ in self.tick_steps():
+            pass
+
+    def tick_steps(self) -> 'Iterator[List[Future]]':
+        """Performs one tick, yields futures of worker requests before waiting for them,
+        so caller can wait for them without blocking a thread
+        """
+        try:
+            yield from self._tick_steps()
+        except Exception:
+            self.writer.flush(force=True)  # do not lose ids of already created tasks
+            raise
+        self.writer.flush()
+
+    def _tick_steps(self) -> 'Iterator[List[Future]]':
+        if self._shutdown.is_set() or self._user_stop.is_set():
+            self._stop_execution()
+            return
+        self._apply_pushed_states()
+        self._schedule_ready_mentors()
+        mentors_to_tick = list(self.working_mentors.values())
+        while mentors_to_tick and not self.is_failed:
+            yield from self._tick_mentors(mentors_to_tick)
+            # newly ready tasks are started right away instead of waiting for the next tick
+            mentors_to_tick = self._schedule_ready_mentors()
+        if self.is_failed:
+            self._stop_execution()
+            return
         if self.is_done:
             self.instance_info.exec_stats.finish_execution(is_failed=False, is_initiated_by_user=False)
             self._save_to_backend()
 
+    @staticmethod
+    def _tick_mentors(mentors: 'List[TaskMentor]') -> 'Iterator[List[Future]]':
+        # all mentors go through tick phases in lockstep, so their requests can be batched per host
+        tick_steps = [mentor.tick_steps() for mentor in mentors]
+        while tick_steps:
+            alive_steps, futures = [], []
+            for steps in tick_steps:
+                step_futures = next(steps, None)
+                if step_futures is not None:
+                    alive_steps.append(steps)
+                    futures.extend(step_futures)
+            tick_steps = alive_steps
+            if futures:
+                yield futures
+
     def _stop_execution(self):
         if not self._shutdown.is_set():
             self.instance_info.exec_stats.finish_execution(is_failed=self.is_failed,
                                                            is_initiated_by_user=self._user_stop.is_set())
-            self._save_to_backend()
+            self.writer.mark_dirty()
+        self.writer.flush(force=True)
         self.working_mentors = {}
 
     def _save_to_backend(self):
-        self.backend.write_graph_instance_info(self.instance_info.instance_id, self.instance_info)
+        # instance has reached terminal state, so it is written right away
+        self.writer.mark_dirty()
+        self.writer.flush(force=True)
 
     @property
     def is_failed(self) -> bool:
-        return any(_.is_failed for _ in self.task_mentors.values())
+        return self._failed_count > 0
 
     @property
     def is_done(self) -> bool:
         return not self.working_mentors
 
+    @property
+    def next_poll_time(self) -> float:
+        return min((_.next_poll_time for _ in self.working_mentors.values()), default=float('inf'))
+
 
-class GraphExecutor(Thread):
-    def __init__(self, instance_id: str, engine: 'Engine'):
-        super().__init__(name='dedalus-exec-{}'.format(instance_id))
+class GraphExecutorBase:
+    def __init__(self, instance_id: str, engine: 'Engine', start_delay: float = 0.0):
         self.instance_id = instance_id
         self.engine = engine
+        self.start_delay = start_delay
         self._user_stop = Event()
         self._shutdown = Event()
-        self.start()
+        self.graph_mentor = None  # type: GraphMentor
 
-    def run(self):
-        logging.debug('Start executing %s', self.instance_id)
-        try:
-            instance_info = self.engine.backend.read_graph_instance_info(self.instance_id)
-            if instance_info.exec_stats.state.idle:
-                instance_info.exec_stats.start_execution()
-                instance_info.exec_stats.init_per_task_execution_info()
-                self.engine.backend.write_graph_instance_info(self.instance_id, instance_info)
-                instance_info = self.engine.backend.read_graph_instance_info(self.instance_id)
-            graph_mentor = GraphMentor(instance_info, self.engine.backend, self._shutdown, self._user_stop)
-            while not graph_mentor.is_done:
-                time.sleep(1)
-                graph_mentor.tick()  # it will switch graph_mentor to is_done to exit on _shutdown and _user_stop Events
-        except Exception as ex:
+    def _create_graph_mentor(self) -> GraphMentor:
+        instance_info = self.engine.backend.read_graph_instance_info(self.instance_id)
+        if instance_info.exec_stats.state.idle:
+            instance_info.exec_stats.start_execution()
+            instance_info.exec_stats.init_per_task_execution_info()
+            self.engine.backend.write_graph_instance_info(self.instance_id, instance_info)
             instance_info = self.engine.backend.read_graph_instance_info(self.instance_id)
-            instance_info.exec_stats.finish_execution(is_failed=True, is_initiated_by_user=False, fail_msg=str(ex))
+        else:
+            # whole instance is rewritten once, so later partial updates work for records of older storage layouts
             self.engine.backend.write_graph_instance_info(self.instance_id, instance_info)
-        finally:
-            with self.engine.instances_lock:
-                del self.engine.running_graphs[self.instance_id]
-            logging.debug('Stop executing %s', self.instance_id)
+        self.graph_mentor = GraphMentor(instance_info, self.engine.backend, self.engine.worker_clients,
+                                        self._shutdown, self._user_stop,
+                                        notify_url=self.engine.get_notify_url(self.instance_id),
+                                        reconcile_interval=self.engine.config.reconcile_interval,
+                                        flush_interval=self.engine.config.flush_interval,
+                                        min_poll_interval=self.engine.config.min_poll_interval,
+                                        max_poll_interval=self.engine.config.max_poll_interval,
+                                        poll_backoff=self.engine.config.poll_backoff)
+        return self.graph_mentor
+
+    def _get_tick_timeout(self) -> float:
+        """:returns seconds to wait till the earliest poll deadline of running tasks, but not more than tick_interval"""
+        timeout = self.graph_mentor.next_poll_time - time.time()
+        return min(max(timeout, 0.0), self.engine.config.tick_interval)
+
+    def _fail_execution(self, ex: Exception):
+        instance_info = self.engine.backend.read_graph_instance_info(self.instance_id, lazy=True)
+        instance_info.exec_stats.finish_execution(is_failed=True, is_initiated_by_user=False, fail_msg=str(ex))
+        self.engine.backend.write_graph_instance_info(self.instance_id, instance_info)
+
+    def _unregister(self):
+        with self.engine.instances_lock:
+            del self.engine.running_graphs[self.instance_id]
+        logging.debug('Stop executing %s', self.instance_id)
 
     def set_state(self, target_state: str) -> GraphInstanceState:
         state = self.engine.backend.read_instance_state(self.instance_id)
@@ -167,26 +459,177 @@ class GraphExecutor(Thread):
         if old_state_name != target_state:
             if target_state == TaskState.stopped:
                 self._user_stop.set()
+                self.wake_up()
             else:
                 self.engine.backend.write_instance_state(self.instance_id, state.name)
         return old_state
 
+    def push_task_states(self, events: 'List[dict]') -> bool:
+        graph_mentor = self.graph_mentor
+        if graph_mentor is None:
+            return False  # not started yet, states will be received by polling
+        graph_mentor.push_task_states(events)
+        self.wake_up()
+        return True
+
+    def wake_up(self):
+        """Makes executor to tick right away instead of waiting for the end of tick interval"""
+        pass
+
     def shutdown(self):
         self._shutdown.set()
+        self.wake_up()
+
+
+class GraphExecutor(GraphExecutorBase, Thread):
+    def __init__(self, instance_id: str, engine: 'Engine', start_delay: float = 0.0):
+        GraphExecutorBase.__init__(self, instance_id, engine, start_delay)
+        Thread.__init__(self, name='dedalus-exec-{}'.format(instance_id))
+        self._wakeup = Event()
+        self.start()
+
+    def wake_up(self):
+        self._wakeup.set()
+
+    def run(self):
+        logging.debug('Start executing %s', self.instance_id)
+        try:
+            if self.start_delay > 0:
+                self._wakeup.wait(self.start_delay)
+                self._wakeup.clear()
+            graph_mentor = self._create_graph_mentor()
+            while not graph_mentor.is_done:
+                self._wakeup.wait(self._get_tick_timeout())
+                self._wakeup.clear()
+                graph_mentor.tick()  # it will switch graph_mentor to is_done to exit on _shutdown and _user_stop Events
+        except Exception as ex:
+            self._fail_execution(ex)
+        finally:
+            self._unregister()
+
+
+class AsyncGraphExecutor(GraphExecutorBase):
+    """Runs GraphMentor as a coroutine on one of the engine's shared event loops.
+    Blocking parts (backend access and sending of worker requests) are offloaded to the engine's fixed-size tick pool,
+    so number of threads does not depend on number of running instances. Answers of workers are awaited on the loop,
+    so a stalled host does not hold a thread of the tick pool.
+    """
+
+    def __init__(self, instance_id: str, engine: 'Engine', start_delay: float = 0.0):
+        super().__init__(instance_id, engine, start_delay)
+        self.loop = engine.event_loops.next_loop()
+        self._wakeup = None  # type: asyncio.Event
+        self.future = asyncio.run_coroutine_threadsafe(self.run(), self.loop)
+
+    def wake_up(self):
+        if self._wakeup is not None:
+            self.loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _wait(self, timeout: float):
+        """Waits for timeout seconds or till wake_up"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _call(self, func, *args):
+        return await self.loop.run_in_executor(self.engine.tick_pool, func, *args)
+
+    async def _tick(self, graph_mentor: GraphMentor):
+        tick_steps = graph_mentor.tick_steps()
+        while True:
+            futures = await self._call(next, tick_steps, None)
+            if futures is None:
+                return
+            # errors are only collected here, they are handled on merge of results
+            await asyncio.gather(*(asyncio.wrap_future(future, loop=self.loop) for future in futures),
+                                 return_exceptions=True)
+
+    async def run(self):
+        logging.debug('Start executing %s', self.instance_id)
+        self._wakeup = asyncio.Event()
+        try:
+            if self.start_delay > 0:
+                await self._wait(self.start_delay)
+            graph_mentor = await self._call(self._create_graph_mentor)
+            while not graph_mentor.is_done:
+                await self._wait(self._get_tick_timeout())
+                await self._tick(graph_mentor)
+        except Exception as ex:
+            await self._call(self._fail_execution, ex)
+        finally:
+            await self._call(self._unregister)
+
+
+class EventLoopPool:
+    """Fixed set of event loops, each one running forever in its own daemon thread"""
+
+    def __init__(self, size: int, name: str = 'dedalus-loop'):
+        self._loops = [asyncio.new_event_loop() for _ in range(size)]
+        self._threads = [
+            Thread(target=self._run_loop, args=(loop,), name='{}-{}'.format(name, idx), daemon=True)
+            for idx, loop in enumerate(self._loops)
+        ]
+        self._next_loop_idx = count()
+        for thread in self._threads:
+            thread.start()
+
+    @staticmethod
+    def _run_loop(loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def next_loop(self) -> asyncio.AbstractEventLoop:
+        return self._loops[next(self._next_loop_idx) % len(self._loops)]
 
 
 class Engine:
-    def __init__(self, backend: MasterBackend):
+    def __init__(self, backend: MasterBackend, config: EngineConfig = None):
         self.backend = backend
+        self.config = config if config is not None else EngineConfig()
         self.instances_lock = Lock()
-        self.running_graphs = dict()  # type: Dict[str, GraphExecutor]
+        self.running_graphs = dict()  # type: Dict[str, GraphExecutorBase]
+        if self.config.batch_worker_requests:
+            self.worker_clients = BatchingWorkerApiClientPool(worker_port=self.config.worker_port,
+                                                              max_concurrency=self.config.worker_rpc_concurrency,
+                                                              batch_window=self.config.worker_batch_window,
+                                                              request_timeout=self.config.worker_request_timeout)
+        else:
+            self.worker_clients = WorkerApiClientPool(worker_port=self.config.worker_port,
+                                                      max_concurrency=self.config.worker_rpc_concurrency,
+                                                      request_timeout=self.config.worker_request_timeout)
+        self.event_loops = None  # type: EventLoopPool
+        self.tick_pool = None  # type: ThreadPoolExecutor
+        if self.config.mode == 'asyncio':
+            self.event_loops = EventLoopPool(self.config.event_loops)
+            self.tick_pool = ThreadPoolExecutor(max_workers=self.config.tick_workers)
         self._spawn_running_graphs()
 
+    def get_notify_url(self, instance_id: str) -> Optional[str]:
+        if not self.config.callback_url:
+            return None
+        return '{}/v1.0/instance/{}/task_states'.format(self.config.callback_url.rstrip('/'), instance_id)
+
+    def notify_task_states(self, instance_id: str, events: 'List[dict]') -> bool:
+        """Passes task state changes pushed by workers to the running instance.
+        :returns bool: False if instance is not running, so states have been ignored
+        """
+        with self.instances_lock:
+            executor = self.running_graphs.get(instance_id)
+        return executor is not None and executor.push_task_states(events)
+
+    def _create_executor(self, instance_id: str, start_delay: float = 0.0) -> GraphExecutorBase:
+        if self.config.mode == 'asyncio':
+            return AsyncGraphExecutor(instance_id, self, start_delay)
+        return GraphExecutor(instance_id, self, start_delay)
+
     def _spawn_running_graphs(self):
         with self.instances_lock:
-            for instance_id, instance_info in self.backend.list_graph_instance_info(with_info=True):
-                if instance_info.exec_stats.state.name == GraphInstanceState.running:
-                    self.running_graphs[instance_id] = GraphExecutor(instance_id, self)
+            instance_ids = list(self.backend.list_graph_instance_ids_by_state(GraphInstanceState.running))
+            for idx, instance_id in enumerate(instance_ids):
+                self.running_graphs[instance_id] = self._create_executor(instance_id,
+                                                                         start_delay=idx * self.config.restart_stagger)
 
     def add_graph_struct(self, graph_name: str, graph_struct: dict) -> int:
         return self.backend.add_graph_struct(graph_name, GraphStruct.create(graph_struct))
@@ -202,16 +645,19 @@ class Engine:
         with self.instances_lock:
             if instance_id in self.running_graphs:
                 return self.running_graphs[instance_id].set_state(state).name
-            instance_info = self.backend.read_graph_instance_info(instance_id)
+            instance_info = self.backend.read_graph_instance_info(instance_id, lazy=True)
             old_state = instance_info.exec_stats.state.change_state(state)  # check state transition validity
+            if instance_info.exec_stats.state.is_terminal:
+                instance_info.exec_stats.finish_time.set_to_now()  # age of stopped instance is counted from it
             if state != GraphInstanceState.running:  # check if we need to create run a task
                 self.backend.write_graph_instance_info(instance_id, instance_info)
             else:
                 assert state == GraphInstanceState.running
-                self.running_graphs[instance_id] = GraphExecutor(instance_id, self)
+                self.running_graphs[instance_id] = self._create_executor(instance_id)
             return old_state.name
 
     def shutdown(self):
         with self.instances_lock:
             for runner in self.running_graphs.values():
                 runner.shutdown()
+        self.worker_clients.shutdown()
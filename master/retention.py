@@ -0,0 +1,36 @@
+from typing import Iterable
+
+from common.models.state import GraphInstanceState
+from common.retention import RetentionCandidate, RetentionConfig, RetentionService
+from master.backend import InstanceFilter, MasterBackend
+from master.engine import Engine
+
+
+class InstanceRetentionService(RetentionService):
+    """Removes graph instances in terminal states, grouping them by graph name for max_count"""
+    archive_name = 'instances'
+
+    def __init__(self, backend: MasterBackend, engine: Engine, config: RetentionConfig) -> None:
+        self.backend = backend
+        self.engine = engine
+        super().__init__(config, name='dedalus-master-retention')
+
+    def _list_candidates(self) -> 'Iterable[RetentionCandidate]':
+        for state in (GraphInstanceState.finished, GraphInstanceState.failed, GraphInstanceState.stopped):
+            for instance_id, instance_info in self.backend.find_graph_instance_info(InstanceFilter(state=state),
+                                                                                    with_info=True):
+                if instance_info is None or instance_id in self.engine.running_graphs:
+                    continue  # instance can be finished, but still not unregistered by its executor
+                exec_stats = instance_info.exec_stats
+                yield RetentionCandidate(instance_id, instance_info.structure.graph_name,
+                                         exec_stats.finish_time.to_json(), exec_stats.state.is_failed)
+
+    def _read_record(self, record_id: str) -> dict:
+        return self.backend.read_graph_instance_info(record_id, lazy=True).to_json()
+
+    def _remove(self, record_id: str) -> int:
+        self.backend.delete_graph_instance_info(record_id)
+        return 0
+
+    def _compact(self) -> int:
+        return self.backend.compact()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+"""Measures size of stored values and encoding/decoding speed of tuned_leveldb value formats
+on graph structs and started graph instances built from demo graphs.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable
+
+from common.models.graph import GraphInstanceInfo, GraphStruct
+from util.tuned_leveldb import COMPRESSORS, LevelDB, ValueFormat
+
+
+def measure(func: Callable, repeats: int) -> float:
+    """:returns average latency of func in us"""
+    start = time.time()
+    for _ in range(repeats):
+        func()
+    return (time.time() - start) * 1e6 / repeats
+
+
+class LegacyFormat:
+    """Plain json text, as values were stored before codecs existed"""
+
+    @staticmethod
+    def encode(value) -> bytes:
+        return json.dumps(value, ensure_ascii=False).encode()
+
+    decode = staticmethod(ValueFormat.decode)
+
+
+def make_formats(compress_threshold: int) -> dict:
+    formats = {'legacy json': LegacyFormat()}
+    for codec in ('json', 'marshal'):
+        formats[codec] = ValueFormat(codec)
+        for compression in sorted(COMPRESSORS):
+            formats['{}+{}'.format(codec, compression)] = ValueFormat(codec, compression, compress_threshold)
+    return formats
+
+
+def make_samples(graph_path: str) -> dict:
+    with open(graph_path) as graph_file:
+        graph_json = json.load(graph_file)
+    instance_info = GraphInstanceInfo()
+    instance_info.instance_id = 'bench'
+    instance_info.structure = GraphStruct.create(graph_json)
+    instance_info.exec_stats.start_execution()
+    instance_info.exec_stats.init_per_task_execution_info()
+    return {
+        'struct': GraphStruct.create(graph_json).to_json(),
+        'instance': instance_info.to_json(),
+    }
+
+
+def measure_db(value_format, value, records: int) -> float:
+    """:returns average latency of reading one record by range iteration over leveldb in us"""
+    db = LevelDB(tempfile.mkdtemp(prefix='dedalus-bench-'), value_format=ValueFormat())
+    db.value_format = value_format
+    for idx in range(records):
+        db.put('{:06d}'.format(idx), value, sync=False)
+    start = time.time()
+    for _ in db.iterate_all():
+        pass
+    return (time.time() - start) * 1e6 / records
+
+
+def main(args):
+    formats = make_formats(args.compress_threshold)
+    print('{:>18} {:>9} {:>14} {:>10} {:>12} {:>12} {:>12}'.format('graph', 'value', 'format', 'size, B',
+                                                                   'encode, us', 'decode, us', 'db read, us'))
+    for graph_path in args.graphs:
+        for value_name, value in sorted(make_samples(graph_path).items()):
+            for format_name, value_format in formats.items():
+                data = value_format.encode(value)
+                assert value_format.decode(data) == value
+                print('{:>18} {:>9} {:>14} {:>10} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+                    os.path.basename(graph_path), value_name, format_name, len(data),
+                    measure(lambda: value_format.encode(value), args.repeats),
+                    measure(lambda: value_format.decode(data), args.repeats),
+                    measure_db(value_format, value, args.records),
+                ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graphs', help='Graph structs to build values from', nargs='+',
+                        default=['master/tests/demo_ok_simple.json', 'master/tests/demo_ok_big.json',
+                                 'master/tests/demo_ok_jumbo.json'])
+    parser.add_argument('--repeats', help='Number of measured calls', default=100, type=int)
+    parser.add_argument('--records', help='Number of records read from leveldb', default=100, type=int)
+    parser.add_argument('--compress-threshold', help='Min size of compressed values in bytes', default=4096, type=int)
+    main(parser.parse_args())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+"""Measures construction, parsing (eager and lazy), serialization and verification speed of util.config models:
+GraphStruct and GraphInstanceInfo built from a demo graph, and TaskInfo of one of its tasks.
+"""
+import argparse
+import json
+import time
+from typing import Callable
+
+from common.models.graph import GraphStruct, GraphInstanceInfo
+from common.models.task import TaskInfo
+
+
+def measure(func: Callable, repeats: int) -> float:
+    """:returns average latency of func in us"""
+    start = time.time()
+    for _ in range(repeats):
+        func()
+    return (time.time() - start) * 1e6 / repeats
+
+
+def make_samples(graph_json: dict) -> dict:
+    graph_struct = GraphStruct.create(graph_json)
+    instance_info = GraphInstanceInfo()
+    instance_info.instance_id = 'bench'
+    instance_info.structure = GraphStruct.create(graph_json)
+    instance_info.exec_stats.start_execution()
+    instance_info.exec_stats.init_per_task_execution_info()
+    task_info = TaskInfo.create({'task_id': 'bench', 'structure': graph_json['tasks'][0]['task_struct']})
+    task_info.exec_stats.start_preparation()
+    return {
+        'GraphStruct': graph_struct.to_json(),
+        'GraphInstanceInfo': instance_info.to_json(),
+        'TaskInfo': task_info.to_json(),
+    }
+
+
+MODELS = {
+    'GraphStruct': GraphStruct,
+    'GraphInstanceInfo': GraphInstanceInfo,
+    'TaskInfo': TaskInfo,
+}
+
+
+def main(args):
+    with open(args.graph) as graph_file:
+        samples = make_samples(json.load(graph_file))
+    print('{:>18} {:>12} {:>12} {:>12} {:>12} {:>12}'.format('model', 'new, us', 'create, us', 'lazy, us',
+                                                             'to_json, us', 'verify, us'))
+    for name, model in sorted(MODELS.items()):
+        sample = model.create(samples[name]).to_json()  # times are stored with seconds precision
+        obj = model.create(sample)
+        assert obj.to_json() == sample
+        assert model.create(sample, lazy=True).to_json() == sample
+        print('{:>18} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f}'.format(
+            name,
+            measure(model, args.repeats),
+            measure(lambda: model.create(sample), args.repeats),
+            measure(lambda: model.create(sample, lazy=True), args.repeats),
+            measure(obj.to_json, args.repeats),
+            measure(obj.verify, args.repeats),
+        ))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graph', help='Graph struct to build models from', default='master/tests/demo_ok_jumbo.json')
+    parser.add_argument('--repeats', help='Number of measured calls', default=200, type=int)
+    main(parser.parse_args())
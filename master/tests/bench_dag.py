@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+"""Measures GraphMentor scheduling overhead on synthetic wide, deep and layered DAGs.
+Workers are replaced by an in-process pool, which finishes every task right on start,
+so the whole graph is executed by a single tick and time is spent in master only.
+"""
+import argparse
+import random
+import tempfile
+import time
+from concurrent.futures import Future
+from itertools import count
+from threading import Event
+from typing import Dict, List, Optional
+
+from common.models.graph import GraphInstanceInfo
+from common.models.state import TaskState
+from master.engine import GraphMentor
+from plugins.backends.leveldb_backend import MasterLevelDBBackend
+
+
+class InstantWorkerPool:
+    """Stand-in for WorkerApiClientPool: answers are ready right away and every started task is finished"""
+
+    def __init__(self):
+        self._ids = count()
+        self.requests_count = 0
+
+    def _done(self, result) -> Future:
+        self.requests_count += 1
+        future = Future()
+        future.set_result(result)
+        return future
+
+    def create_task(self, host: str, task_struct: dict, notify_url: Optional[str] = None) -> Future:
+        return self._done('task{}'.format(next(self._ids)))
+
+    def start_task(self, host: str, task_id: str) -> Future:
+        return self._done(TaskState(TaskState.finished))
+
+    def get_task_state(self, host: str, task_id: str) -> Future:
+        return self._done(TaskState(TaskState.finished))
+
+    def shutdown(self):
+        pass
+
+
+def wide_deps(tasks_count: int) -> 'Dict[str, List[str]]':
+    """One root, all other tasks but the last depend on it, the last one depends on all of them"""
+    middle = ['task{}'.format(idx) for idx in range(1, tasks_count - 1)]
+    deps = {name: ['task0'] for name in middle}
+    deps['task{}'.format(tasks_count - 1)] = middle
+    return deps
+
+
+def deep_deps(tasks_count: int) -> 'Dict[str, List[str]]':
+    """Chain of tasks"""
+    return {'task{}'.format(idx): ['task{}'.format(idx - 1)] for idx in range(1, tasks_count)}
+
+
+def layered_deps(tasks_count: int, width: int = 100, fan_in: int = 3) -> 'Dict[str, List[str]]':
+    """Layers of `width` tasks, every task depends on `fan_in` random tasks of the previous layer"""
+    rnd = random.Random(tasks_count)
+    deps = {}
+    for idx in range(width, tasks_count):
+        layer_start = (idx // width - 1) * width
+        prev_layer = range(layer_start, layer_start + width)
+        deps['task{}'.format(idx)] = ['task{}'.format(_) for _ in rnd.sample(prev_layer, fan_in)]
+    return deps
+
+
+SHAPES = {
+    'wide': wide_deps,
+    'deep': deep_deps,
+    'layered': layered_deps,
+}
+
+
+def make_instance(shape: str, tasks_count: int) -> GraphInstanceInfo:
+    instance_info = GraphInstanceInfo.create({
+        'instance_id': 'dag-{}-{}'.format(shape, tasks_count),
+        'structure': {
+            'graph_name': 'bench_dag',
+            'clusters': {'all': ['localhost']},
+            'tasks': [{'task_name': 'task{}'.format(idx), 'hosts': ['all']} for idx in range(tasks_count)],
+            'deps': SHAPES[shape](tasks_count),
+        },
+    })
+    instance_info.exec_stats.start_execution()
+    instance_info.exec_stats.init_per_task_execution_info()
+    return instance_info
+
+
+def main(args):
+    backend = MasterLevelDBBackend({'db_path': tempfile.mkdtemp(prefix='dedalus-bench-')})
+    print('{:>8} {:>8} {:>10} {:>10} {:>14} {:>10}'.format('shape', 'tasks', 'init, ms', 'tick, ms', 'us per task',
+                                                           'requests'))
+    for shape in args.shapes:
+        for tasks_count in args.tasks:
+            instance_info = make_instance(shape, tasks_count)
+            pool = InstantWorkerPool()
+            start = time.time()
+            mentor = GraphMentor(instance_info, backend, pool, shutdown=Event(), user_stop=Event(),
+                                 flush_interval=3600.0)
+            init_time = time.time() - start
+            start = time.time()
+            mentor.tick()
+            tick_time = time.time() - start
+            assert mentor.is_done and not mentor.is_failed
+            print('{:>8} {:>8} {:>10.1f} {:>10.1f} {:>14.1f} {:>10}'.format(shape, tasks_count, init_time * 1000,
+                                                                           tick_time * 1000,
+                                                                           tick_time * 1e6 / tasks_count,
+                                                                           pool.requests_count))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shapes', help='DAG shapes to measure', default=sorted(SHAPES), choices=sorted(SHAPES),
+                        nargs='+')
+    parser.add_argument('--tasks', help='Task counts to measure', default=[1000, 5000, 20000], type=int, nargs='+')
+    main(parser.parse_args())
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+"""Measures GraphMentor tick latency, number of worker requests and number of backend writes
+against number of hosts tasks are fanned out to.
+Every host is served by the same local stand-in worker, bound to all 127.0.0.0/8 addresses.
+"""
+import argparse
+import tempfile
+import time
+from threading import Event
+from typing import Tuple
+
+from common.models.graph import GraphInstanceInfo
+from master.engine import GraphMentor
+from master.tests.standin_worker import StandinWorker, StandinWorkerState
+from plugins.backends.leveldb_backend import MasterLevelDBBackend
+from worker.api_client import WorkerApiClientPool, BatchingWorkerApiClientPool
+
+
+def make_instance(instance_id: str, hosts_count: int, tasks_count: int) -> GraphInstanceInfo:
+    hosts = ['127.0.{}.{}'.format(idx // 250, idx % 250 + 1) for idx in range(hosts_count)]
+    instance_info = GraphInstanceInfo.create({
+        'instance_id': instance_id,
+        'structure': {
+            'graph_name': 'bench_fanout',
+            'clusters': {'all': hosts},
+            'tasks': [{'task_name': 'task{}'.format(idx), 'hosts': ['all']} for idx in range(tasks_count)],
+        },
+    })
+    instance_info.exec_stats.start_execution()
+    instance_info.exec_stats.init_per_task_execution_info()
+    return instance_info
+
+
+def bench_tick(backend, clients: WorkerApiClientPool, hosts_count: int, tasks_count: int) -> 'Tuple[float, int]':
+    instance_info = make_instance('fanout-{}-{}'.format(hosts_count, tasks_count), hosts_count, tasks_count)
+    mentor = GraphMentor(instance_info, backend, clients, shutdown=Event(), user_stop=Event())
+    start = time.time()
+    mentor.tick()  # create, start and poll state of every task on every host
+    return time.time() - start, mentor.writer.writes_count
+
+
+def make_clients(args, concurrency: int) -> WorkerApiClientPool:
+    if args.batch_window is not None:
+        return BatchingWorkerApiClientPool(worker_port=args.port, max_concurrency=concurrency,
+                                           batch_window=args.batch_window / 1000.0)
+    return WorkerApiClientPool(worker_port=args.port, max_concurrency=concurrency)
+
+
+def main(args):
+    state = StandinWorkerState(latency=args.latency / 1000.0)
+    worker = StandinWorker(args.port, state)
+    backend = MasterLevelDBBackend({'db_path': tempfile.mkdtemp(prefix='dedalus-bench-')})
+    print('{:>8} {:>8} {:>12} {:>14} {:>10} {:>8}'.format('hosts', 'tasks', 'concurrency', 'tick, ms', 'requests',
+                                                         'writes'))
+    try:
+        for hosts_count in args.hosts:
+            for concurrency in args.concurrency:
+                clients = make_clients(args, concurrency)
+                requests_before = state.requests_count
+                latency, writes_count = bench_tick(backend, clients, hosts_count, args.tasks)
+                clients.shutdown()
+                print('{:>8} {:>8} {:>12} {:>14.1f} {:>10} {:>8}'.format(hosts_count, args.tasks, concurrency,
+                                                                         latency * 1000,
+                                                                         state.requests_count - requests_before,
+                                                                         writes_count))
+    finally:
+        worker.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', help='Port for stand-in worker', default=18081, type=int)
+    parser.add_argument('--latency', help='Simulated worker latency per request, ms', default=5.0, type=float)
+    parser.add_argument('--hosts', help='Host counts to measure', default=[1, 10, 50, 100, 500], type=int, nargs='+')
+    parser.add_argument('--tasks', help='Number of tasks running on every host', default=1, type=int)
+    parser.add_argument('--concurrency', help='Concurrency limits to measure', default=[1, 32], type=int, nargs='+')
+    parser.add_argument('--batch-window', help='If set, batch requests per host during this window, ms',
+                        default=None, type=float)
+    main(parser.parse_args())
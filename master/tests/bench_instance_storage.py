@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+"""Measures database size and latency of writing and reading graph instances launched from the same graph revision,
+with structures stored by reference to the revision and as a copy in every instance.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from common.models.graph import GraphInstanceInfo, GraphStruct
+from plugins.backends.leveldb_backend import MasterLevelDBBackend
+
+
+def get_dir_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def main(args):
+    with open(args.graph) as graph_file:
+        graph_json = json.load(graph_file)
+    print('{:>10} {:>10} {:>10} {:>12} {:>12}'.format('mode', 'instances', 'db, KiB', 'write, ms', 'read, ms'))
+    for by_reference in (False, True):
+        db_path = tempfile.mkdtemp(prefix='dedalus-bench-')
+        backend = MasterLevelDBBackend({
+            'db_path': db_path,
+            'store_structs_by_reference': by_reference,
+            'value_format': {'codec': args.codec, 'compression': args.compression},
+        })
+        backend.add_graph_struct('bench', GraphStruct.create(graph_json))
+        structure = backend.read_graph_struct('bench')
+        start = time.time()
+        for idx in range(args.instances):
+            instance_info = GraphInstanceInfo()
+            instance_info.instance_id = str(idx)
+            instance_info.structure = structure
+            instance_info.exec_stats.start_execution()
+            instance_info.exec_stats.init_per_task_execution_info()
+            backend.write_graph_instance_info(instance_info.instance_id, instance_info)
+        write_latency = (time.time() - start) * 1000 / args.instances
+        start = time.time()
+        for idx in range(args.instances):
+            backend.read_graph_instance_info(str(idx))
+        read_latency = (time.time() - start) * 1000 / args.instances
+        print('{:>10} {:>10} {:>10} {:>12.3f} {:>12.3f}'.format('reference' if by_reference else 'copy',
+                                                                args.instances, get_dir_size(db_path) // 1024,
+                                                                write_latency, read_latency))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graph', help='Graph struct to launch', default='master/tests/demo_ok_jumbo.json')
+    parser.add_argument('--instances', help='Number of launched instances', default=500, type=int)
+    parser.add_argument('--codec', help='Codec of stored values', default='marshal')
+    parser.add_argument('--compression', help='Compression of large stored values', default=None)
+    main(parser.parse_args())
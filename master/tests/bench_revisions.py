@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""Measures latency of reading the latest graph revision and of adding a new one against number of revisions"""
+import argparse
+import json
+import tempfile
+import time
+
+from common.models.graph import GraphStruct
+from plugins.backends.leveldb_backend import MasterLevelDBBackend
+
+
+def measure(func, repeats: int) -> float:
+    """:returns average latency of func in ms"""
+    start = time.time()
+    for _ in range(repeats):
+        func()
+    return (time.time() - start) * 1000 / repeats
+
+
+def main(args):
+    backend = MasterLevelDBBackend({'db_path': tempfile.mkdtemp(prefix='dedalus-bench-')})
+    with open(args.graph) as graph_file:
+        graph_json = json.load(graph_file)
+    print('{:>10} {:>12} {:>12}'.format('revisions', 'read, ms', 'add, ms'))
+    revisions_count = 0
+    for target_count in sorted(args.revisions):
+        while revisions_count < target_count:
+            backend.add_graph_struct('bench', GraphStruct.create(graph_json))
+            revisions_count += 1
+        read_latency = measure(lambda: backend.read_graph_struct('bench'), args.repeats)
+        add_latency = measure(lambda: backend.add_graph_struct('bench', GraphStruct.create(graph_json)), args.repeats)
+        revisions_count += args.repeats
+        print('{:>10} {:>12.3f} {:>12.3f}'.format(target_count, read_latency, add_latency))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--graph', help='Graph struct to store', default='master/tests/demo_ok_big.json')
+    parser.add_argument('--revisions', help='Revision counts to measure', default=[10, 100, 1000, 5000], type=int,
+                        nargs='+')
+    parser.add_argument('--repeats', help='Number of measured calls', default=20, type=int)
+    main(parser.parse_args())
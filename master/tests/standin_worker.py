@@ -0,0 +1,134 @@
+"""Minimal in-process stand-in for worker API, used by benchmarks.
+Every task switches to finished state after `task_duration` seconds since start.
+If task is created with notify_url, this state change is pushed to it.
+Listens on all local addresses, so hosts 127.0.0.1, 127.0.0.2, ... can be used as different workers.
+"""
+import json
+import re
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread, Timer
+from urllib.parse import parse_qs
+from uuid import uuid4
+
+import requests
+
+
+class StandinWorkerState:
+    def __init__(self, latency: float = 0.0, task_duration: float = 0.0):
+        self.latency = latency
+        self.task_duration = task_duration
+        self.tasks = dict()
+        self.notify_urls = dict()
+        self.requests_count = 0
+        self.lock = Lock()
+
+    def create_task(self, task_struct: dict, notify_url: str = None) -> str:
+        task_id = uuid4().hex
+        with self.lock:
+            self.tasks[task_id] = ('idle', None)
+            if notify_url:
+                self.notify_urls[task_id] = notify_url
+        return task_id
+
+    def start_task(self, task_id: str) -> str:
+        with self.lock:
+            self.tasks[task_id] = ('preparing', time.time())
+            notify_url = self.notify_urls.get(task_id)
+        if notify_url:
+            Timer(self.task_duration, self._push_state, args=(notify_url, task_id, 'finished')).start()
+        return 'preparing'
+
+    @staticmethod
+    def _push_state(notify_url: str, task_id: str, state: str):
+        requests.post(notify_url, json={'events': [{'task_id': task_id, 'state': state}]})
+
+    def get_task_state(self, task_id: str) -> str:
+        with self.lock:
+            state, start_time = self.tasks[task_id]
+        if state == 'preparing' and time.time() - start_time >= self.task_duration:
+            return 'finished'
+        return state
+
+
+class StandinWorkerHandler(BaseHTTPRequestHandler):
+    routes = [
+        ('POST', re.compile(r'^/v1\.0/task/$'), 'create_task'),
+        ('POST', re.compile(r'^/v1\.0/task/(?P<task_id>\w+)/start$'), 'start_task'),
+        ('GET', re.compile(r'^/v1\.0/task/(?P<task_id>\w+)/state$'), 'get_task_state'),
+        ('POST', re.compile(r'^/v1\.0/tasks/batch/create$'), 'create_tasks'),
+        ('POST', re.compile(r'^/v1\.0/tasks/batch/start$'), 'start_tasks'),
+        ('POST', re.compile(r'^/v1\.0/tasks/batch/state$'), 'get_tasks_state'),
+    ]
+
+    @property
+    def state(self) -> StandinWorkerState:
+        return self.server.state
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, code: int, status: str, payload):
+        body = json.dumps({'status': status, 'payload': payload}).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _dispatch(self, method: str):
+        with self.state.lock:
+            self.state.requests_count += 1
+        if self.state.latency:
+            time.sleep(self.state.latency)
+        length = int(self.headers.get('Content-Length') or 0)
+        args = json.loads(self.rfile.read(length).decode()) if length else {}
+        path, _, query = self.path.partition('?')
+        args.update({k: v[0] for k, v in parse_qs(query).items()})
+        for route_method, route, handler in self.routes:
+            match = route.match(path)
+            if route_method == method and match:
+                return self._reply(200, 'ok', getattr(self, handler)(args, **match.groupdict()))
+        self._reply(404, 'error', {'error': 'Not found', 'path': path})
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def create_task(self, args: dict):
+        notify_url = args.pop('notify_url', None)
+        return {'task_id': self.state.create_task(args, notify_url)}
+
+    def start_task(self, args: dict, task_id: str):
+        return {'prev_state': 'idle', 'new_state': self.state.start_task(task_id)}
+
+    def get_task_state(self, args: dict, task_id: str):
+        return {'state': self.state.get_task_state(task_id)}
+
+    def create_tasks(self, args: dict):
+        return {'task_ids': [self.state.create_task(_, args.get('notify_url')) for _ in args['tasks']], 'errors': {}}
+
+    def start_tasks(self, args: dict):
+        new_states = {_: self.state.start_task(_) for _ in args['task_ids']}
+        return {'prev_states': {_: 'idle' for _ in new_states}, 'new_states': new_states, 'errors': {}}
+
+    def get_tasks_state(self, args: dict):
+        return {'states': {_: self.state.get_task_state(_) for _ in args['task_ids']}, 'errors': {}}
+
+
+class StandinWorker(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, port: int, state: StandinWorkerState):
+        super().__init__(('', port), StandinWorkerHandler)
+        self.state = state
+        self._thread = Thread(target=self.serve_forever, name='standin-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,214 @@
+import gc
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from common.models.graph import GraphInstanceInfo, GraphStruct
+from master.backend import InstanceFilter
+from plugins.backends.leveldb_backend import GRAPHS_LAYOUT_VERSION, INSTANCE_INDEXES_VERSION, MasterLevelDBBackend
+from util.pagination import InvalidCursor
+from util.tuned_leveldb import CODECS, COMPRESSORS, LevelDB, ValueFormat
+
+GRAPH_PATH = os.path.join(os.path.dirname(__file__), 'simple_graph.json')
+
+
+def make_graph_json(graph_name: str, revision: int) -> dict:
+    with open(GRAPH_PATH) as graph_file:
+        graph_struct = GraphStruct.create(json.load(graph_file))
+    graph_struct.graph_name = graph_name
+    graph_struct.revision = revision
+    return graph_struct.to_json()
+
+
+def make_instance_json(instance_id: str, graph_json: dict, running: bool = False) -> dict:
+    instance_info = GraphInstanceInfo.create({'instance_id': instance_id, 'structure': graph_json})
+    instance_info.exec_stats.init_per_task_execution_info()
+    if running:
+        instance_info.exec_stats.start_execution()
+    # times are stored with second precision
+    return GraphInstanceInfo.create(instance_info.to_json()).to_json()
+
+
+class LevelDBTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db_path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        gc.collect()  # database is unlocked, when its object is freed
+        shutil.rmtree(self.db_path)
+
+
+class ValueFormatTest(LevelDBTestCase):
+    values = {
+        'small': {'state': 'running', 'retcode': None, 'ok': True},
+        'large': {'items': [{'task_name': str(idx), 'hosts': ['host-{}'.format(idx)] * 4} for idx in range(100)]},
+        'text': 'юникод',
+    }
+
+    def test_legacy_json_values(self):
+        db = LevelDB(self.db_path)
+        for key, value in self.values.items():
+            db.db.Put(('items=' + key).encode(), json.dumps(value).encode())  # written before codecs existed
+        items = db.collection_view('items')
+        self.assertEqual(items.get('small'), self.values['small'])
+        self.assertEqual(dict(items.iterate_all()), self.values)
+
+    def test_all_codecs_and_compressions(self):
+        for codec in sorted(CODECS):
+            for compression in [None] + sorted(COMPRESSORS):
+                with self.subTest(codec=codec, compression=compression):
+                    db = LevelDB(self.db_path, value_format=ValueFormat(codec, compression, compress_threshold=64))
+                    items = db.collection_view('{}-{}'.format(codec, compression))
+                    for key, value in self.values.items():
+                        items.put(key, value)
+                    self.assertEqual(items.get('large'), self.values['large'])
+                    self.assertEqual(dict(items.iterate_all()), self.values)
+                    del db, items
+                    gc.collect()
+        # values of every format are read by a database with any other format
+        db = LevelDB(self.db_path, value_format=ValueFormat('json'))
+        collections = {key.split('=', 1)[0] for key, _ in db.iterate_all(include_value=False)}
+        self.assertEqual(len(collections), len(CODECS) * (len(COMPRESSORS) + 1))
+        for collection in collections:
+            self.assertEqual(dict(db.collection_view(collection).iterate_all()), self.values)
+
+    def test_large_values_are_compressed(self):
+        for compression in sorted(COMPRESSORS):
+            value_format = ValueFormat('json', compression, compress_threshold=64)
+            encoded = value_format.encode(self.values['large'])
+            self.assertLess(len(encoded), len(json.dumps(self.values['large'])))
+            self.assertEqual(ValueFormat.decode(encoded), self.values['large'])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ValueFormat('pickle')
+        with self.assertRaises(ValueError):
+            ValueFormat('json', 'bzip2')
+        with self.assertRaises(ValueError):
+            ValueFormat.decode(bytes((0, 99, 0)) + b'{}')
+
+    def test_nested_view_range(self):
+        db = LevelDB(self.db_path)
+        graphs = db.collection_view('graphs')
+        for graph_name in ('a', 'b', 'c'):
+            for revision in range(3):
+                graphs.collection_view(graph_name).put(str(revision), {'revision': revision})
+        graphs.collection_view('b').put('2', {'revision': 2})
+        self.assertEqual([key for key, _ in graphs.collection_view('b').iterate_all(key_from='1')], ['1', '2'])
+        self.assertEqual([key for key, _ in graphs.collection_view('b').iterate_all(key_to='1')], ['0', '1'])
+        self.assertEqual(len(list(graphs.iterate_all(key_from='b=1', key_to='c=0'))), 3)
+
+
+class MigrationTest(LevelDBTestCase):
+    def write_legacy_db(self):
+        """Writes graph structs with not padded revision keys and whole instances as plain json, without meta"""
+        db = LevelDB(self.db_path)
+        for revision in (0, 1, 2, 10):
+            db.db.Put('graphs=g={}'.format(revision).encode(), json.dumps(make_graph_json('g', revision)).encode())
+        db.db.Put(b'graphs=h=0', json.dumps(make_graph_json('h', 0)).encode())
+        self.instances = {
+            'idle': make_instance_json('idle', make_graph_json('g', 1)),
+            'running': make_instance_json('running', make_graph_json('g', 10), running=True),
+        }
+        for instance_id, instance_json in self.instances.items():
+            db.db.Put('instances={}'.format(instance_id).encode(), json.dumps(instance_json).encode())
+
+    def test_graphs_layout(self):
+        self.write_legacy_db()
+        backend = MasterLevelDBBackend({'db_path': self.db_path})
+        self.assertEqual(backend.meta.get('graphs'), {'version': GRAPHS_LAYOUT_VERSION})
+        self.assertEqual(backend.read_graph_struct('g').revision, 10)
+        self.assertEqual(backend.read_graph_struct('g', 2).revision, 2)
+        self.assertEqual([(name, revision) for name, revision, _ in backend.list_graph_struct()],
+                         [('g', 0), ('g', 1), ('g', 2), ('g', 10), ('h', 0)])
+        self.assertEqual(backend.add_graph_struct('g', GraphStruct.create(make_graph_json('g', 0))), 11)
+        self.assertEqual(backend.add_graph_struct('h', GraphStruct.create(make_graph_json('h', 0))), 1)
+        del backend
+        gc.collect()
+        backend = MasterLevelDBBackend({'db_path': self.db_path})  # migration is not repeated
+        self.assertEqual(backend.read_graph_struct('g').revision, 11)
+        self.assertEqual(len(list(backend.list_graph_struct('g'))), 5)
+
+    def test_instance_indexes(self):
+        self.write_legacy_db()
+        backend = MasterLevelDBBackend({'db_path': self.db_path})
+        self.assertEqual(backend.meta.get('instance_indexes'), {'version': INSTANCE_INDEXES_VERSION})
+        self.assertEqual(list(backend.list_graph_instance_ids_by_state('running')), ['running'])
+        found = backend.find_graph_instance_info(InstanceFilter(graph_name='g', revision=1))
+        self.assertEqual([instance_id for instance_id, _ in found], ['idle'])
+        found = backend.find_graph_instance_info(InstanceFilter(started_after=0))
+        self.assertEqual([instance_id for instance_id, _ in found], ['running'])
+
+    def test_whole_instances_are_read_and_rewritten_in_parts(self):
+        self.write_legacy_db()
+        backend = MasterLevelDBBackend({'db_path': self.db_path})
+        for instance_id, instance_json in self.instances.items():
+            self.assertEqual(backend.read_graph_instance_info(instance_id).to_json(), instance_json)
+        instance_info = backend.read_graph_instance_info('idle')
+        instance_info.exec_stats.start_execution()
+        backend.write_graph_instance_info('idle', instance_info)
+        self.assertNotIn('structure', backend.instances.get('idle'))
+        self.assertEqual(backend.read_graph_instance_info('idle').to_json(),
+                         GraphInstanceInfo.create(instance_info.to_json()).to_json())
+        self.assertEqual(backend.read_instance_state('idle').name, 'running')
+        self.assertEqual(sorted(backend.list_graph_instance_ids_by_state('running')), ['idle', 'running'])
+        self.assertEqual(list(backend.list_graph_instance_ids_by_state('idle')), [])
+
+
+class CursorTest(LevelDBTestCase):
+    def setUp(self):
+        super().setUp()
+        self.backend = MasterLevelDBBackend({'db_path': self.db_path})
+        for graph_name in ('a', 'b'):
+            for _ in range(5):
+                self.backend.add_graph_struct(graph_name, GraphStruct.create(make_graph_json(graph_name, 0)))
+        for idx in range(7):
+            graph_json = self.backend.read_graph_struct('a', idx % 5).to_json()
+            instance_info = GraphInstanceInfo.create(make_instance_json('i{}'.format(idx), graph_json,
+                                                                        running=idx % 2 == 0))
+            self.backend.write_graph_instance_info(instance_info.instance_id, instance_info)
+
+    def read_pages(self, read_page, limit: int) -> list:
+        pages = []
+        cursor = None
+        while True:
+            items, cursor = read_page(limit, cursor)
+            pages.append(items)
+            if cursor is None:
+                return pages
+
+    def test_graph_pages(self):
+        pages = self.read_pages(lambda limit, cursor: self.backend.list_graph_struct_page(None, limit, cursor), 3)
+        self.assertEqual([len(_) for _ in pages], [3, 3, 3, 1])
+        self.assertEqual([(name, revision) for page in pages for name, revision, _ in page],
+                         [(name, revision) for name, revision, _ in self.backend.list_graph_struct()])
+        pages = self.read_pages(lambda limit, cursor: self.backend.list_graph_struct_page('b', limit, cursor), 5)
+        self.assertEqual([len(_) for _ in pages], [5, 0])
+
+    def test_instance_pages(self):
+        running = InstanceFilter(state='running')
+        pages = self.read_pages(
+            lambda limit, cursor: self.backend.find_graph_instance_info_page(running, limit, cursor), 2)
+        self.assertEqual([instance_id for page in pages for instance_id, _ in page], ['i0', 'i2', 'i4', 'i6'])
+        pages = self.read_pages(
+            lambda limit, cursor: self.backend.find_graph_instance_info_page(InstanceFilter(), limit, cursor), 3)
+        self.assertEqual([instance_id for page in pages for instance_id, _ in page],
+                         ['i{}'.format(idx) for idx in range(7)])
+
+    def test_cursor_survives_changes(self):
+        items, cursor = self.backend.find_graph_instance_info_page(InstanceFilter(), 3)
+        self.assertEqual([instance_id for instance_id, _ in items], ['i0', 'i1', 'i2'])
+        self.backend.delete_graph_instance_info('i2')  # last listed one
+        self.backend.delete_graph_instance_info('i3')
+        items, cursor = self.backend.find_graph_instance_info_page(InstanceFilter(), 3, cursor)
+        self.assertEqual([instance_id for instance_id, _ in items], ['i4', 'i5', 'i6'])
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            self.backend.find_graph_instance_info_page(InstanceFilter(), 3, '%%%')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,21 +1,63 @@
 from itertools import count
-from typing import Iterator, Tuple, Optional
+from threading import Lock
+from typing import Iterable, Iterator, Tuple, Optional, Set
 from common.models.task import TaskInfo
-from common.models.graph import GraphStruct, GraphInstanceInfo
+from common.models.graph import GraphStruct, GraphInstanceInfo, TaskExecutionInfo
 from common.models.schedule import ScheduledGraph
+from common.models.state import GraphInstanceState
 from util.config import Config, ConfigField
+from util.lru_cache import LRUCache, StripedLock
+from util.pagination import Page, paginate_by_key
 from util.symver import SymVer
-from util.tuned_leveldb import LevelDB
+from util.tuned_leveldb import CODECS, COMPRESSORS, DB, LevelDB, ValueFormat, WriteBatch
 from worker.backend import WorkerBackend
-from master.backend import MasterBackend, GraphStructureNotFound
+from master.backend import MasterBackend, GraphStructureNotFound, InstanceFilter
+
+
+# Is increased on changes of indexed keys, so indexes of existing databases are rebuilt on start
+INSTANCE_INDEXES_VERSION = 2
+# Is increased on changes of graph structs layout, so existing databases are migrated on start
+GRAPHS_LAYOUT_VERSION = 1
+
+
+class ValueFormatConfig(Config):
+    # Encoding of written values: 'json' - portable between Python versions, 'marshal' - compact and faster one,
+    # which can be read only by the same Python version. Values of any codec are read, so it can be changed
+    # for existing databases.
+    codec = ConfigField(type=str, required=True, default='json')
+    # Values larger than compress_threshold bytes are compressed with 'zlib' or 'lz4' (if lz4 package is installed)
+    compression = ConfigField(type=str, required=False, default='zlib')
+    compress_threshold = ConfigField(type=int, required=True, default=4096)
+
+    def verify(self):
+        super().verify()
+        assert self.codec in CODECS, '{}: codec should be one of ({}), got {}'.format(
+            self.path_to_node, ', '.join(sorted(CODECS)), self.codec)
+        assert self.compression is None or self.compression in COMPRESSORS, \
+            '{}: compression should be None or one of ({}), got {}'.format(
+                self.path_to_node, ', '.join(sorted(COMPRESSORS)), self.compression)
+
+    def create_value_format(self) -> ValueFormat:
+        return ValueFormat(self.codec, self.compression, self.compress_threshold)
 
 
 class WorkerLevelDBConfig(Config):
     db_path = ConfigField(type=str, required=True, default='/tmp/dedalus-worker-db')
+    value_format = ValueFormatConfig()
 
 
 class MasterLevelDBConfig(Config):
     db_path = ConfigField(type=str, required=True, default='/tmp/dedalus-master-db')
+    value_format = ValueFormatConfig()
+    # If set, instances launched from a stored graph revision keep only reference to it instead of a copy of structure
+    store_structs_by_reference = ConfigField(type=bool, required=True, default=True)
+    # Number of graph revisions kept parsed in memory to resolve references of instances
+    graph_struct_cache_size = ConfigField(type=int, required=True, default=100)
+
+    def verify(self):
+        super().verify()
+        assert self.graph_struct_cache_size > 0, '{}: graph_struct_cache_size should be positive'.format(
+            self.path_to_node)
 
 
 class WorkerLevelDBBackend(WorkerBackend):
@@ -25,7 +67,7 @@ class WorkerLevelDBBackend(WorkerBackend):
 
     def __init__(self, backend_config: dict):
         super().__init__(backend_config)
-        self.tasks_db = LevelDB(self.config.db_path)
+        self.tasks_db = LevelDB(self.config.db_path, value_format=self.config.value_format.create_value_format())
 
     def read_task_info(self, task_id: str) -> TaskInfo:
         return TaskInfo.create(self.tasks_db.get(task_id))
@@ -33,10 +75,27 @@ class WorkerLevelDBBackend(WorkerBackend):
     def write_task_info(self, task_id: str, task_info: TaskInfo):
         return self.tasks_db.put(task_id, task_info.to_json())
 
+    def delete_task_info(self, task_id: str):
+        return self.tasks_db.delete(task_id)
+
+    def compact(self) -> int:
+        size_before = self.tasks_db.disk_size()
+        self.tasks_db.compact()
+        return max(size_before - self.tasks_db.disk_size(), 0)
+
     def list_tasks(self, with_info: bool = False) -> 'Iterator[Tuple[str, Optional[TaskInfo]]]':
         for task_id, task_info in self.tasks_db.iterate_all(include_value=with_info):
             yield task_id, TaskInfo.create(task_info) if task_info else None
 
+    def _iterate_tasks(self, with_info: bool, key_from: Optional[str]) -> \
+            'Iterator[Tuple[str, Tuple[str, Optional[TaskInfo]]]]':
+        for task_id, task_info in self.tasks_db.iterate_all(key_from=key_from, include_value=with_info):
+            yield task_id, (task_id, TaskInfo.create(task_info) if task_info else None)
+
+    def list_tasks_page(self, limit: int, cursor: Optional[str] = None,
+                        with_info: bool = False) -> 'Page[Tuple[str, Optional[TaskInfo]]]':
+        return paginate_by_key(lambda key_from: self._iterate_tasks(with_info, key_from), limit, cursor)
+
 
 class MasterLevelDBBackend(MasterBackend):
     name = 'leveldb'
@@ -45,61 +104,347 @@ class MasterLevelDBBackend(MasterBackend):
 
     def __init__(self, backend_config: dict):
         super().__init__(backend_config)
-        self.db = LevelDB(self.config.db_path)
+        self.db = LevelDB(self.config.db_path, value_format=self.config.value_format.create_value_format())
+        # Graph structs are stored under graphs=<graph_name>=<revision>, where revision is zero-padded,
+        # so keys are ordered by revision. graph_heads=<graph_name> holds the latest revision of graph.
         self.graphs = self.db.collection_view('graphs')
+        self.graph_heads = self.db.collection_view('graph_heads')
+        self._graphs_lock = Lock()
         self.schedule = self.db.collection_view('schedule')
+        # Graph instance is stored in parts, so changes of one task do not rewrite the whole instance:
+        #   instances=<instance_id> - header (GraphInstanceInfo.header_to_json)
+        #   instance_structs=<instance_id> - structure
+        #   instance_graph_refs=<instance_id> - {graph_name, revision} of stored graph struct, which is instance's
+        #                                       structure. Is used instead of instance_structs=<instance_id>
+        #   instance_tasks=<instance_id>=<task_name> - per task execution info
+        # Instances written by older versions are stored as whole json under instances=<instance_id>.
         self.instances = self.db.collection_view('instances')
+        self.instance_structs = self.db.collection_view('instance_structs')
+        self.instance_graph_refs = self.db.collection_view('instance_graph_refs')
+        # Revisions are never changed, so their json is shared by all instances referencing them
+        self._graph_struct_cache = LRUCache(self.config.graph_struct_cache_size)
+        self.instance_tasks = self.db.collection_view('instance_tasks')
+        # Secondary indexes of instances, maintained on every header write. Values are instance summaries
+        # (InstanceFilter.summarize with instance_id), so filters are checked without reading instances:
+        #   instance_indexes=state=<state>=<instance_id>
+        #   instance_indexes=graph=<graph_name>=<revision>=<instance_id>
+        #   instance_indexes=graph_state=<graph_name>=<state>=<instance_id>
+        #   instance_indexes=start_time=<start_time>=<instance_id>
+        # instance_index_keys=<instance_id> - list of index keys of instance, to remove outdated ones on change
+        self.instance_indexes = self.db.collection_view('instance_indexes')
+        self.instance_index_keys = self.db.collection_view('instance_index_keys')
+        # Index keys are read, diffed and written in one batch with instance, so writes of one instance are serialized
+        self._instance_locks = StripedLock()
+        self.meta = self.db.collection_view('meta')
+        self._ensure_graphs_layout()
+        self._ensure_instance_indexes()
+
+    @staticmethod
+    def _revision_key(revision: int) -> str:
+        return '{:010d}'.format(revision)
+
+    def _ensure_graphs_layout(self):
+        """Migrates graph structs written with not padded revision keys and builds graph heads"""
+        try:
+            if self.meta.get('graphs')['version'] == GRAPHS_LAYOUT_VERSION:
+                return
+        except KeyError:
+            pass
+        batch = WriteBatch()
+        heads = dict()
+        for key, graph_struct in self.graphs.iterate_all(include_value=True):
+            graph_name, revision_key = key.split('=', 1)
+            revision = int(revision_key)
+            if revision_key != self._revision_key(revision):
+                self.graphs.delete(key, batch=batch)
+                self.graphs.collection_view(graph_name).put(self._revision_key(revision), graph_struct, batch=batch)
+            heads[graph_name] = max(heads.get(graph_name, revision), revision)
+        for graph_name, revision in heads.items():
+            self.graph_heads.put(graph_name, {'revision': revision}, batch=batch)
+        self.meta.put('graphs', {'version': GRAPHS_LAYOUT_VERSION}, batch=batch)
+        self.db.write_batch(batch)
+
+    def _read_head_revision(self, graph_name: str) -> int:
+        """:raises GraphStructureNotFound: if graph has no revisions"""
+        try:
+            return self.graph_heads.get(graph_name)['revision']
+        except KeyError:
+            raise GraphStructureNotFound(graph_name)
+
+    @staticmethod
+    def _instance_summary(instance_id: str, header: dict, graph_name: str, revision: int) -> dict:
+        summary = InstanceFilter.summarize(header['exec_stats']['state'], graph_name, revision,
+                                           header['exec_stats']['start_time'])
+        summary['instance_id'] = instance_id
+        return summary
+
+    @staticmethod
+    def _instance_index_keys(summary: dict) -> 'Set[str]':
+        keys = {
+            'state={state}={instance_id}'.format(**summary),
+            'graph={graph_name}={revision:010d}={instance_id}'.format(**summary),
+            'graph_state={graph_name}={state}={instance_id}'.format(**summary),
+        }
+        if summary['start_time'] is not None:
+            keys.add('start_time={:012d}={}'.format(int(summary['start_time']), summary['instance_id']))
+        return keys
+
+    def _update_instance_indexes(self, instance_id: str, summary: dict, batch: WriteBatch):
+        try:
+            old_keys = set(self.instance_index_keys.get(instance_id))
+        except KeyError:
+            old_keys = set()
+        new_keys = self._instance_index_keys(summary)
+        if old_keys == new_keys:
+            return  # all summary fields are parts of keys, so nothing has changed
+        for key in old_keys - new_keys:
+            self.instance_indexes.delete(key, batch=batch)
+        for key in new_keys:
+            self.instance_indexes.put(key, summary, batch=batch)
+        self.instance_index_keys.put(instance_id, sorted(new_keys), batch=batch)
+
+    def _ensure_instance_indexes(self):
+        """Builds indexes once for databases, which were created before indexes (or their current version) existed"""
+        try:
+            if self.meta.get('instance_indexes')['version'] == INSTANCE_INDEXES_VERSION:
+                return
+        except KeyError:
+            pass
+        batch = WriteBatch()
+        for key, _ in self.instance_indexes.iterate_all(include_value=False):
+            self.instance_indexes.delete(key, batch=batch)
+        for instance_id, header in self.instances.iterate_all(include_value=True):
+            structure = header['structure'] if self._is_whole_instance(header) \
+                else self._read_instance_structure(instance_id)
+            summary = self._instance_summary(instance_id, header, structure['graph_name'], structure['revision'])
+            new_keys = self._instance_index_keys(summary)
+            for key in new_keys:
+                self.instance_indexes.put(key, summary, batch=batch)
+            self.instance_index_keys.put(instance_id, sorted(new_keys), batch=batch)
+        self.meta.put('instance_indexes', {'version': INSTANCE_INDEXES_VERSION}, batch=batch)
+        self.db.write_batch(batch)
 
-    def read_graph_instance_info(self, instance_id: str) -> GraphInstanceInfo:
-        return GraphInstanceInfo.create(self.instances.get(instance_id))
+    @staticmethod
+    def _is_whole_instance(header: dict) -> bool:
+        return 'structure' in header
+
+    def _read_graph_struct_json(self, graph_name: str, revision: int) -> dict:
+        """:returns json of graph revision shared with other readers, so it should not be changed
+        :raises KeyError: if there is no such revision
+        """
+        key = (graph_name, revision)
+        graph_struct_json = self._graph_struct_cache.get(key)
+        if graph_struct_json is None:
+            graph_struct_json = self.graphs.collection_view(graph_name).get(self._revision_key(revision))
+            self._graph_struct_cache.put(key, graph_struct_json)
+        return graph_struct_json
+
+    def _read_instance_structure(self, instance_id: str) -> dict:
+        try:
+            graph_ref = self.instance_graph_refs.get(instance_id)
+        except KeyError:
+            return self.instance_structs.get(instance_id)
+        return self._read_graph_struct_json(graph_ref['graph_name'], graph_ref['revision'])
+
+    def _find_graph_ref(self, structure: GraphStruct) -> 'Optional[dict]':
+        """:returns reference to stored graph revision, if it is the same as structure"""
+        if not self.config.store_structs_by_reference:
+            return None
+        try:
+            graph_struct_json = self._read_graph_struct_json(structure.graph_name, structure.revision)
+        except KeyError:
+            return None
+        if structure.to_json() != graph_struct_json:
+            return None
+        return {'graph_name': structure.graph_name, 'revision': structure.revision}
+
+    def _assemble_instance_json(self, instance_id: str, header: dict) -> dict:
+        if self._is_whole_instance(header):
+            return header
+        return GraphInstanceInfo.join_json_parts(
+            header,
+            self._read_instance_structure(instance_id),
+            dict(self.instance_tasks.collection_view(instance_id).iterate_all(include_value=True))
+        )
+
+    def read_graph_instance_info(self, instance_id: str, lazy: bool = False) -> GraphInstanceInfo:
+        return GraphInstanceInfo.create(self._assemble_instance_json(instance_id, self.instances.get(instance_id)),
+                                        lazy=lazy)
+
+    def read_instance_state(self, instance_id: str) -> GraphInstanceState:
+        return GraphInstanceState().from_json(self.instances.get(instance_id)['exec_stats']['state'])
+
+    def read_task_execution_info(self, instance_id: str, task_name: str) -> TaskExecutionInfo:
+        header = self.instances.get(instance_id)
+        if self._is_whole_instance(header):
+            task_json = header['exec_stats']['per_task_execution_info'][task_name]
+        else:
+            task_json = self.instance_tasks.collection_view(instance_id).get(task_name)
+        return TaskExecutionInfo.create(task_json)
 
     def write_graph_instance_info(self, instance_id: str, instance_info: GraphInstanceInfo):
-        return self.instances.put(instance_id, instance_info.to_json())
+        with self._instance_locks(instance_id):
+            batch = WriteBatch()
+            header = instance_info.header_to_json()
+            summary = self._instance_summary(instance_id, header, instance_info.structure.graph_name,
+                                             instance_info.structure.revision)
+            self._update_instance_indexes(instance_id, summary, batch)
+            self.instances.put(instance_id, header, batch=batch)
+            graph_ref = self._find_graph_ref(instance_info.structure)
+            if graph_ref is not None:
+                self.instance_graph_refs.put(instance_id, graph_ref, batch=batch)
+                self.instance_structs.delete(instance_id, batch=batch)
+            else:
+                self.instance_structs.put(instance_id, instance_info.structure.to_json(), batch=batch)
+                self.instance_graph_refs.delete(instance_id, batch=batch)
+            tasks_view = self.instance_tasks.collection_view(instance_id)
+            for task_name, task_execution_info in instance_info.exec_stats.per_task_execution_info.items():
+                tasks_view.put(task_name, task_execution_info.to_json(), batch=batch)
+            return self.db.write_batch(batch)
+
+    def update_graph_instance_info(self, instance_id: str, instance_info: GraphInstanceInfo,
+                                   task_names: Iterable[str] = ()):
+        with self._instance_locks(instance_id):
+            batch = WriteBatch()
+            header = instance_info.header_to_json()
+            summary = self._instance_summary(instance_id, header, instance_info.structure.graph_name,
+                                             instance_info.structure.revision)
+            self._update_instance_indexes(instance_id, summary, batch)
+            self.instances.put(instance_id, header, batch=batch)
+            tasks_view = self.instance_tasks.collection_view(instance_id)
+            per_task_execution_info = instance_info.exec_stats.per_task_execution_info
+            for task_name in task_names:
+                tasks_view.put(task_name, per_task_execution_info[task_name].to_json(), batch=batch)
+            return self.db.write_batch(batch)
+
+    def delete_graph_instance_info(self, instance_id: str):
+        with self._instance_locks(instance_id):
+            batch = WriteBatch()
+            try:
+                index_keys = self.instance_index_keys.get(instance_id)
+            except KeyError:
+                index_keys = []
+            for key in index_keys:
+                self.instance_indexes.delete(key, batch=batch)
+            self.instance_index_keys.delete(instance_id, batch=batch)
+            self.instances.delete(instance_id, batch=batch)
+            self.instance_structs.delete(instance_id, batch=batch)
+            self.instance_graph_refs.delete(instance_id, batch=batch)
+            tasks_view = self.instance_tasks.collection_view(instance_id)
+            for task_name, _ in tasks_view.iterate_all(include_value=False):
+                tasks_view.delete(task_name, batch=batch)
+            return self.db.write_batch(batch)
+
+    def compact(self) -> int:
+        size_before = self.db.disk_size()
+        for view in (self.instances, self.instance_structs, self.instance_graph_refs, self.instance_tasks,
+                     self.instance_indexes, self.instance_index_keys):
+            view.compact()
+        return max(size_before - self.db.disk_size(), 0)
 
     def list_graph_instance_info(self, with_info: bool = False) -> Iterator[Tuple[str, Optional[GraphInstanceInfo]]]:
-        for instance_id, instance_info in self.instances.iterate_all(include_value=with_info):
-            yield instance_id, GraphInstanceInfo.create(instance_info) if instance_info else None
+        return (instance for _, instance in self._iterate_instances(with_info))
+
+    def _iterate_instances(self, with_info: bool, key_from: Optional[str] = None) -> \
+            'Iterator[Tuple[str, Tuple[str, Optional[GraphInstanceInfo]]]]':
+        """:returns iterator over pairs of key (to continue iteration from) and instance"""
+        for instance_id, header in self.instances.iterate_all(key_from=key_from, include_value=with_info):
+            yield instance_id, (
+                instance_id,
+                GraphInstanceInfo.create(self._assemble_instance_json(instance_id, header), lazy=True)
+                if header else None
+            )
+
+    def _choose_instance_index(self, instance_filter: InstanceFilter) -> 'Tuple[DB, Optional[str], Optional[str]]':
+        """:returns index view and key range in it, which contain all instances matching the filter"""
+        if instance_filter.graph_name is not None:
+            graph_name = instance_filter.graph_name
+            if instance_filter.state is not None:
+                return self.instance_indexes.collection_view('graph_state').collection_view(graph_name) \
+                    .collection_view(instance_filter.state), None, None
+            graph_index = self.instance_indexes.collection_view('graph').collection_view(graph_name)
+            if instance_filter.revision is not None:
+                return graph_index.collection_view('{:010d}'.format(instance_filter.revision)), None, None
+            return graph_index, None, None
+        if instance_filter.state is not None:
+            return self.instance_indexes.collection_view('state').collection_view(instance_filter.state), None, None
+        if instance_filter.has_time_range:
+            started_after, started_before = instance_filter.started_after, instance_filter.started_before
+            return self.instance_indexes.collection_view('start_time'), \
+                '{:012d}'.format(max(int(started_after), 0)) if started_after is not None else None, \
+                '{:012d}>'.format(int(started_before)) if started_before is not None else None
+        # every instance has exactly one record in state index
+        return self.instance_indexes.collection_view('state'), None, None
+
+    def _iterate_found_instances(self, instance_filter: InstanceFilter, with_info: bool,
+                                 key_from: Optional[str] = None) -> \
+            'Iterator[Tuple[str, Tuple[str, Optional[GraphInstanceInfo]]]]':
+        """:returns iterator over pairs of key (to continue iteration from) and found instance"""
+        if instance_filter.is_empty:
+            yield from self._iterate_instances(with_info, key_from)
+            return
+        index_view, range_from, range_to = self._choose_instance_index(instance_filter)
+        if range_from is not None and (key_from is None or key_from < range_from):
+            key_from = range_from
+        for key, summary in index_view.iterate_all(key_from=key_from, key_to=range_to, include_value=True):
+            if instance_filter.matches(summary):
+                instance_id = summary['instance_id']
+                yield key, (instance_id, self.read_graph_instance_info(instance_id, lazy=True) if with_info else None)
+
+    def find_graph_instance_info(self, instance_filter: InstanceFilter,
+                                 with_info: bool = False) -> Iterator[Tuple[str, Optional[GraphInstanceInfo]]]:
+        return (instance for _, instance in self._iterate_found_instances(instance_filter, with_info))
+
+    def find_graph_instance_info_page(self, instance_filter: InstanceFilter, limit: int, cursor: Optional[str] = None,
+                                      with_info: bool = False) -> 'Page[Tuple[str, Optional[GraphInstanceInfo]]]':
+        return paginate_by_key(lambda key_from: self._iterate_found_instances(instance_filter, with_info, key_from),
+                               limit, cursor)
 
     def read_graph_struct(self, graph_name: str, revision: int = -1) -> GraphStruct:
         graph_view = self.graphs.collection_view(graph_name)
         if revision == -1:
-            last_revision_struct = max(
-                map(lambda _: GraphStruct.create(_[1]), graph_view.iterate_all(include_value=True)),
-                key=lambda x: x.revision,
-                default=None
-            )
-            if last_revision_struct is None:
-                raise GraphStructureNotFound(graph_name)
-            return last_revision_struct
-        return GraphStruct.create(graph_view.get(str(revision)))
+            revision = self._read_head_revision(graph_name)
+        return GraphStruct.create(graph_view.get(self._revision_key(revision)))
 
     def add_graph_struct(self, graph_name: str, graph_struct: GraphStruct) -> int:
         graph_view = self.graphs.collection_view(graph_name)
         graph_struct.graph_name = graph_name
-        try:
-            new_revision = self.read_graph_struct(graph_name).revision + 1
-        except:
-            new_revision = 0
-        graph_struct.revision = new_revision
-        # FIXME(luckygeck): possible race condition
-        graph_view.put(str(new_revision), graph_struct.to_json())
+        # revisions are allocated under lock and new head is written atomically with the struct
+        with self._graphs_lock:
+            try:
+                new_revision = self._read_head_revision(graph_name) + 1
+            except GraphStructureNotFound:
+                new_revision = 0
+            graph_struct.revision = new_revision
+            batch = WriteBatch()
+            graph_view.put(self._revision_key(new_revision), graph_struct.to_json(), batch=batch)
+            self.graph_heads.put(graph_name, {'revision': new_revision}, batch=batch)
+            self.db.write_batch(batch)
         return new_revision
 
     def list_graph_struct(self, graph_name: Optional[str] = None, with_info: bool = False) -> Iterator[
             Tuple[str, int, Optional[GraphStruct]]]:
+        return (graph for _, graph in self._iterate_graph_structs(graph_name, with_info))
+
+    def _iterate_graph_structs(self, graph_name: Optional[str], with_info: bool, key_from: Optional[str] = None) -> \
+            'Iterator[Tuple[str, Tuple[str, int, Optional[GraphStruct]]]]':
+        """:returns iterator over pairs of key (to continue iteration from) and graph struct"""
         db = self.graphs.collection_view(graph_name) if graph_name else self.graphs
-        for key, graph_struct in db.iterate_all(include_value=with_info):
+        for key, graph_struct in db.iterate_all(key_from=key_from, include_value=with_info):
             name, revision = (graph_name, key) if graph_name else key.split('=', 1)
-            yield name, revision, GraphStruct.create(graph_struct) if graph_struct else None
+            yield key, (name, int(revision), GraphStruct.create(graph_struct) if graph_struct else None)
+
+    def list_graph_struct_page(self, graph_name: Optional[str], limit: int, cursor: Optional[str] = None,
+                               with_info: bool = False) -> 'Page[Tuple[str, int, Optional[GraphStruct]]]':
+        return paginate_by_key(lambda key_from: self._iterate_graph_structs(graph_name, with_info, key_from),
+                               limit, cursor)
 
     def read_schedule(self, graph_name: str) -> ScheduledGraph:
         return ScheduledGraph.create(self.schedule.get(graph_name))
 
     def write_schedule(self, graph_name: str, schedule: str):
         schedule_json = ScheduledGraph().init(graph_name, schedule).to_json()
-        graph_versions = self.list_graph_struct(graph_name, with_info=False)
-        if next(graph_versions, None) is None:
-            raise GraphStructureNotFound(graph_name)
+        self._read_head_revision(graph_name)  # checks that graph exists
         return self.schedule.put(graph_name, schedule_json)
 
     def list_schedules(self) -> Iterator[ScheduledGraph]:
@@ -15,6 +15,14 @@ class ShellExecutorConfig(Config):
     shell_bin = ConfigField(type=str, required=True, default='bash')
     shell_args = ConfigField(type=list, required=False, default=[])
     shell_script = ConfigField(type=str, required=True, default='exit 1')
+    # 'lines' - output is read by worker line by line (and can be processed by line hooks),
+    # 'direct' - stdout and stderr of the script are redirected straight to log files, output is kept byte to byte
+    capture_mode = ConfigField(type=str, required=True, default='lines')
+
+    def verify(self):
+        super().verify()
+        assert self.capture_mode in ('lines', 'direct'), \
+            '{}: capture_mode should be one of (lines, direct), got {}'.format(self.path_to_node, self.capture_mode)
 
 
 class NoCommandRunningError(Exception):
@@ -59,7 +67,13 @@ class ShellExecutor(Executor):
                 for _ in self.config.shell_args:
                     cmd = cmd[_]
                 cmd = cmd[self.script_path]
-                self._subproc = cmd.popen(cwd=self.work_dir)
+                if self.config.capture_mode == 'direct':
+                    with open(self.log_path('out'), 'ab') as out_file, open(self.log_path('err'), 'ab') as err_file:
+                        self._subproc = cmd.popen(cwd=self.work_dir, stdout=out_file, stderr=err_file)
+                else:
+                    self._subproc = cmd.popen(cwd=self.work_dir)
+            if self.config.capture_mode == 'direct':
+                return self.wait(self._subproc)
             return self.iterate_log(self._subproc)
 
     def ping(self):
@@ -74,6 +88,11 @@ class ShellExecutor(Executor):
             if self._subproc is not None:
                 self._subproc.send_signal(sig=sig)
 
+    @staticmethod
+    def wait(popen_object):
+        yield from ()
+        raise ExecutionEnded(retcode=popen_object.wait())
+
     @staticmethod
     def iterate_log(popen_object):
         retcode = 0
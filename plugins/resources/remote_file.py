@@ -2,7 +2,7 @@ import os
 from urllib.request import urlretrieve
 
 from util.config import Config, ConfigField
-from util.filehash import get_file_hash
+from util.filehash import get_content_sha256, get_file_hash
 from util.symver import SymVer
 from worker.resource import Resource
 
@@ -11,6 +11,23 @@ class RemoteFileResourceConfig(Config):
     local_path = ConfigField(type=str, required=True, default=None)
     remote_url = ConfigField(type=str, required=True, default=None)
     extract_after_download = ConfigField(type=bool, required=False, default=False)
+    # Downloaded file is checked against sha256. Worker resource cache is used only if sha256 or version is set:
+    # file is cached by sha256 of its content, if it is set, otherwise by remote_url and version,
+    # so a file behind a changing url is cached only until its version is changed
+    sha256 = ConfigField(type=str, required=False, default=None)
+    version = ConfigField(type=str, required=False, default=None)
+    # Worker resource cache is not used, if unset
+    use_cache = ConfigField(type=bool, required=True, default=True)
+
+
+class ChecksumMismatchError(Exception):
+    def __init__(self, remote_url: str, expected: str, actual: str) -> None:
+        self.remote_url = remote_url
+        self.expected = expected
+        self.actual = actual
+
+    def __str__(self):
+        return 'File {} has sha256 {}, expected {}'.format(self.remote_url, self.actual, self.expected)
 
 
 class RemoteFileResource(Resource):
@@ -24,7 +41,22 @@ class RemoteFileResource(Resource):
         return get_file_hash(path) if os.path.exists(path) else None
 
     def force_install(self):
-        urlretrieve(self.config.remote_url, self.config.local_path)
+        if self.cache is None or not self.config.use_cache or not (self.config.sha256 or self.config.version):
+            self._download(self.config.local_path)
+            return
+        if self.config.sha256:
+            key = self.cache.content_key(self.config.sha256)
+        else:
+            key = self.cache.url_key(self.config.remote_url, self.config.version)
+        self.cache.materialize(key, self._download, self.config.local_path)
+
+    def _download(self, path: str):
+        urlretrieve(self.config.remote_url, path)
+        if self.config.sha256:
+            file_hash = get_content_sha256(path)
+            if file_hash != self.config.sha256.lower():
+                os.remove(path)
+                raise ChecksumMismatchError(self.config.remote_url, self.config.sha256, file_hash)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,6 @@
 import abc
 import datetime
-from typing import NamedTuple, Optional, TypeVar, List, Union
+from typing import Dict, NamedTuple, Optional, TypeVar, List, Tuple, Union
 
 T = TypeVar('T')
 
@@ -62,6 +62,7 @@ class ListConfigFieldBase(BaseConfig, list):
 def create_list_field_type(type_t: type(Union[BaseConfig, T])) -> type(ListConfigFieldBase):
     class ListConfigFieldBaseImpl(ListConfigFieldBase):
         _type_fabric = type_t
+        _fabric_is_config = issubclass(type_t, BaseConfig)
 
         @classmethod
         def get_class_name(cls):
@@ -79,7 +80,7 @@ def create_list_field_type(type_t: type(Union[BaseConfig, T])) -> type(ListConfi
                 ))
 
         def to_json(self):
-            if issubclass(self._type_fabric, BaseConfig):
+            if self._fabric_is_config:
                 return [_.to_json() for _ in self]
             else:
                 return self[::]
@@ -89,7 +90,7 @@ def create_list_field_type(type_t: type(Union[BaseConfig, T])) -> type(ListConfi
                 assert isinstance(json_list, list), \
                     '{}: ListConfigField can be constructed only from list'.format(self.path_to_node)
                 self.clear()
-                if issubclass(self._type_fabric, BaseConfig):
+                if self._fabric_is_config:
                     self.extend(
                         self._type_fabric(parent_object=self, parent_key=str(idx))
                             .from_json(_, skip_unknown_fields)
@@ -100,7 +101,7 @@ def create_list_field_type(type_t: type(Union[BaseConfig, T])) -> type(ListConfi
             return self
 
         def verify(self):
-            if issubclass(self._type_fabric, BaseConfig):
+            if self._fabric_is_config:
                 for obj in self:
                     obj.verify()
             else:
@@ -122,6 +123,7 @@ class DictConfigFieldBase(BaseConfig, dict):
 def create_dict_field_type(type_t: type(T)) -> type(DictConfigFieldBase):
     class DictConfigFieldBaseImpl(DictConfigFieldBase):
         _type_fabric = type_t
+        _fabric_is_config = issubclass(type_t, BaseConfig)
 
         @classmethod
         def get_class_name(cls):
@@ -146,7 +148,7 @@ def create_dict_field_type(type_t: type(T)) -> type(DictConfigFieldBase):
                 assert isinstance(json_map, dict), \
                     '{}: create_dict_field_type can be constructed only from dict'.format(self.path_to_node)
                 self.clear()
-                if issubclass(self._type_fabric, BaseConfig):
+                if self._fabric_is_config:
                     self.update({
                         k: self._type_fabric(parent_object=self, parent_key=k).from_json(v, skip_unknown_fields)
                         for k, v in json_map.items()
@@ -156,7 +158,7 @@ def create_dict_field_type(type_t: type(T)) -> type(DictConfigFieldBase):
             return self
 
         def verify(self):
-            if issubclass(self._type_fabric, BaseConfig):
+            if self._fabric_is_config:
                 for obj in self.values():
                     obj.verify()
             else:
@@ -204,84 +206,131 @@ class DateTimeField(BaseConfig):
                                                                                        self._dt.__class__.__name__)
 
 
-class MetaConfig(abc.ABCMeta):
-    def __new__(mcs, name, bases, nmspc):
-        fields = {}
+_MISSING = object()
 
-        for attr_name, attr_value in nmspc.items():
-            if isinstance(attr_value, ConfigField):
-                fields[attr_name] = attr_value
-            elif isinstance(attr_value, BaseConfig):
-                fields[attr_name] = ConfigField(type=attr_value.__class__, required=True, default=attr_value)
-        nmspc['_fields'] = fields
-        return super().__new__(mcs, name, bases, nmspc)
 
-    def __call__(cls, *args, **kwargs):
-        obj = super(MetaConfig, cls).__call__(*args, **kwargs)
-        for k, v in cls._fields.items():
-            if issubclass(v.type, BaseConfig):
-                setattr(obj, k, v.type(parent_object=obj, parent_key=k))
-            else:
-                val = kwargs.get(k, v.default)
-                if isinstance(val, v.type) or val is None:
-                    setattr(obj, k, val)
-                else:
-                    raise IncorrectFieldType(
-                        'Field {} should have type {}, but {} passed.'.format(obj.get_path_to_child(k),
-                                                                              v.type.__name__,
-                                                                              val.__class__.__name__))
-        for k, v in cls._fields.items():
-            if issubclass(v.type, BaseConfig):
-                getattr(obj, k).from_json(v.default.to_json())
-        return obj
+def _field_method(func):
+    """Marks methods, which MetaConfig replaces with versions compiled for fields of each class"""
+    func.is_field_method = True
+    return func
 
 
-class Config(BaseConfig, metaclass=MetaConfig):
-    _fields = {}
+def _raise_incorrect_field_type(obj: BaseConfig, key: str, field_type: type, value):
+    raise IncorrectFieldType('Field {} should have type {}, but {} passed.'.format(obj.get_path_to_child(key),
+                                                                                   field_type.__name__,
+                                                                                   value.__class__.__name__))
 
-    @classmethod
-    def create(cls, json_doc: dict, skip_unknown_fields=False, verify=True):
-        result = cls()
-        result.from_json(json_doc=json_doc, skip_unknown_fields=skip_unknown_fields)
-        if verify:
-            result.verify()
+
+def _has_fresh_default(field: ConfigField) -> bool:
+    """:returns True if default of BaseConfig field is the same as a newly created object of its type,
+    so it need not be copied to every new object
+    """
+    try:
+        return field.type().to_json() == field.default.to_json()
+    except Exception:
+        return False
+
+
+def _compile_source(source: str, env: dict, func_name: str, cls_name: str):
+    exec(compile(source, '<compiled {}.{}>'.format(cls_name, func_name), 'exec'), env)
+    func = env[func_name]
+    func.is_field_method = True
+    return func
+
+
+def _compile_init_fields(cls_name: str, fields: dict):
+    """Generates function, which sets fields of newly created object from kwargs and defaults"""
+    env = {'raise_type': _raise_incorrect_field_type}
+    lines = ['def init_fields(obj, kwargs):']
+    copy_defaults = []
+    for idx, (key, field) in enumerate(fields.items()):
+        type_var, default_var = 't{}'.format(idx), 'd{}'.format(idx)
+        env[type_var], env[default_var] = field.type, field.default
+        if issubclass(field.type, BaseConfig):
+            lines.append('    obj.{0} = {1}(parent_object=obj, parent_key={0!r})'.format(key, type_var))
+            if not _has_fresh_default(field):
+                copy_defaults.append('    obj.{}.from_json({}.to_json())'.format(key, default_var))
+        else:
+            lines.extend([
+                '    val = kwargs.get({!r}, {})'.format(key, default_var),
+                '    if isinstance(val, {}) or val is None:'.format(type_var),
+                '        obj.{} = val'.format(key),
+                '    else:',
+                '        raise_type(obj, {!r}, {}, val)'.format(key, type_var),
+            ])
+    lines.extend(copy_defaults)
+    lines.append('    return obj')
+    return _compile_source('\n'.join(lines), env, 'init_fields', cls_name)
+
+
+def _compile_to_json(cls_name: str, fields: dict):
+    field_specs = tuple((key, issubclass(field.type, BaseConfig)) for key, field in fields.items())
+
+    def lazy_to_json(self):
+        lazy_fields, state = self._lazy_fields, self.__dict__
+        result = {}
+        for key, is_config in field_specs:
+            if is_config and key in lazy_fields and key not in state:
+                result[key] = lazy_fields[key][0]  # not parsed sub-tree is passed as is
+            elif is_config:
+                result[key] = getattr(self, key).to_json()
+            else:
+                result[key] = getattr(self, key)
         return result
 
+    lines = ['def to_json(self):', '    if self._lazy_fields:', '        return lazy_to_json(self)', '    return {']
+    for key, field in fields.items():
+        if issubclass(field.type, BaseConfig):
+            lines.append('        {0!r}: self.{0}.to_json(),'.format(key))
+        else:
+            lines.append('        {0!r}: self.{0},'.format(key))
+    lines.append('    }')
+    return _compile_source('\n'.join(lines), {'lazy_to_json': lazy_to_json}, 'to_json', cls_name)
+
+
+def _compile_from_json(fields: dict):
+    config_fields = frozenset(k for k, field in fields.items() if issubclass(field.type, BaseConfig))
+    plain_fields = {k: field for k, field in fields.items() if k not in config_fields}
+
+    @_field_method
     def from_json(self, json_doc: dict, skip_unknown_fields=False):
         for k, v in json_doc.items():
-            field = self._fields.get(k, None)
+            if k in config_fields:
+                getattr(self, k).from_json(v, skip_unknown_fields)
+                continue
+            field = plain_fields.get(k, None)
             if field is None:
                 if skip_unknown_fields:
                     continue
                 raise UnknownField('{}: Found unknown field "{}"'.format(self.path_to_node, k))
-            if issubclass(field.type, BaseConfig):
-                getattr(self, k).from_json(v, skip_unknown_fields)
-            elif isinstance(v, field.type) or (not field.required and v is None):
+            if isinstance(v, field.type) or (not field.required and v is None):
                 setattr(self, k, v)
             else:
                 raise IncorrectFieldType(
                     'Field {} should have type {}, but {} passed.'.format(self.get_path_to_child(k),
                                                                           field.type.__name__, v.__class__.__name__))
         return self
+    return from_json
 
-    def to_json(self):
-        result = {}
-        for k, field in self._fields.items():
-            attr_value = getattr(self, k)
-            result[k] = attr_value.to_json() if issubclass(field.type, BaseConfig) else attr_value
-        return result
 
+def _compile_verify(fields: dict):
+    field_specs = tuple((name, field.type, field.required) for name, field in fields.items())
+
+    @_field_method
     def verify(self):
-        for name, field in self._fields.items():
-            if not hasattr(self, name):
+        lazy_fields = self._lazy_fields
+        for name, field_type, required in field_specs:
+            if lazy_fields and name in lazy_fields and name not in self.__dict__:
+                continue  # sub-tree is verified when parsed
+            value = getattr(self, name, _MISSING)
+            if value is _MISSING:
                 raise AttributeError('Not found attribute {}'.format(self.get_path_to_child(name)))
-            value = getattr(self, name)
-            type_mismatch = not isinstance(value, field.type)
-            if not field.required:
+            type_mismatch = not isinstance(value, field_type)
+            if not required:
                 if type_mismatch and value is not None:
                     raise AttributeError(
                         'Value for attribute {} should be None or of type {}, not {}'.format(
-                            self.get_path_to_child(name), field.type.__name__, value.__class__.__name__
+                            self.get_path_to_child(name), field_type.__name__, value.__class__.__name__
                         ))
 
             else:
@@ -289,3 +338,119 @@ class Config(BaseConfig, metaclass=MetaConfig):
                     raise AttributeError('Value for attribute {} is required'.format(self.get_path_to_child(name)))
             if isinstance(value, BaseConfig):
                 value.verify()
+    return verify
+
+
+class _LazyConfigField:
+    """Replaces class attribute of a BaseConfig field. Parses the field of lazily created object on first access.
+    Parsed object is stored in instance's __dict__, so next accesses do not reach this descriptor.
+    """
+
+    def __init__(self, key: str, field: ConfigField, class_attr) -> None:
+        self.key = key
+        self.field = field
+        self.copy_default = not _has_fresh_default(field)
+        self.class_attr = class_attr
+
+    def __get__(self, obj: 'Config', owner: type):
+        lazy_fields = obj._lazy_fields if obj is not None else None
+        if not lazy_fields or self.key not in lazy_fields:
+            return self.class_attr
+        json_doc, skip_unknown_fields, verify = lazy_fields[self.key]
+        value = self.field.type(parent_object=obj, parent_key=self.key)
+        if self.copy_default:
+            value.from_json(self.field.default.to_json())
+        if isinstance(value, Config):
+            value.from_json_lazy(json_doc, skip_unknown_fields, verify)
+        else:
+            value.from_json(json_doc, skip_unknown_fields)
+        if verify:
+            value.verify()
+        obj.__dict__[self.key] = value
+        lazy_fields.pop(self.key, None)
+        return value
+
+
+class MetaConfig(abc.ABCMeta):
+    """Collects fields of Config classes and compiles functions specialized for them once per class:
+    initialization of new objects, from_json, to_json and verify.
+    Methods of a class, which are not overridden in it, are replaced with compiled ones.
+    Class attributes of BaseConfig fields are wrapped with _LazyConfigField for lazily created objects.
+    """
+
+    def __new__(mcs, name, bases, nmspc):
+        fields = {}
+
+        for attr_name, attr_value in nmspc.items():
+            if isinstance(attr_value, ConfigField):
+                fields[attr_name] = attr_value
+            elif isinstance(attr_value, BaseConfig):
+                fields[attr_name] = ConfigField(type=attr_value.__class__, required=True, default=attr_value)
+        nmspc['_fields'] = fields
+        cls = super().__new__(mcs, name, bases, nmspc)
+        cls._init_fields = staticmethod(_compile_init_fields(name, fields))
+        cls._config_field_names = frozenset(k for k, field in fields.items() if issubclass(field.type, BaseConfig))
+        for key in cls._config_field_names:
+            setattr(cls, key, _LazyConfigField(key, fields[key], nmspc[key]))
+        compiled_methods = {
+            'from_json': _compile_from_json(fields),
+            'to_json': _compile_to_json(name, fields),
+            'verify': _compile_verify(fields),
+        }
+        for method_name, method in compiled_methods.items():
+            setattr(cls, '_compiled_' + method_name, method)
+            if method_name not in nmspc and getattr(getattr(cls, method_name, None), 'is_field_method', False):
+                setattr(cls, method_name, method)
+        return cls
+
+    def __call__(cls, *args, **kwargs):
+        obj = super(MetaConfig, cls).__call__(*args, **kwargs)
+        return cls._init_fields(obj, kwargs)
+
+
+class Config(BaseConfig, metaclass=MetaConfig):
+    _fields = {}
+    _lazy_fields = None  # type: Dict[str, Tuple[object, bool, bool]]
+
+    @classmethod
+    def create(cls, json_doc: dict, skip_unknown_fields=False, verify=True, lazy=False):
+        """Creates object from json_doc.
+        If lazy is set, BaseConfig fields are kept as raw json until they are accessed for the first time,
+        so reading a few fields does not depend on size of the whole document. Not accessed sub-trees
+        are verified only when parsed and are returned by to_json as is, so json_doc should not be modified later.
+        """
+        result = cls()
+        if lazy:
+            result.from_json_lazy(json_doc=json_doc, skip_unknown_fields=skip_unknown_fields, verify=verify)
+        else:
+            result.from_json(json_doc=json_doc, skip_unknown_fields=skip_unknown_fields)
+        if verify:
+            result.verify()
+        return result
+
+    def from_json_lazy(self, json_doc: dict, skip_unknown_fields=False, verify=True):
+        """Same as from_json, but only stores json of BaseConfig fields to be parsed on first access"""
+        lazy_fields = dict(self._lazy_fields or {})
+        plain_json_doc = {}
+        for k, v in json_doc.items():
+            if k in self._config_field_names:
+                self.__dict__.pop(k, None)
+                lazy_fields[k] = (v, skip_unknown_fields, verify)
+            else:
+                plain_json_doc[k] = v
+        self._lazy_fields = lazy_fields or None
+        return self.from_json(plain_json_doc, skip_unknown_fields)
+
+    # These methods are replaced with versions compiled by MetaConfig in Config subclasses.
+    # They are kept for subclasses overriding them, so super() calls work.
+    @_field_method
+    def from_json(self, json_doc: dict, skip_unknown_fields=False):
+        return self._compiled_from_json(json_doc, skip_unknown_fields)
+
+    @_field_method
+    def to_json(self):
+        return self._compiled_to_json()
+
+    @_field_method
+    def verify(self):
+        return self._compiled_verify()
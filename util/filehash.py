@@ -15,3 +15,12 @@ def get_file_hash(path: str) -> str:
                 file_size -= len(buf)
                 buf = f.read(min(BLOCK_SIZE, file_size))
     return hasher.hexdigest()
+
+
+def get_content_sha256(path: str) -> str:
+    """:returns sha256 of file content only, unlike get_file_hash"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for buf in iter(lambda: f.read(BLOCK_SIZE), b''):
+            hasher.update(buf)
+    return hasher.hexdigest()
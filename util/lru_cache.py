@@ -0,0 +1,86 @@
+import marshal
+from collections import OrderedDict
+from threading import Lock
+from typing import Hashable
+
+from util.config import Config, ConfigField
+
+
+def copy_json(value):
+    """Deep copy of json-like value, several times faster than copy.deepcopy"""
+    return marshal.loads(marshal.dumps(value))
+
+
+class LRUCacheConfig(Config):
+    # Max number of cached records, least recently used ones are evicted first
+    max_size = ConfigField(type=int, required=True, default=1000)
+
+    def verify(self):
+        super().verify()
+        assert self.max_size > 0, '{}: max_size should be positive'.format(self.path_to_node)
+
+
+class LRUCache:
+    """Thread safe mapping, which holds at most max_size items, evicting least recently used ones.
+    Counts hits and misses of get.
+    """
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._items = OrderedDict()
+        self._lock = Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            try:
+                value = self._items[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default=None):
+        with self._lock:
+            return self._items.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'size': len(self._items),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+class StripedLock:
+    """Set of locks, where each key is guarded by one of them. Serializes operations on the same key,
+    while operations on different keys mostly run in parallel.
+    """
+
+    def __init__(self, stripes: int = 64) -> None:
+        self._locks = [Lock() for _ in range(stripes)]
+
+    def __call__(self, key: Hashable) -> Lock:
+        return self._locks[hash(key) % len(self._locks)]
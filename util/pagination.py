@@ -0,0 +1,61 @@
+from base64 import b64decode, urlsafe_b64encode
+from binascii import Error as Base64Error
+from itertools import islice
+from typing import Callable, Iterator, List, Optional, Tuple, TypeVar
+
+T = TypeVar('T')
+
+Page = Tuple[List[T], Optional[str]]
+
+
+class InvalidCursor(Exception):
+    def __init__(self, cursor: str) -> None:
+        self.cursor = cursor
+
+    def __str__(self):
+        return 'Cursor "{}" is invalid'.format(self.cursor)
+
+
+def encode_cursor(position: str) -> str:
+    """Makes opaque cursor from backend specific position (e.g. last read key)"""
+    return urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> str:
+    """:raises InvalidCursor: if cursor was not made by encode_cursor"""
+    try:
+        return b64decode(cursor.encode(), altchars=b'-_', validate=True).decode()
+    except (Base64Error, ValueError, UnicodeError):
+        raise InvalidCursor(cursor)
+
+
+def paginate_by_key(iterate_from: 'Callable[[Optional[str]], Iterator[Tuple[str, T]]]', limit: int,
+                    cursor: Optional[str] = None) -> 'Page[T]':
+    """Reads one page from ordered key-value storage. Cursor holds the last returned key,
+    so next page seeks right after it and its cost does not depend on number of already listed items.
+    :param iterate_from: function returning iterator over pairs of key and item, starting from the given key
+                         (or from the beginning, if None is passed). Items should be loaded lazily, after key is yielded
+    :param limit: max number of items in page, negative value means no limit
+    :returns pair of items and cursor of the next page. Cursor is None, if there are no more items
+    """
+    # '\0' is the lowest possible suffix, so iteration starts right after the last returned key
+    key_from = decode_cursor(cursor) + '\0' if cursor else None
+    items = []
+    last_key = None
+    for last_key, item in islice(iterate_from(key_from), limit if limit >= 0 else None):
+        items.append(item)
+    if limit < 0 or len(items) < limit or last_key is None:
+        return items, None
+    return items, encode_cursor(last_key)
+
+
+def paginate_by_offset(it: 'Iterator[T]', limit: int, cursor: Optional[str] = None) -> 'Page[T]':
+    """Fallback for storages, which can not seek: cursor holds number of already listed items"""
+    try:
+        offset = int(decode_cursor(cursor)) if cursor else 0
+    except ValueError:
+        raise InvalidCursor(cursor)
+    items = list(islice(it, offset, offset + limit if limit >= 0 else None))
+    if limit < 0 or len(items) < limit:
+        return items, None
+    return items, encode_cursor(str(offset + len(items)))
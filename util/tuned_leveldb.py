@@ -1,9 +1,145 @@
 import abc
+import marshal
+import os
+import zlib
 
-from leveldb import LevelDB as OriginalLevelDB
+from leveldb import LevelDB as OriginalLevelDB, WriteBatch
 from json import loads, dumps
 from typing import Iterator, Tuple, Optional
 
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+
+
+class ValueCodec(metaclass=abc.ABCMeta):
+    """Serializes json-like values (dicts, lists, strings, numbers, booleans and None) to bytes"""
+    codec_id = None  # type: int
+    name = None  # type: str
+
+    @abc.abstractmethod
+    def encode(self, value) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decode(self, data: bytes):
+        pass
+
+
+class JsonCodec(ValueCodec):
+    codec_id = 1
+    name = 'json'
+
+    def encode(self, value) -> bytes:
+        return dumps(value, ensure_ascii=False, separators=(',', ':')).encode()
+
+    def decode(self, data: bytes):
+        return loads(data.decode())
+
+
+class MarshalCodec(ValueCodec):
+    """Compact binary encoding: repeated dict keys are stored once per value and parsing is several times
+    faster than json. Marshal format is not meant for persistence: it can change between Python versions,
+    so a database written with it may become unreadable after Python upgrade. It is also unsafe to read
+    untrusted data with it. Use it only for databases, which can be rebuilt or are read by the same Python.
+    """
+    codec_id = 2
+    name = 'marshal'
+
+    def encode(self, value) -> bytes:
+        return marshal.dumps(value, 4)
+
+    def decode(self, data: bytes):
+        return marshal.loads(data)
+
+
+class Compressor(metaclass=abc.ABCMeta):
+    compression_id = None  # type: int
+    name = None  # type: str
+
+    @abc.abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abc.abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class ZlibCompressor(Compressor):
+    compression_id = 1
+    name = 'zlib'
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, 1)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class Lz4Compressor(Compressor):
+    """Is available only if lz4 package is installed"""
+    compression_id = 2
+    name = 'lz4'
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_block.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        if lz4_block is None:
+            raise ValueError('Value is compressed with lz4, but lz4 package is not installed')
+        return lz4_block.decompress(data)
+
+
+CODECS = {codec.name: codec for codec in (JsonCodec(), MarshalCodec())}
+COMPRESSORS = {compressor.name: compressor for compressor in (ZlibCompressor(), Lz4Compressor())
+               if compressor.name != 'lz4' or lz4_block is not None}
+_CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+_COMPRESSORS_BY_ID = {compressor.compression_id: compressor for compressor in (ZlibCompressor(), Lz4Compressor())}
+
+# Encoded value is <VALUE_HEADER_MAGIC><codec id><compression id><payload>, compression id is 0 for not compressed
+# payload. Values written before codecs existed are json text, which never starts with VALUE_HEADER_MAGIC.
+VALUE_HEADER_MAGIC = 0
+VALUE_HEADER_SIZE = 3
+
+
+class ValueFormat:
+    """Encodes values with the chosen codec, compressing ones larger than compress_threshold bytes.
+    Values of all codecs and compressions (and legacy json values) are decoded, so format can be changed any time.
+    """
+
+    def __init__(self, codec: str = 'json', compression: Optional[str] = None, compress_threshold: int = 4096) -> None:
+        if codec not in CODECS:
+            raise ValueError('Unknown value codec {}, should be one of ({})'.format(codec, ', '.join(sorted(CODECS))))
+        if compression is not None and compression not in COMPRESSORS:
+            raise ValueError('Unknown or not available value compression {}, should be one of ({})'.format(
+                compression, ', '.join(sorted(COMPRESSORS))))
+        self.codec = CODECS[codec]
+        self.compressor = COMPRESSORS[compression] if compression is not None else None
+        self.compress_threshold = compress_threshold
+
+    def encode(self, value) -> bytes:
+        payload = self.codec.encode(value)
+        if self.compressor is not None and len(payload) > self.compress_threshold:
+            header = bytes((VALUE_HEADER_MAGIC, self.codec.codec_id, self.compressor.compression_id))
+            return header + self.compressor.compress(payload)
+        return bytes((VALUE_HEADER_MAGIC, self.codec.codec_id, 0)) + payload
+
+    @staticmethod
+    def decode(data: bytes):
+        if not data or data[0] != VALUE_HEADER_MAGIC:
+            return loads(data.decode())
+        codec_id, compression_id = data[1], data[2]
+        payload = data[VALUE_HEADER_SIZE:]
+        if compression_id:
+            if compression_id not in _COMPRESSORS_BY_ID:
+                raise ValueError('Value is compressed with unknown compression {}'.format(compression_id))
+            payload = _COMPRESSORS_BY_ID[compression_id].decompress(payload)
+        if codec_id not in _CODECS_BY_ID:
+            raise ValueError('Value is encoded with unknown codec {}'.format(codec_id))
+        return _CODECS_BY_ID[codec_id].decode(payload)
+
 
 class DB(metaclass=abc.ABCMeta):
     def collection_view(self, collection_name: str) -> 'DB':
@@ -14,11 +150,17 @@ class DB(metaclass=abc.ABCMeta):
         pass
 
     @abc.abstractmethod
-    def put(self, key: str, value: dict, sync=True):
+    def put(self, key: str, value: dict, sync=True, batch: WriteBatch = None):
+        """Writes value by key. If batch is set, put is only added to it and will be applied by write_batch"""
+        pass
+
+    @abc.abstractmethod
+    def delete(self, key: str, sync=True, batch: WriteBatch = None):
         pass
 
     @abc.abstractmethod
-    def delete(self, key: str, sync=True):
+    def write_batch(self, batch: WriteBatch, sync=True):
+        """Atomically applies all changes collected in batch"""
         pass
 
     @abc.abstractmethod
@@ -26,6 +168,13 @@ class DB(metaclass=abc.ABCMeta):
                     fill_cache=True) -> 'Iterator[Tuple[str, Optional[dict]]]':
         pass
 
+    @abc.abstractmethod
+    def compact(self, key_from=None, key_to=None):
+        """Compacts storage of keys in [key_from, key_to] range (the whole db, if range is not set),
+        so space of deleted and overwritten values is reclaimed
+        """
+        pass
+
 
 class CollectionView(DB):
     def __init__(self, db: DB, collection: str):
@@ -46,17 +195,21 @@ class CollectionView(DB):
     def get(self, key: str, fill_cache=True) -> dict:
         return self.db.get(self._to_full_key(key), fill_cache)
 
-    def put(self, key: str, value: dict, sync=True):
-        return self.db.put(self._to_full_key(key), value, sync)
+    def put(self, key: str, value: dict, sync=True, batch: WriteBatch = None):
+        return self.db.put(self._to_full_key(key), value, sync, batch)
+
+    def delete(self, key: str, sync=True, batch: WriteBatch = None):
+        return self.db.delete(self._to_full_key(key), sync=sync, batch=batch)
 
-    def delete(self, key: str, sync=True):
-        return self.db.delete(self._to_full_key(key), sync=sync)
+    def write_batch(self, batch: WriteBatch, sync=True):
+        return self.db.write_batch(batch, sync)
 
     def iterate_all(self, key_from=None, key_to=None,
                     include_value=True, verify_checksums=False,
                     fill_cache=True) -> 'Iterator[Tuple[str, Optional[dict]]]':
-        begin_key = self._begin_key + (key_from if key_from else '')
-        end_key = self._end_key + (key_to if key_to else '')
+        # range is passed to parent db as its own keys, so nested views scan only their part of parent collection
+        begin_key = self._to_full_key(key_from) if key_from else self._begin_key
+        end_key = self._to_full_key(key_to) if key_to else self._end_key
         it = self.db.iterate_all(key_from=begin_key, key_to=end_key,
                                  include_value=include_value,
                                  verify_checksums=verify_checksums, fill_cache=fill_cache)
@@ -64,20 +217,39 @@ class CollectionView(DB):
             if key.startswith(self._data_key_prefix):
                 yield self._from_full_key(key), value
 
+    def compact(self, key_from=None, key_to=None):
+        begin_key = self._to_full_key(key_from) if key_from else self._begin_key
+        end_key = self._to_full_key(key_to) if key_to else self._end_key
+        return self.db.compact(key_from=begin_key, key_to=end_key)
+
 
 class LevelDB(DB):
-    def __init__(self, *args, **kwargs) -> None:
-        self.db = OriginalLevelDB(*args, **kwargs)
+    def __init__(self, filename: str, *args, value_format: ValueFormat = None, **kwargs) -> None:
+        self.filename = filename
+        self.db = OriginalLevelDB(filename, *args, **kwargs)
+        self.value_format = value_format or ValueFormat()
+
+    def disk_size(self) -> int:
+        """:returns size of all files of database in bytes"""
+        return sum(entry.stat().st_size for entry in os.scandir(self.filename) if entry.is_file())
 
     def get(self, key: str, fill_cache=True) -> dict:
-        return loads(self.db.Get(key=key.encode(), fill_cache=fill_cache).decode())
+        return self.value_format.decode(self.db.Get(key=key.encode(), fill_cache=fill_cache))
 
-    def put(self, key: str, value: dict, sync=True):
-        return self.db.Put(key=key.encode(), value=dumps(value, ensure_ascii=False).encode(), sync=sync)
+    def put(self, key: str, value: dict, sync=True, batch: WriteBatch = None):
+        value = self.value_format.encode(value)
+        if batch is not None:
+            return batch.Put(key.encode(), value)
+        return self.db.Put(key=key.encode(), value=value, sync=sync)
 
-    def delete(self, key: str, sync=True):
+    def delete(self, key: str, sync=True, batch: WriteBatch = None):
+        if batch is not None:
+            return batch.Delete(key.encode())
         return self.db.Delete(key=key.encode(), sync=sync)
 
+    def write_batch(self, batch: WriteBatch, sync=True):
+        return self.db.Write(batch, sync=sync)
+
     def iterate_all(self, key_from=None, key_to=None, include_value=True, verify_checksums=False,
                     fill_cache=True) -> 'Iterator[Tuple[str, Optional[dict]]]':
         if isinstance(key_from, str):
@@ -87,8 +259,16 @@ class LevelDB(DB):
         it = self.db.RangeIter(key_from=key_from, key_to=key_to, include_value=include_value,
                                verify_checksums=verify_checksums, fill_cache=fill_cache)
         if include_value:
+            decode = self.value_format.decode
             for key, value in it:
-                yield key.decode(), loads(value.decode())
+                yield key.decode(), decode(value)
         else:
             for key in it:
                 yield key.decode(), None
+
+    def compact(self, key_from=None, key_to=None):
+        if isinstance(key_from, str):
+            key_from = key_from.encode()
+        if isinstance(key_to, str):
+            key_to = key_to.encode()
+        return self.db.CompactRange(start=key_from, end=key_to)
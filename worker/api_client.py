@@ -1,39 +1,347 @@
-from typing import Optional
+from collections import defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor
+from threading import Event, Lock, Thread
+from typing import Any, Iterator, Optional, Dict, List, Tuple
 import requests
 from common.models.state import TaskState
+from common.models.task import TaskInfo
+
+
+class TaskRequestFailed(Exception):
+    def __init__(self, task_id: str, reason: str) -> None:
+        self.task_id = task_id
+        self.reason = reason
+
+    def __str__(self):
+        return 'Request for task "{}" failed: {}'.format(self.task_id, self.reason)
+
+
+class TaskCreationFailed(Exception):
+    def __init__(self, host: str, reason: str) -> None:
+        self.host = host
+        self.reason = reason
+
+    def __str__(self):
+        return 'Failed to create task on worker {}: {}'.format(self.host, self.reason)
+
+
+class WorkerRequestTimeout(Exception):
+    def __init__(self, host: str, timeout: float) -> None:
+        self.host = host
+        self.timeout = timeout
+
+    def __str__(self):
+        return 'Worker {} has not answered in {} seconds'.format(self.host, self.timeout)
+
+
+class ClientPoolStopped(Exception):
+    def __str__(self):
+        return 'Worker client pool is shut down'
+
+
+class ListingFailed(Exception):
+    def __init__(self, response: dict) -> None:
+        self.response = response
+
+    def __str__(self):
+        return 'Failed to list tasks: {}'.format(self.response)
 
 
 class WorkerApiClient:
     # TODO: Make error handling in client
 
     def __init__(self, worker_host: str = 'localhost', worker_port: int = 8081,
-                 ssl: bool = False, api_version: str = 'v1.0'):
+                 ssl: bool = False, api_version: str = 'v1.0', timeout: Optional[float] = None):
+        """:param timeout: seconds to wait for connection and for every read of response, no limit if it is None"""
+        self._worker_host = worker_host
+        self._timeout = timeout
         self._url_prefix = 'http{}://{}:{}/{}/'.format('s' if ssl else '', worker_host, worker_port, api_version)
 
-    def create_task(self, task_struct: dict) -> str:
-        """Creates task by task_struct
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """Sends request with client's timeout, unless other one is given
+        :raises WorkerRequestTimeout: if worker has not answered in time
+        """
+        kwargs.setdefault('timeout', self._timeout)
+        try:
+            return requests.request(method, url, **kwargs)
+        except requests.Timeout:
+            raise WorkerRequestTimeout(self._worker_host, kwargs['timeout'])
+
+    def create_task(self, task_struct: dict, notify_url: Optional[str] = None) -> str:
+        """Creates task by task_struct. If notify_url is set, worker will push task state changes to it.
         :returns str: task_id of created task
         """
-        return requests.post(self._url_prefix + 'task/', json=task_struct).json()['payload']['task_id']
+        params = {'notify_url': notify_url} if notify_url else None
+        result = self._request('POST', self._url_prefix + 'task/', json=task_struct, params=params)
+        return result.json()['payload']['task_id']
 
     def start_task(self, task_id: str) -> TaskState:
         """Starts task execution by task_id
         :returns TaskState: new state
         """
-        return TaskState(requests.post('{}task/{}/start'.format(self._url_prefix,
-                                                                task_id)).json()['payload']['new_state'])
+        return TaskState(self._request('POST', '{}task/{}/start'.format(self._url_prefix,
+                                                                        task_id)).json()['payload']['new_state'])
 
     def get_task_state(self, task_id: str) -> TaskState:
         """Returns task state by task_id
         :returns TaskState: task state
         """
-        return TaskState(requests.get('{}task/{}/state'.format(self._url_prefix, task_id)).json()['payload']['state'])
+        url = '{}task/{}/state'.format(self._url_prefix, task_id)
+        return TaskState(self._request('GET', url).json()['payload']['state'])
+
+    def create_tasks(self, task_structs: List[dict],
+                     notify_url: Optional[str] = None) -> Tuple[List[Optional[str]], Dict[int, str]]:
+        """Creates tasks by task_structs in one request. If notify_url is set, worker will push state changes of
+        all these tasks to it. Invalid structs do not prevent creation of other tasks.
+        :returns Tuple[List[Optional[str]], Dict[int, str]]: task_ids of created tasks in the same order as
+                                                             task_structs (None for failed ones) and error messages
+                                                             by index of failed struct
+        """
+        data = {'tasks': task_structs}
+        if notify_url:
+            data['notify_url'] = notify_url
+        payload = self._request('POST', self._url_prefix + 'tasks/batch/create', json=data).json()['payload']
+        return payload['task_ids'], {int(k): v for k, v in payload.get('errors', {}).items()}
 
-    def get_task_log(self, task_id: str, log_type: str = 'out') -> Optional[str]:
-        """Returns task log by task_id and log type
+    def start_tasks(self, task_ids: List[str]) -> Tuple[Dict[str, TaskState], Dict[str, str]]:
+        """Starts execution of several tasks in one request
+        :returns Tuple[Dict[str, TaskState], Dict[str, str]]: new states of started tasks and
+                                                              error messages for tasks failed to start
+        """
+        payload = self._request('POST', self._url_prefix + 'tasks/batch/start',
+                                json={'task_ids': task_ids}).json()['payload']
+        return {k: TaskState(v) for k, v in payload['new_states'].items()}, payload['errors']
+
+    def get_task_states(self, task_ids: List[str]) -> Tuple[Dict[str, TaskState], Dict[str, str]]:
+        """Returns states of several tasks in one request
+        :returns Tuple[Dict[str, TaskState], Dict[str, str]]: task states and error messages for unknown tasks
+        """
+        payload = self._request('POST', self._url_prefix + 'tasks/batch/state',
+                                json={'task_ids': task_ids}).json()['payload']
+        return {k: TaskState(v) for k, v in payload['states'].items()}, payload['errors']
+
+    def list_tasks_page(self, limit: int = 100, cursor: Optional[str] = None,
+                        with_info: bool = False) -> Tuple[List[TaskInfo], Optional[str]]:
+        """Reads one page of known tasks, starting from the cursor returned with the previous page
+           (or the first page, if cursor is None). If with_info is false, only task_id will be received.
+        :returns Tuple[List[TaskInfo], Optional[str]]: tasks and cursor of the next page (None for the last page)
+        """
+        params = {'limit': limit, 'cursor': cursor or '', 'with_info': '1' if with_info else '0'}
+        data = self._request('GET', self._url_prefix + 'tasks', params=params).json()
+        if data.get('status') != 'ok':
+            raise ListingFailed(data)
+        return [TaskInfo.create(_) for _ in data['payload']['items']], data['payload']['next_cursor']
+
+    def get_stats(self) -> dict:
+        """Returns worker stats: running and queued task counts of its execution pool, backend and retention stats
+        :returns dict: stats by worker subsystem
+        """
+        return self._request('GET', self._url_prefix + 'stats').json()['payload']
+
+    def get_task_log(self, task_id: str, log_type: str = 'out', offset: int = 0, limit: Optional[int] = None,
+                     tail_lines: Optional[int] = None) -> Optional[str]:
+        """Returns task log by task_id and log type: at most limit bytes from offset (negative offset is counted
+        from the end of log) or last tail_lines lines. If neither is set, log is read from offset till its end
+        page by page.
         :returns Optional[str]: Contents of the log. None, if log is not found
         """
+        if tail_lines is not None or limit is not None:
+            page = self.get_task_log_page(task_id, log_type, offset=offset, limit=limit, tail_lines=tail_lines)
+            return page['data'] if page is not None else None
+        parts = []
+        while True:
+            page = self.get_task_log_page(task_id, log_type, offset=offset)
+            if page is None:
+                return None
+            parts.append(page['data'])
+            if not page['data'] or page['next_offset'] >= page['size']:
+                return ''.join(parts)
+            offset = page['next_offset']
+
+    def get_task_log_page(self, task_id: str, log_type: str = 'out', offset: int = 0, limit: Optional[int] = None,
+                          tail_lines: Optional[int] = None) -> Optional[dict]:
+        """Reads one page of task log: at most limit bytes from offset (negative offset is counted from the end
+        of log) or last tail_lines lines. Page is cut by worker, if it is too big.
+        :returns Optional[dict]: data of the page, its offset, offset of the next page and size of log.
+                                 None, if log is not found
+        """
+        assert log_type in ('out', 'err'), 'Log type should be one of (out, err)'
+        url = '{}task/{}/log/{}'.format(self._url_prefix, task_id, log_type)
+        if tail_lines is not None:
+            params = {'tail_lines': tail_lines}
+        else:
+            params = {'offset': offset}
+            if limit is not None:
+                params['limit'] = limit
+        result = self._request('GET', url, params=params)
+        if not result.ok:
+            return None
+        payload = result.json()['payload']
+        return {'data': payload['data'], 'offset': payload['offset'], 'next_offset': payload['next_offset'],
+                'size': payload['size']}
+
+    def get_task_log_segments(self, task_id: str, log_type: str = 'out') -> Optional[dict]:
+        """Returns segments of task log, which is split into segments or compressed according to log policy.
+        Log offsets, which are not covered by segments, belong to dropped parts of log.
+        :returns Optional[dict]: size of log and list of its segments with offset, size and compressed flag.
+                                 None, if log is not found
+        """
         assert log_type in ('out', 'err'), 'Log type should be one of (out, err)'
-        result = requests.get('{}task/{}/log/{}'.format(self._url_prefix, task_id, log_type))
+        result = self._request('GET', '{}task/{}/log/{}/segments'.format(self._url_prefix, task_id, log_type))
         if result.ok:
-            return result.json()['payload']['data']
+            payload = result.json()['payload']
+            return {'size': payload['size'], 'segments': payload['segments']}
+
+    def task_log_raw_url(self, task_id: str, log_type: str = 'out') -> str:
+        """:returns url, which streams raw task log"""
+        return '{}task/{}/log/{}/raw'.format(self._url_prefix, task_id, log_type)
+
+    def stream_task_log(self, task_id: str, log_type: str = 'out', offset: int = 0, limit: Optional[int] = None,
+                        tail_lines: Optional[int] = None, follow: bool = False,
+                        chunk_size: int = 64 << 10) -> Iterator[bytes]:
+        """Streams raw task log from offset (negative one is counted from the end of log) or from the start of
+        last tail_lines lines, at most limit bytes. If follow is set, stream lasts until the task reaches
+        terminal state, then client's timeout is not applied, as log can stay unchanged for long.
+        :returns Iterator[bytes]: chunks of the log, nothing if log is not found
+        """
+        assert log_type in ('out', 'err'), 'Log type should be one of (out, err)'
+        params = {'offset': offset, 'follow': '1' if follow else '0'}
+        if limit is not None:
+            params['limit'] = limit
+        if tail_lines is not None:
+            params['tail_lines'] = tail_lines
+        with self._request('GET', self.task_log_raw_url(task_id, log_type), params=params, stream=True,
+                           timeout=None if follow else self._timeout) as result:
+            if result.ok:
+                yield from result.iter_content(chunk_size)
+
+
+class WorkerApiClientPool:
+    """Sends requests to many workers concurrently. Each call is executed on a bounded thread pool
+    and returns a Future, so callers can fan out calls to all hosts first and wait for results afterwards.
+    Future of a request, which has not been answered in request_timeout seconds, fails with WorkerRequestTimeout.
+    """
+
+    def __init__(self, worker_port: int = 8081, max_concurrency: int = 16,
+                 ssl: bool = False, api_version: str = 'v1.0', request_timeout: Optional[float] = None):
+        self._worker_port = worker_port
+        self._request_timeout = request_timeout
+        self._ssl = ssl
+        self._api_version = api_version
+        self._clients = dict()  # type: Dict[str, WorkerApiClient]
+        self._clients_lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def get_client(self, host: str) -> WorkerApiClient:
+        with self._clients_lock:
+            client = self._clients.get(host)
+            if client is None:
+                client = self._clients[host] = WorkerApiClient(worker_host=host, worker_port=self._worker_port,
+                                                               ssl=self._ssl, api_version=self._api_version,
+                                                               timeout=self._request_timeout)
+            return client
+
+    def create_task(self, host: str, task_struct: dict, notify_url: Optional[str] = None) -> 'Future[str]':
+        return self._executor.submit(self.get_client(host).create_task, task_struct, notify_url)
+
+    def start_task(self, host: str, task_id: str) -> 'Future[TaskState]':
+        return self._executor.submit(self.get_client(host).start_task, task_id)
+
+    def get_task_state(self, host: str, task_id: str) -> 'Future[TaskState]':
+        return self._executor.submit(self.get_client(host).get_task_state, task_id)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+class BatchingWorkerApiClientPool(WorkerApiClientPool):
+    """Same interface as WorkerApiClientPool, but requests are not sent right away.
+    They are collected during batch_window seconds from all callers and sent as one batch request per host and
+    operation, so request count depends on number of hosts instead of number of tasks.
+    Requests, which have not been sent before shutdown, fail with ClientPoolStopped.
+    """
+
+    def __init__(self, worker_port: int = 8081, max_concurrency: int = 16, batch_window: float = 0.01,
+                 max_batch_size: int = 500, ssl: bool = False, api_version: str = 'v1.0',
+                 request_timeout: Optional[float] = None):
+        super().__init__(worker_port=worker_port, max_concurrency=max_concurrency, ssl=ssl, api_version=api_version,
+                         request_timeout=request_timeout)
+        self._batch_window = batch_window
+        self._max_batch_size = max_batch_size
+        # (operation, host, notify_url) -> list of pairs (request argument, future for result)
+        self._pending = defaultdict(list)  # type: Dict[Tuple[str, str, Optional[str]], List[Tuple[Any, Future]]]
+        self._pending_lock = Lock()
+        self._has_pending = Event()
+        self._stopped = Event()
+        self._flusher = Thread(target=self._run_flusher, name='dedalus-worker-batcher', daemon=True)
+        self._flusher.start()
+
+    def _enqueue(self, operation: str, host: str, arg, notify_url: Optional[str] = None) -> Future:
+        future = Future()
+        with self._pending_lock:
+            if self._stopped.is_set():
+                future.set_exception(ClientPoolStopped())
+                return future
+            self._pending[(operation, host, notify_url)].append((arg, future))
+        self._has_pending.set()
+        return future
+
+    def create_task(self, host: str, task_struct: dict, notify_url: Optional[str] = None) -> 'Future[str]':
+        return self._enqueue('create', host, task_struct, notify_url)
+
+    def start_task(self, host: str, task_id: str) -> 'Future[TaskState]':
+        return self._enqueue('start', host, task_id)
+
+    def get_task_state(self, host: str, task_id: str) -> 'Future[TaskState]':
+        return self._enqueue('state', host, task_id)
+
+    def _run_flusher(self):
+        while not self._stopped.is_set():
+            self._has_pending.wait()
+            if self._stopped.wait(self._batch_window):
+                break
+            with self._pending_lock:
+                pending, self._pending = self._pending, defaultdict(list)
+                self._has_pending.clear()
+            for (operation, host, notify_url), requests_list in pending.items():
+                for idx in range(0, len(requests_list), self._max_batch_size):
+                    self._executor.submit(self._send_batch, operation, host, notify_url,
+                                          requests_list[idx:idx + self._max_batch_size])
+
+    def _send_batch(self, operation: str, host: str, notify_url: Optional[str],
+                    requests_list: 'List[Tuple[Any, Future]]'):
+        client = self.get_client(host)
+        error = None
+        try:
+            if operation == 'create':
+                task_ids, errors = client.create_tasks([task_struct for task_struct, _ in requests_list], notify_url)
+                for idx, ((_, future), task_id) in enumerate(zip(requests_list, task_ids)):
+                    if task_id is not None:
+                        future.set_result(task_id)
+                    else:
+                        future.set_exception(TaskCreationFailed(host, errors.get(idx, 'no answer from worker')))
+            else:
+                method = client.start_tasks if operation == 'start' else client.get_task_states
+                states, errors = method([task_id for task_id, _ in requests_list])
+                for task_id, future in requests_list:
+                    if task_id in states:
+                        future.set_result(states[task_id])
+                    else:
+                        future.set_exception(TaskRequestFailed(task_id, errors.get(task_id, 'no answer from worker')))
+        except Exception as ex:
+            error = ex
+        for _, future in requests_list:
+            if not future.done():
+                future.set_exception(error or Exception('Worker {} gave incomplete answer'.format(host)))
+
+    def shutdown(self):
+        with self._pending_lock:
+            self._stopped.set()
+        self._has_pending.set()
+        self._flusher.join()  # no batch is submitted after that
+        with self._pending_lock:
+            pending, self._pending = self._pending, defaultdict(list)
+        for requests_list in pending.values():
+            for _, future in requests_list:
+                future.set_exception(ClientPoolStopped())
+        super().shutdown()
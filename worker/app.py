@@ -4,28 +4,43 @@ import argparse
 import asyncio
 import json as js
 import logging
-import os
 from itertools import islice
 from uuid import uuid4
 
+from aiohttp import web
 from aiohttp.web_reqrep import Request
-from common.api import CommonApi, ResultOk, ResultError, ResultNotFound
+from common.api import CommonApi, ResultOk, ResultError, ResultNotFound, json_response
 from common.models.state import TaskState
+from common.models.task import TaskStruct
 from worker.backend import WorkerBackends
 from worker.config import WorkerConfig
 from worker.engine import Engine
 from worker.executor import Executors
+from worker.notifier import TaskStateNotifier
 from worker.resource import Resources
+from worker.resource_cache import ResourceCache
+from worker.retention import TaskRetentionService
+from worker import task_log
+from util.pagination import InvalidCursor
 
 
 class WorkerApp:
     def __init__(self, config: WorkerConfig) -> None:
         self.config = config
         self.executors = Executors(config.plugins.execution_data_root, config.plugins.executors_dir)
-        self.resources = Resources(config.plugins.resources_dir)
+        self.resource_cache = ResourceCache(config.resource_cache) if config.resource_cache.cache_dir else None
+        self.resources = Resources(config.plugins.resources_dir, self.resource_cache)
         self.backend = WorkerBackends(config.plugins.backends_dir).construct_backend(config.backend,
                                                                                      config.backend_config)
-        self.engine = Engine(self.backend, self.resources, self.executors)
+        self.notifier = TaskStateNotifier(batch_window=config.notifier.batch_window,
+                                          max_retry_delay=config.notifier.max_retry_delay,
+                                          max_attempts=config.notifier.max_attempts)
+        self.engine = Engine(self.backend, self.resources, self.executors, self.notifier, config.execution_pool)
+        self.retention = TaskRetentionService(self.backend, self.engine, config.plugins.execution_data_root,
+                                              config.retention)
+
+    def shutdown(self):
+        self.retention.shutdown()
 
     @staticmethod
     def ping(*args):
@@ -33,9 +48,31 @@ class WorkerApp:
 
     def create_task(self, args: dict, request: Request):
         task_id = uuid4().hex
-        self.engine.create_idle_task(task_id, task_struct=args)
+        self.engine.create_idle_task(task_id, task_struct=args, notify_url=request.GET.get('notify_url', None))
         return ResultOk({'task_id': task_id})
 
+    def create_tasks(self, args: dict, request: Request):
+        task_structs = args.get('tasks', None)
+        if not isinstance(task_structs, list):
+            return ResultError(error='tasks field should be a list of task structs')
+        notify_url = args.get('notify_url', None)
+        task_ids, errors = [None] * len(task_structs), dict()
+        valid_idxs = []
+        for idx, task_struct in enumerate(task_structs):  # all structs are verified before any task is created
+            try:
+                TaskStruct.create(task_struct)
+                valid_idxs.append(idx)
+            except Exception as ex:
+                errors[str(idx)] = 'Invalid task struct: {}'.format(ex)
+        for idx in valid_idxs:
+            try:
+                task_id = uuid4().hex
+                self.engine.create_idle_task(task_id, task_struct=task_structs[idx], notify_url=notify_url)
+                task_ids[idx] = task_id
+            except Exception as ex:
+                errors[str(idx)] = str(ex)
+        return ResultOk(task_ids=task_ids, errors=errors)
+
     def get_task_info(self, args: dict, request: Request):
         task_id = request.match_info.get('task_id', None)
         if not task_id:
@@ -46,8 +83,19 @@ class WorkerApp:
         task_id = request.match_info.get('task_id', None)
         if not task_id:
             return ResultError(error='task_id field should be set')
-        task_info = self.backend.read_task_info(task_id=task_id)
-        return ResultOk({'state': task_info.exec_stats.state.name})
+        return ResultOk({'state': self.backend.read_task_state(task_id=task_id).name})
+
+    def get_tasks_state(self, args: dict, request: Request):
+        task_ids = args.get('task_ids', None)
+        if not isinstance(task_ids, list):
+            return ResultError(error='task_ids field should be a list of task ids')
+        states, errors = dict(), dict()
+        for task_id in task_ids:
+            try:
+                states[task_id] = self.backend.read_task_state(task_id=task_id).name
+            except Exception as ex:
+                errors[task_id] = str(ex)
+        return ResultOk(states=states, errors=errors)
 
     def start_task(self, args: dict, request: Request):
         task_id = request.match_info.get('task_id', None)
@@ -61,21 +109,49 @@ class WorkerApp:
             return ResultError(error='task_id field should be set')
         return self._set_task_state(task_id, TaskState.stopped)
 
+    def start_tasks(self, args: dict, request: Request):
+        task_ids = args.get('task_ids', None)
+        if not isinstance(task_ids, list):
+            return ResultError(error='task_ids field should be a list of task ids')
+        prev_states, errors = dict(), dict()
+        for task_id in task_ids:
+            try:
+                prev_states[task_id] = self.engine.set_task_state(task_id, TaskState.preparing)
+            except Exception as ex:
+                errors[task_id] = str(ex)
+        return ResultOk(prev_states=prev_states, new_states={_: self._started_task_state(_) for _ in prev_states},
+                        errors=errors)
+
     def _set_task_state(self, task_id: str, task_state_name: str):
         prev_state = self.engine.set_task_state(task_id, task_state_name)
+        if task_state_name == TaskState.preparing:
+            return ResultOk(prev_state=prev_state, new_state=self._started_task_state(task_id))
         return ResultOk(prev_state=prev_state, new_state=task_state_name)
 
+    def _started_task_state(self, task_id: str) -> str:
+        return TaskState.queued if self.engine.is_queued(task_id) else TaskState.preparing
+
     def list_tasks(self, args: dict, request: Request):
         with_info = (args.get('with_info', '1') == '1')
         limit = int(args.get('limit', '-1'))
         offset = int(args.get('offset', '0'))
-        it = islice(self.backend.list_tasks(with_info=with_info), offset, offset + limit if limit >= 0 else None)
-        return ResultOk(
-            [
-                task_info.to_json() if task_info else {'task_id': task_id}
-                for task_id, task_info in it
-            ]
-        )
+        cursor = args.get('cursor', None)  # empty cursor requests the first page
+        if cursor is not None:
+            try:
+                it, next_cursor = self.backend.list_tasks_page(limit, cursor or None, with_info=with_info)
+            except InvalidCursor as ex:
+                return ResultError(error=str(ex))
+        else:
+            it = islice(self.backend.list_tasks(with_info=with_info), offset, offset + limit if limit >= 0 else None)
+        items = [
+            task_info.to_json() if task_info else {'task_id': task_id}
+            for task_id, task_info in it
+        ]
+        return ResultOk(items=items, next_cursor=next_cursor) if cursor is not None else ResultOk(items)
+
+    def stats(self, args: dict, request: Request):
+        return ResultOk(backend=self.backend.stats(), engine=self.engine.stats(), retention=self.retention.stats(),
+                        resource_cache=self.resource_cache.stats() if self.resource_cache else None)
 
     def task_log(self, args: dict, request: Request):
         task_id = request.match_info.get('task_id', None)
@@ -84,17 +160,52 @@ class WorkerApp:
             return ResultError(error='task_id field should be set')
         if log_type not in ('err', 'out'):
             return ResultError(error='Log type should be one of (err, out)')
-        # TODO: extract calculation of execution data root
-        self.backend.read_task_info(task_id)  # just verify that this task exists
-        log_path = os.path.join(self.config.plugins.execution_data_root, task_id, 'std{}.log'.format(log_type))
         try:
-            with open(log_path, 'r') as f:
-                return ResultOk(log_type=log_type, data=f.read())
-        except:
+            offset = int(args.get('offset', '0'))
+            limit = int(args['limit']) if args.get('limit') else None
+            tail_lines = int(args['tail_lines']) if args.get('tail_lines') else None
+        except ValueError as ex:
+            return ResultError(error='offset, limit and tail_lines should be integers: {}'.format(ex))
+        log_path = self.task_log_path(task_id, log_type)
+        try:
+            if tail_lines is not None:
+                chunk = task_log.read_tail_lines(log_path, tail_lines)
+            else:
+                chunk = task_log.read_range(log_path, offset, limit)
+        except OSError:
+            return ResultNotFound()
+        return ResultOk(log_type=log_type, **chunk._asdict())
+
+    def task_log_segments(self, args: dict, request: Request):
+        task_id = request.match_info.get('task_id', None)
+        log_type = request.match_info.get('log_type', None)
+        if not task_id:
+            return ResultError(error='task_id field should be set')
+        if log_type not in ('err', 'out'):
+            return ResultError(error='Log type should be one of (err, out)')
+        segments = task_log.list_segments(self.task_log_path(task_id, log_type))
+        if not segments:
             return ResultNotFound()
+        return ResultOk(log_type=log_type, size=segments[-1].offset + segments[-1].size, segments=[
+            {'offset': _.offset, 'size': _.size, 'compressed': _.compressed} for _ in segments
+        ])
+
+    def task_log_path(self, task_id: str, log_type: str) -> str:
+        """Verifies that task exists
+        :returns path to its log of given type
+        """
+        self.backend.read_task_info(task_id)
+        # TODO: extract calculation of execution data root
+        return task_log.task_log_path(self.config.plugins.execution_data_root, task_id, log_type)
+
+    def is_task_finished(self, task_id: str) -> bool:
+        return self.backend.read_task_state(task_id).is_terminal
 
 
 class WorkerApi(CommonApi):
+    # Seconds between checks for new data of log streamed in follow mode
+    FOLLOW_POLL_INTERVAL = 0.5
+
     def __init__(self, loop, cfg: WorkerConfig) -> None:
         super().__init__(loop=loop, api_config=cfg.api, app_config=cfg)
 
@@ -108,13 +219,77 @@ class WorkerApi(CommonApi):
             ('GET', '/ping', 'ping'),
             ('GET', '/v1.0/tasks', 'list_tasks'),
             ('POST', '/v1.0/task/', 'create_task'),
+            ('POST', '/v1.0/tasks/batch/create', 'create_tasks'),
+            ('POST', '/v1.0/tasks/batch/start', 'start_tasks'),
+            ('POST', '/v1.0/tasks/batch/state', 'get_tasks_state'),
             ('GET',  '/v1.0/task/{task_id}', 'get_task_info'),
             ('GET',  '/v1.0/task/{task_id}/state', 'get_task_state'),
             ('POST', '/v1.0/task/{task_id}/start', 'start_task'),
             ('POST', '/v1.0/task/{task_id}/stop', 'stop_task'),
             ('GET', '/v1.0/task/{task_id}/log/{log_type}', 'task_log'),
+            ('GET', '/v1.0/task/{task_id}/log/{log_type}/segments', 'task_log_segments'),
+            ('GET', '/v1.0/stats', 'stats'),
+        ]
+
+    @property
+    def raw_routes(self):
+        return [
+            ('GET', '/v1.0/task/{task_id}/log/{log_type}/raw', 'task_log_raw'),
         ]
 
+    async def task_log_raw(self, request: Request):
+        """Streams log as is, reading it by chunks. offset (negative one is counted from the end) and limit select
+        byte range of log, tail_lines - last lines of it. If follow=1, appended data is streamed until task reaches
+        terminal state.
+        """
+        task_id = request.match_info.get('task_id', None)
+        log_type = request.match_info.get('log_type', None)
+        if log_type not in ('err', 'out'):
+            return json_response(ResultError(error='Log type should be one of (err, out)').to_dict(), status=500)
+        try:
+            offset = int(request.GET.get('offset', '0'))
+            limit = int(request.GET['limit']) if request.GET.get('limit') else None
+            tail_lines = int(request.GET['tail_lines']) if request.GET.get('tail_lines') else None
+        except ValueError as ex:
+            error = 'offset, limit and tail_lines should be integers: {}'.format(ex)
+            return json_response(ResultError(error=error).to_dict(), status=500)
+        follow = request.GET.get('follow', '0') == '1'
+        try:
+            log_path = await self.loop.run_in_executor(self.executor, self.app.task_log_path, task_id, log_type)
+            reader = await self.loop.run_in_executor(self.executor, task_log.TaskLogReader, log_path)
+        except Exception:
+            return json_response(ResultNotFound().to_dict(), status=404)
+        try:
+            if tail_lines is not None:
+                offset = await self.loop.run_in_executor(self.executor, reader.find_tail_offset, tail_lines)
+            await self.loop.run_in_executor(self.executor, reader.seek, offset)
+            response = web.StreamResponse()
+            response.content_type = 'text/plain'
+            response.charset = 'utf-8'
+            response.enable_chunked_encoding()
+            await response.prepare(request)
+            left = limit
+            while left is None or left > 0:
+                # state is checked before reading, so everything written before task has finished is streamed
+                finished = not follow or await self.loop.run_in_executor(self.executor, self.app.is_task_finished,
+                                                                         task_id)
+                while left is None or left > 0:
+                    chunk_size = task_log.STREAM_CHUNK_SIZE if left is None else min(task_log.STREAM_CHUNK_SIZE, left)
+                    chunk = await self.loop.run_in_executor(self.executor, reader.read, chunk_size)
+                    if not chunk:
+                        break
+                    if left is not None:
+                        left -= len(chunk)
+                    response.write(chunk)
+                    await response.drain()
+                if finished:
+                    break
+                await asyncio.sleep(self.FOLLOW_POLL_INTERVAL)
+            await response.write_eof()
+            return response
+        finally:
+            reader.close()
+
 
 def main(config: WorkerConfig, args):
     loop = asyncio.get_event_loop()
@@ -131,6 +306,7 @@ def main(config: WorkerConfig, args):
     finally:
         loop.run_until_complete(worker.handler.finish_connections(1))
         worker.server.close()
+        worker.app.shutdown()
         loop.run_until_complete(worker.server.wait_closed())
         loop.run_until_complete(worker.web_app.finish())
     # TODO(luckygeck): gracefully stop all workers
@@ -4,6 +4,8 @@ from typing import Iterator, Tuple, Optional
 from common.models.task import TaskInfo
 from common.models.state import TaskState
 from util.config import Config
+from util.lru_cache import LRUCache, LRUCacheConfig, StripedLock, copy_json
+from util.pagination import Page, paginate_by_offset
 from util.plugins import PluginBase, PluginsMaster
 from util.symver import SymVer
 
@@ -39,6 +41,11 @@ class WorkerBackend(PluginBase, metaclass=abc.ABCMeta):
         """Create or replace task by task_id"""
         pass
 
+    @abc.abstractmethod
+    def delete_task_info(self, task_id: str):
+        """Deletes task by task_id. Deleting not existing task does nothing"""
+        pass
+
     @abc.abstractmethod
     def list_tasks(self, with_info: bool = False) -> Iterator[Tuple[str, Optional[TaskInfo]]]:
         """List all known tasks.
@@ -46,6 +53,16 @@ class WorkerBackend(PluginBase, metaclass=abc.ABCMeta):
         """
         pass
 
+    def list_tasks_page(self, limit: int, cursor: Optional[str] = None,
+                        with_info: bool = False) -> 'Page[Tuple[str, Optional[TaskInfo]]]':
+        """Reads one page of tasks, starting from the cursor returned with the previous page
+        (or from the beginning, if cursor is None).
+        Backends should override it, so page is found without reading all previous ones.
+        :raises InvalidCursor: if cursor was not returned by this method
+        :returns pair of list of (task_id, task_info) and cursor of the next page (None for the last page)
+        """
+        return paginate_by_offset(self.list_tasks(with_info=with_info), limit, cursor)
+
     def read_task_state(self, task_id: str) -> TaskState:
         """
         Receive task state from backend.
@@ -68,10 +85,93 @@ class WorkerBackend(PluginBase, metaclass=abc.ABCMeta):
         self.write_task_info(task_id, task_info)
         return old_state
 
+    def compact(self) -> int:
+        """Reclaims storage space of deleted records, if backend does not do it by itself
+        :returns number of reclaimed bytes
+        """
+        return 0
+
+    def stats(self) -> dict:
+        """:returns backend specific counters"""
+        return dict()
+
+
+class CachingWorkerBackend(WorkerBackend):
+    """Write-through LRU cache of tasks in front of any worker backend.
+    Json of tasks is cached and every read builds new objects from a copy of it, so read objects can be changed
+    in place. Writes replace it with a copy of json of written object. Reads of task state copy and parse only
+    the state part of cached json.
+    """
+
+    def __init__(self, backend: WorkerBackend, cache_config: LRUCacheConfig) -> None:
+        # backend is already configured, so WorkerBackend.__init__ is not called
+        self.backend = backend
+        self.config = backend.config
+        self.cache = LRUCache(cache_config.max_size)
+        self._key_lock = StripedLock()
+
+    @property
+    def name(self) -> str:
+        return self.backend.name
+
+    @property
+    def version(self) -> SymVer:
+        return self.backend.version
+
+    @property
+    def config_class(self) -> type:
+        return self.backend.config_class
+
+    def read_task_info(self, task_id: str) -> TaskInfo:
+        task_json = self.cache.get(task_id)
+        if task_json is None:
+            with self._key_lock(task_id):
+                task_info = self.backend.read_task_info(task_id)
+                self.cache.put(task_id, copy_json(task_info.to_json()))
+            return task_info
+        return TaskInfo.create(copy_json(task_json))
+
+    def read_task_state(self, task_id: str) -> TaskState:
+        task_json = self.cache.get(task_id)
+        if task_json is None:
+            return self.backend.read_task_state(task_id)
+        return TaskState().from_json(copy_json(task_json['exec_stats']['state']))
+
+    def write_task_info(self, task_id: str, task_info: TaskInfo):
+        with self._key_lock(task_id):
+            result = self.backend.write_task_info(task_id, task_info)
+            self.cache.put(task_id, copy_json(task_info.to_json()))
+        return result
+
+    def delete_task_info(self, task_id: str):
+        with self._key_lock(task_id):
+            result = self.backend.delete_task_info(task_id)
+            self.cache.pop(task_id)
+        return result
+
+    def compact(self) -> int:
+        return self.backend.compact()
+
+    def list_tasks(self, with_info: bool = False) -> Iterator[Tuple[str, Optional[TaskInfo]]]:
+        return self.backend.list_tasks(with_info)
+
+    def list_tasks_page(self, limit: int, cursor: Optional[str] = None,
+                        with_info: bool = False) -> 'Page[Tuple[str, Optional[TaskInfo]]]':
+        return self.backend.list_tasks_page(limit, cursor, with_info)
+
+    def stats(self) -> dict:
+        return dict(self.backend.stats(), cache=self.cache.stats())
+
 
 class WorkerBackends(PluginsMaster):
     plugin_base_class = WorkerBackend
 
     def construct_backend(self, backend_type: str, backend_config: dict,
                           backend_min_version: SymVer = SymVer()) -> WorkerBackend:
-        return self.find_plugin(backend_type, backend_min_version)(backend_config)
+        """If backend_config has cache section (LRUCacheConfig), backend is wrapped with CachingWorkerBackend"""
+        backend_config = dict(backend_config)
+        cache_config = backend_config.pop('cache', None)
+        backend = self.find_plugin(backend_type, backend_min_version)(backend_config)
+        if cache_config is not None:
+            backend = CachingWorkerBackend(backend, LRUCacheConfig.create(cache_config))
+        return backend
@@ -1,5 +1,7 @@
 from common.api_config import CommonApiConfig
+from common.retention import RetentionConfig
 from util.config import Config, ConfigField
+from worker.resource_cache import ResourceCacheConfig
 
 
 class PluginsConfig(Config):
@@ -9,10 +11,41 @@ class PluginsConfig(Config):
     backends_dir = ConfigField(type=str, required=True, default='plugins/backends')
 
 
+class NotifierConfig(Config):
+    batch_window = ConfigField(type=float, required=True, default=0.05)
+    max_retry_delay = ConfigField(type=float, required=True, default=30.0)
+    max_attempts = ConfigField(type=int, required=True, default=10)
+
+
+class ExecutionPoolConfig(Config):
+    # Max number of simultaneously prepared and running tasks, other started tasks wait in 'queued' state
+    max_running_tasks = ConfigField(type=int, required=True, default=32)
+    # 'fifo' - queued tasks are started in order of their start requests, 'priority' - tasks with higher
+    # structure.priority are started first (in order of start requests for the same priority)
+    queue_order = ConfigField(type=str, required=True, default='fifo')
+    # Max number of resources of one task prepared at once
+    max_parallel_resources = ConfigField(type=int, required=True, default=4)
+
+    def verify(self):
+        super().verify()
+        assert self.max_running_tasks > 0, '{}: max_running_tasks should be positive'.format(self.path_to_node)
+        assert self.max_parallel_resources > 0, \
+            '{}: max_parallel_resources should be positive'.format(self.path_to_node)
+        assert self.queue_order in ('fifo', 'priority'), \
+            '{}: queue_order should be one of (fifo, priority), got {}'.format(self.path_to_node, self.queue_order)
+
+
 class WorkerConfig(Config):
     api = CommonApiConfig(common_logger='dedalus.worker.api.common',
                           access_logger='dedalus.worker.api.access',
                           port=8081)
     backend = ConfigField(type=str, required=True, default='leveldb')
+    # Config of backend plugin. Optional 'cache' section (util.lru_cache.LRUCacheConfig) enables LRU cache of records
     backend_config = ConfigField(type=dict, required=True, default=dict())
     plugins = PluginsConfig()
+    notifier = NotifierConfig()
+    execution_pool = ExecutionPoolConfig()
+    # Removal of finished, failed and stopped tasks together with their dirs in execution_data_root
+    retention = RetentionConfig()
+    # Shared cache of files downloaded by resources (like remote_file) for all tasks
+    resource_cache = ResourceCacheConfig()
@@ -1,20 +1,37 @@
+import heapq
+import itertools
+import logging
 import os
+import shutil
+import time
 import traceback
-from threading import Thread, Event
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from threading import Thread, Event, Lock
+from typing import Callable, Dict, List, Optional
 
 from common.models.task import TaskInfo
 from common.models.state import TaskState
 from worker.backend import WorkerBackend
+from worker.config import ExecutionPoolConfig
 from worker.executor import ExecutionEnded, Executors
+from worker.notifier import TaskStateNotifier
 from worker.resource import Resources
+from worker.task_log import TaskLogWriter
+
+# Seconds between checks for stop of task, while its resources are prepared
+PREP_STOP_POLL_INTERVAL = 0.1
 
 
 class TaskExecution(Thread):
-    def __init__(self, task_id: str, backend: WorkerBackend,
-                 resources: Resources, executors: Executors) -> None:
+    def __init__(self, task_id: str, backend: WorkerBackend, resources: Resources, executors: Executors,
+                 notifier: TaskStateNotifier, on_done: 'Callable[[str], None]',
+                 max_parallel_resources: int = 1) -> None:
         super().__init__()
         self.task_id = task_id
+        self.on_done = on_done
+        self.max_parallel_resources = max_parallel_resources
         self.backend = backend
+        self.notifier = notifier
         task_info = self.backend.read_task_info(task_id)
         self.resources = [resources.construct_resource(_) for _ in task_info.structure.resources]
         self.executor = executors.construct_executor(self.task_id, task_info.structure.executor)
@@ -26,65 +43,111 @@ class TaskExecution(Thread):
     def set_task_state(self, state: str):
         self.backend.write_task_state(self.task_id, state)
 
+    def _save_task_info(self, task_info: TaskInfo):
+        self.backend.write_task_info(self.task_id, task_info)
+        self.notifier.notify(task_info)
+
     def run(self):
-        if self.prepare() and not self.user_stop.is_set():
-            self.execute_task()
+        try:
+            if self.prepare() and not self.user_stop.is_set():
+                self.execute_task()
+        finally:
+            self.on_done(self.task_id)
 
     def prepare(self):
         task_info = self.backend.read_task_info(self.task_id)
         task_info.exec_stats.start_preparation()
-        self.backend.write_task_info(self.task_id, task_info)
-        prep_error = None
-        for resource in self.resources:
-            if self.user_stop.is_set():
-                break
-            try:
-                resource.ensure()
-            except Exception as ex:
-                print(ex)
-                prep_error = str(ex)
-                break
+        self._save_task_info(task_info)
+        resources_prep = self.prepare_resources()
+        prep_error = next((_['error'] for _ in resources_prep if _['status'] == 'failed'), None)
+        success = prep_error is None and all(_['status'] == 'prepared' for _ in resources_prep)
         task_info = self.backend.read_task_info(self.task_id)
         task_info.exec_stats.finish_preparation(
-            success=prep_error is None,
+            success=success,
             prep_msg=prep_error,
-            is_initiated_by_user=self.user_stop.is_set()
+            is_initiated_by_user=self.user_stop.is_set(),
+            resources_prep=resources_prep
         )
-        self.backend.write_task_info(self.task_id, task_info)
-        return prep_error is None
+        self._save_task_info(task_info)
+        return success
+
+    def _ensure_resource(self, idx: int, durations: 'List[float]'):
+        start_time = time.time()
+        try:
+            self.resources[idx].ensure()
+        finally:
+            durations[idx] = time.time() - start_time
+
+    def prepare_resources(self) -> 'List[dict]':
+        """Ensures resources concurrently, at most max_parallel_resources at once.
+        Resources, which are not prepared yet, are cancelled as soon as one of them fails or task is stopped:
+        not started ones are never started and running ones are not waited for. Resources can not be interrupted,
+        so running ones keep writing their local paths in background after task is already prepfailed or stopped.
+        :returns preparation results of resources
+        """
+        if not self.resources:
+            return []
+        durations = [None] * len(self.resources)
+        pool = ThreadPoolExecutor(max_workers=min(self.max_parallel_resources, len(self.resources)))
+        futures = [pool.submit(self._ensure_resource, idx, durations) for idx in range(len(self.resources))]
+        try:
+            pending = futures  # type: List[Future]
+            while pending and not self.user_stop.is_set():
+                done, pending = wait(pending, timeout=PREP_STOP_POLL_INTERVAL, return_when=FIRST_EXCEPTION)
+                if any(_.exception() is not None for _ in done):
+                    break
+            for future in futures:
+                future.cancel()
+        finally:
+            pool.shutdown(wait=False)
+        resources_prep = []
+        for resource, future, duration in zip(self.resources, futures, durations):
+            result = {'name': resource.name, 'status': 'cancelled', 'duration': None, 'error': None}
+            if future.done() and not future.cancelled():
+                result['duration'] = duration
+                if future.exception() is None:
+                    result['status'] = 'prepared'
+                else:
+                    logging.warning('Preparation of resource %s of task %s failed: %s',
+                                    resource.name, self.task_id, future.exception())
+                    result.update(status='failed', error=str(future.exception()))
+            resources_prep.append(result)
+        return resources_prep
 
     def execute_task(self):
         task_info = self.backend.read_task_info(self.task_id)
         task_info.exec_stats.start_execution()
-        self.backend.write_task_info(self.task_id, task_info)
+        self._save_task_info(task_info)
         return_code = None
+        log_policy = task_info.structure.executor.log_policy
+        out_log = TaskLogWriter(self.executor.log_path('out'), log_policy)
+        err_log = TaskLogWriter(self.executor.log_path('err'), log_policy)
         try:
-            it = self.executor.start()
-            with open(os.path.join(self.executor.work_dir, 'stdout.log'), 'a') as out_file:
-                with open(os.path.join(self.executor.work_dir, 'stderr.log'), 'a') as err_file:
-                    for stdout, stderr in it:
-                        if stdout is not None:
-                            print(stdout, file=out_file)
-                        if stderr is not None:
-                            print(stderr, file=err_file)
+            for stdout, stderr in self.executor.start():
+                if stdout is not None:
+                    out_log.write_line(stdout)
+                if stderr is not None:
+                    err_log.write_line(stderr)
         except ExecutionEnded as ex:
             print('Execution ended! RetCode:', ex.retcode)
             return_code = ex.retcode
         except Exception as ex:
             print('Exception during task execution! Error: {}'.format(str(ex)))
-            with open(os.path.join(self.executor.work_dir, 'stderr.log'), 'a') as err_file:
-                print(traceback.format_exc(), file=err_file)
+            err_log.write_line(traceback.format_exc())
             return_code = -1
+        finally:
+            out_log.close()
+            err_log.close()
         task_info.exec_stats.finish_execution(retcode=return_code,
                                               is_initiated_by_user=self.user_stop.is_set())
-        self.backend.write_task_info(self.task_id, task_info)
+        self._save_task_info(task_info)
 
     def set_state(self, target_state: str) -> TaskState:
         state = self.backend.read_task_state(self.task_id)
         old_state_name = state.name
         old_state = state.change_state(new_state=target_state, force=False)  # check for validness of state change
         if old_state_name != target_state:
-            if old_state_name == TaskState.idle and target_state == TaskState.preparing:
+            if old_state_name in (TaskState.idle, TaskState.queued) and target_state == TaskState.preparing:
                 self.start()
             elif target_state == TaskState.stopped:
                 self.user_stop.set()
@@ -93,25 +156,127 @@ class TaskExecution(Thread):
 
 
 class Engine:
-    def __init__(self, backend: WorkerBackend, resources: Resources, executors: Executors) -> None:
-        self.tasks = dict()
+    """Runs at most max_running_tasks task executions at once, other started tasks wait in queue.
+    Executions are forgotten as soon as they end, their results are kept only in backend.
+    Queue is kept only in memory, so tasks left in queued state by previous run of worker are queued again on start.
+    """
+
+    def __init__(self, backend: WorkerBackend, resources: Resources, executors: Executors,
+                 notifier: TaskStateNotifier, config: ExecutionPoolConfig) -> None:
+        self.tasks = dict()  # type: Dict[str, TaskExecution]  # both queued and running ones
         self.backend = backend
         self.resources = resources
         self.executors = executors
+        self.notifier = notifier
+        self.config = config
+        self._running = set()
+        self._queue = []  # heap of (-priority, sequence number, task_id), stopped tasks are skipped on pop
+        self._sequence = itertools.count()
+        self._lock = Lock()
+        self._readmit_queued_tasks()
 
-    def create_idle_task(self, task_id: str, task_struct: dict):
+    def _new_execution(self, task_id: str) -> TaskExecution:
+        return TaskExecution(task_id, self.backend, self.resources, self.executors, self.notifier,
+                             self._on_execution_done, self.config.max_parallel_resources)
+
+    def _readmit_queued_tasks(self):
+        """Queues tasks again in order of their priority, as their original order of start requests is lost.
+        Queued tasks have not started preparation, so their dirs keep only files of executor and are created anew.
+        Tasks, which can not be queued again, are marked as failed on preparation.
+        """
+        queued_tasks = [(task_id, task_info) for task_id, task_info in self.backend.list_tasks(with_info=True)
+                        if task_info.exec_stats.state.name == TaskState.queued]
+        if self.config.queue_order == 'priority':
+            queued_tasks.sort(key=lambda _: -_[1].structure.priority)
+        with self._lock:
+            for task_id, task_info in queued_tasks:
+                try:
+                    shutil.rmtree(os.path.join(self.executors.execution_data_root, task_id), ignore_errors=True)
+                    self._admit(self._new_execution(task_id), task_info)
+                except Exception as ex:
+                    logging.exception('Failed to queue task %s again: %s', task_id, ex)
+                    self._fail_preparation(task_id, str(ex), task_info)
+
+    def _fail_preparation(self, task_id: str, prep_msg: str, task_info: 'Optional[TaskInfo]' = None):
+        """Marks queued task, which can not be started, as failed on preparation"""
+        if task_info is None:
+            task_info = self.backend.read_task_info(task_id)
+        task_info.exec_stats.start_preparation()
+        task_info.exec_stats.finish_preparation(success=False, prep_msg=prep_msg)
+        self.backend.write_task_info(task_id, task_info)
+        self.notifier.notify(task_info)
+
+    def create_idle_task(self, task_id: str, task_struct: dict, notify_url: str = None):
         return self.backend.write_task_info(task_id, TaskInfo.create({
             'task_id': task_id,
+            'notify_url': notify_url,
             'structure': task_struct
         }))
 
     def set_task_state(self, task_id: str, state: str) -> str:
-        if task_id not in self.tasks:
+        with self._lock:
+            if task_id in self._running:
+                return self.tasks[task_id].set_state(state).name
             task_info = self.backend.read_task_info(task_id)
-            old_state = task_info.exec_stats.state.change_state(state)  # check state transition validity
-            if state != TaskState.preparing:  # check if we need to create run a task
-                self.backend.write_task_info(task_id, task_info)
+            if state == TaskState.preparing:  # state is changed by execution itself, only check transition validity
+                old_state = TaskState(task_info.exec_stats.state.name).change_state(state)
+                if task_id not in self.tasks and old_state.name in (TaskState.idle, TaskState.queued):
+                    self._admit(self._new_execution(task_id), task_info)
                 return old_state.name
-            # TODO: remove non-running tasks from self.tasks
-            self.tasks[task_id] = TaskExecution(task_id, self.backend, self.resources, self.executors)
-        return self.tasks[task_id].set_state(state).name
+            old_state = task_info.exec_stats.state.change_state(state)  # check state transition validity
+            if task_info.exec_stats.state.is_terminal:
+                task_info.exec_stats.finish_time.set_to_now()  # age of stopped task is counted from it by retention
+            self.tasks.pop(task_id, None)  # task is stopped while waiting in queue
+            self.backend.write_task_info(task_id, task_info)
+            self.notifier.notify(task_info)
+            return old_state.name
+
+    def is_queued(self, task_id: str) -> bool:
+        with self._lock:
+            return task_id in self.tasks and task_id not in self._running
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'running': len(self._running),
+                'queued': len(self.tasks) - len(self._running),
+                'max_running_tasks': self.config.max_running_tasks,
+            }
+
+    def _admit(self, execution: TaskExecution, task_info: TaskInfo):
+        self.tasks[execution.task_id] = execution
+        if len(self._running) < self.config.max_running_tasks:
+            self._start(execution)
+            return
+        priority = task_info.structure.priority if self.config.queue_order == 'priority' else 0
+        heapq.heappush(self._queue, (-priority, next(self._sequence), execution.task_id))
+        task_info.exec_stats.enqueue()
+        self.backend.write_task_info(execution.task_id, task_info)
+        self.notifier.notify(task_info)
+
+    def _start(self, execution: TaskExecution):
+        self._running.add(execution.task_id)
+        execution.set_state(TaskState.preparing)
+
+    def _on_execution_done(self, task_id: str):
+        """Frees slot of finished execution and starts queued tasks in it.
+        Task, which fails to start, is failed on preparation and does not hold the slot.
+        """
+        with self._lock:
+            self.tasks.pop(task_id, None)
+            self._running.discard(task_id)
+            while self._queue and len(self._running) < self.config.max_running_tasks:
+                _, _, queued_task_id = heapq.heappop(self._queue)
+                execution = self.tasks.get(queued_task_id)
+                if execution is None or queued_task_id in self._running:
+                    continue
+                try:
+                    self._start(execution)
+                except Exception as ex:
+                    logging.exception('Failed to start queued task %s: %s', queued_task_id, ex)
+                    self.tasks.pop(queued_task_id, None)
+                    self._running.discard(queued_task_id)
+                    try:
+                        self._fail_preparation(queued_task_id, str(ex))
+                    except Exception as write_ex:
+                        logging.exception('Failed to save failure of task %s: %s', queued_task_id, write_ex)
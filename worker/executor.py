@@ -32,6 +32,10 @@ class Executor(PluginBase, metaclass=abc.ABCMeta):
     def work_dir(self) -> str:
         return path.join(self.execution_data_root, self.execution_id)
 
+    def log_path(self, log_type: str) -> str:
+        """:returns path to log of given type (out or err), which is filled with output of execution"""
+        return path.join(self.work_dir, 'std{}.log'.format(log_type))
+
     @classmethod
     @abc.abstractmethod
     def config_class(cls) -> Config:
@@ -39,6 +43,9 @@ class Executor(PluginBase, metaclass=abc.ABCMeta):
 
     @abc.abstractmethod
     def start(self) -> Iterable[Tuple[Optional[str], Optional[str]]]:
+        """:returns iterable over pairs of stdout and stderr lines, which are appended to logs by worker.
+        Executor, which writes its logs itself, may return no lines at all.
+        """
         return ()
 
     @abc.abstractmethod
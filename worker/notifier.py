@@ -0,0 +1,83 @@
+import logging
+import time
+from threading import Thread, Event, Lock
+from typing import Dict
+
+import requests
+
+from common.models.task import TaskInfo
+
+
+class TaskStateNotifier(Thread):
+    """Pushes task state changes to the master.
+    Changes are collected during batch_window and sent as one request per notify url. If a request fails,
+    it is retried with exponential backoff. While waiting, newer state of a task replaces the older one.
+    """
+
+    def __init__(self, batch_window: float = 0.05, max_retry_delay: float = 30.0, max_attempts: int = 10):
+        super().__init__(name='dedalus-worker-notifier', daemon=True)
+        self.batch_window = batch_window
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self._pending = dict()  # type: Dict[str, Dict[str, str]]
+        self._attempts = dict()  # type: Dict[str, int]
+        self._retry_at = dict()  # type: Dict[str, float]
+        self._lock = Lock()
+        self._wakeup = Event()
+        self._stopped = Event()
+        self.start()
+
+    def notify(self, task_info: TaskInfo):
+        if not task_info.notify_url:
+            return
+        with self._lock:
+            self._pending.setdefault(task_info.notify_url, dict())[task_info.task_id] = \
+                task_info.exec_stats.state.name
+            self._wakeup.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                self._wakeup.clear()
+                retry_times = [self._retry_at.get(url, 0) for url in self._pending]
+            now = time.time()
+            if not retry_times or min(retry_times) > now:
+                self._wakeup.wait(min(retry_times) - now if retry_times else None)
+                continue
+            self._stopped.wait(self.batch_window)  # collect more changes into the batch
+            now = time.time()
+            with self._lock:
+                batches = {
+                    url: self._pending.pop(url)
+                    for url in list(self._pending) if self._retry_at.get(url, 0) <= now
+                }
+            for url, states in batches.items():
+                self._send(url, states)
+
+    def _send(self, url: str, states: Dict[str, str]):
+        try:
+            response = requests.post(url, json={
+                'events': [{'task_id': task_id, 'state': state} for task_id, state in states.items()]
+            }, timeout=10)
+            response.raise_for_status()
+        except Exception as ex:
+            with self._lock:
+                attempts = self._attempts.get(url, 0) + 1
+                if attempts >= self.max_attempts:
+                    logging.warning('Giving up pushing %d task states to %s: %s', len(states), url, ex)
+                    self._attempts.pop(url, None)
+                    self._retry_at.pop(url, None)
+                    return
+                logging.debug('Failed to push task states to %s (attempt %d): %s', url, attempts, ex)
+                self._attempts[url] = attempts
+                self._retry_at[url] = time.time() + min(self.max_retry_delay, self.batch_window * 2 ** attempts)
+                states.update(self._pending.get(url, dict()))
+                self._pending[url] = states
+            return
+        with self._lock:
+            self._attempts.pop(url, None)
+            self._retry_at.pop(url, None)
+
+    def shutdown(self):
+        self._stopped.set()
+        self._wakeup.set()
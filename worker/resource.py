@@ -1,6 +1,7 @@
 import abc
 
 from common.models.resource import ResourceInfo
+from worker.resource_cache import ResourceCache
 from util.config import Config
 from util.plugins import PluginBase, PluginsMaster
 
@@ -15,8 +16,9 @@ class ResourceNonInstallableError(Exception):
 
 
 class Resource(PluginBase, metaclass=abc.ABCMeta):
-    def __init__(self, config: dict = None, **kwargs) -> None:
+    def __init__(self, config: dict = None, cache: ResourceCache = None, **kwargs) -> None:
         assert config is None or not kwargs, 'Only one of config and kwargs should be set'
+        self.cache = cache
         self.config = self.config_class()
         self.config.from_json(kwargs if config is None else config)
         self.config.verify()
@@ -48,5 +50,9 @@ class Resource(PluginBase, metaclass=abc.ABCMeta):
 class Resources(PluginsMaster):
     plugin_base_class = Resource
 
+    def __init__(self, plugins_folder: str = None, cache: ResourceCache = None):
+        super().__init__(plugins_folder)
+        self.cache = cache
+
     def construct_resource(self, resource_info: ResourceInfo) -> Resource:
-        return self.find_plugin(resource_info.name, resource_info.min_version)(resource_info.config)
\ No newline at end of file
+        return self.find_plugin(resource_info.name, resource_info.min_version)(resource_info.config, cache=self.cache)
@@ -0,0 +1,254 @@
+import errno
+import fcntl
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, List, Optional
+
+from util.config import Config, ConfigField
+from util.filehash import get_content_sha256
+
+FICLONE = 0x40049409  # linux ioctl, which makes copy-on-write clone of a file
+
+
+class ResourceCacheConfig(Config):
+    # Dir to keep cached resource files in, cache is disabled if it is not set.
+    # It should be on the same filesystem as execution_data_root, so cached files can be reflinked or hardlinked
+    # into tasks
+    cache_dir = ConfigField(type=str, required=False, default=None)
+    # Max total size of cached files in bytes, least recently used ones are evicted first
+    max_size = ConfigField(type=int, required=True, default=10 << 30)
+
+    def verify(self):
+        super().verify()
+        assert self.max_size > 0, '{}: max_size should be positive'.format(self.path_to_node)
+
+
+class ResourceCache:
+    """Worker-wide cache of resource files, keyed by content hash or by url and version.
+    Every key is fetched once even by concurrent tasks, fetched file is published into cache by atomic rename
+    and is materialized at task's path as a reflink (or hardlink, or copy, if it is not possible).
+    Hardlinked files are shared with tasks, which can modify them despite read-only mode (e.g. if run by root),
+    so every entry is stored with sha256 of its content in its name. Size and mtime of entry are remembered on every
+    use and content is checked against sha256 only if they have changed since then (or on the first use after
+    worker restart).
+    """
+
+    def __init__(self, config: ResourceCacheConfig) -> None:
+        self.config = config
+        self.entries_dir = os.path.join(config.cache_dir, 'entries')
+        self.tmp_dir = os.path.join(config.cache_dir, 'tmp')
+        os.makedirs(self.entries_dir, exist_ok=True)
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)  # leftovers of interrupted fetches
+        os.makedirs(self.tmp_dir)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.corruptions = 0
+        self._lock = Lock()
+        # entry name -> [lock, number of its users], lock exists only while somebody uses the entry
+        self._key_locks = dict()  # type: Dict[str, List]
+        # entry name -> (size, sha256 of content, mtime in ns at last use or None), least recently used first
+        self._entries = OrderedDict()
+        self._size = 0
+        self._load_entries()
+
+    @staticmethod
+    def content_key(sha256: str) -> str:
+        return 'sha256:{}'.format(sha256.lower())
+
+    @staticmethod
+    def url_key(url: str, version: Optional[str] = None) -> str:
+        return 'url:{}\n{}'.format(url, version or '')
+
+    @staticmethod
+    def _entry_name(key: str) -> str:
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def _entry_path(self, entry_name: str, sha256: str) -> str:
+        return os.path.join(self.entries_dir, '{}.{}'.format(entry_name, sha256))
+
+    def _load_entries(self):
+        entries = []
+        for file_name in os.listdir(self.entries_dir):
+            entry_name, _, sha256 = file_name.partition('.')
+            stat = os.stat(os.path.join(self.entries_dir, file_name))
+            entries.append((stat.st_mtime, entry_name, stat.st_size, sha256))
+        for _, entry_name, size, sha256 in sorted(entries):
+            self._entries[entry_name] = (size, sha256, None)  # they could be changed while worker was not running
+            self._size += size
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'size': self._size,
+                'max_size': self.config.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'corruptions': self.corruptions,
+            }
+
+    def materialize(self, key: str, fetch: 'Callable[[str], None]', target_path: str):
+        """Places cached file of key at target_path. If key is not cached yet, fetch is called first
+        with path to download file to.
+        """
+        entry_name = self._entry_name(key)
+        with self._key_lock(entry_name):
+            with self._lock:
+                entry = self._entries.get(entry_name)
+            entry_path = None if entry is None else self._entry_path(entry_name, entry[1])
+            if entry_path is not None and not self._is_intact(entry_path, *entry):
+                logging.warning('Cached file %s of %r was modified, it is fetched again', entry_path, key)
+                self._remove_entry(entry_name)
+                with self._lock:
+                    self.corruptions += 1
+                entry_path = None
+            if entry_path is None:
+                entry_path = self._fetch(entry_name, fetch)
+            else:
+                os.utime(entry_path)  # mtime keeps order of use between worker restarts
+                mtime_ns = os.stat(entry_path).st_mtime_ns
+                with self._lock:
+                    self.hits += 1
+                    self._entries[entry_name] = entry[:2] + (mtime_ns,)
+                    self._entries.move_to_end(entry_name)
+            self._place(entry_path, target_path)
+
+    @staticmethod
+    def _is_intact(entry_path: str, size: int, sha256: str, mtime_ns: 'Optional[int]') -> bool:
+        """Content is hashed only if size or mtime of entry differ from the ones of its last use"""
+        try:
+            stat = os.stat(entry_path)
+        except FileNotFoundError:
+            return False
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            return True
+        return get_content_sha256(entry_path) == sha256
+
+    def _acquire_key_lock(self, entry_name: str, blocking: bool = True) -> 'Optional[List]':
+        """Per entry lock, so fetches of different keys never wait for each other
+        :returns lock record for _release_key_lock or None, if not blocking and entry is used by somebody else
+        """
+        with self._lock:
+            key_lock = self._key_locks.get(entry_name)
+            if key_lock is None:
+                key_lock = self._key_locks[entry_name] = [Lock(), 0]
+            elif not blocking:
+                return None
+            key_lock[1] += 1
+        key_lock[0].acquire()
+        return key_lock
+
+    def _release_key_lock(self, entry_name: str, key_lock: 'List'):
+        key_lock[0].release()
+        with self._lock:
+            key_lock[1] -= 1
+            if not key_lock[1]:
+                del self._key_locks[entry_name]
+
+    @contextmanager
+    def _key_lock(self, entry_name: str):
+        key_lock = self._acquire_key_lock(entry_name)
+        try:
+            yield
+        finally:
+            self._release_key_lock(entry_name, key_lock)
+
+    def _fetch(self, entry_name: str, fetch: 'Callable[[str], None]') -> str:
+        """:returns path of published entry"""
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        os.close(fd)
+        try:
+            fetch(tmp_path)
+            os.chmod(tmp_path, 0o444)
+            sha256 = get_content_sha256(tmp_path)
+            entry_path = self._entry_path(entry_name, sha256)
+            os.rename(tmp_path, entry_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        stat = os.stat(entry_path)
+        with self._lock:
+            self.misses += 1
+            self._entries[entry_name] = (stat.st_size, sha256, stat.st_mtime_ns)
+            self._size += stat.st_size
+        self._evict(keep=entry_name)
+        return entry_path
+
+    def _remove_entry(self, entry_name: str):
+        """Removes entry, its key lock should be held"""
+        with self._lock:
+            size, sha256, _ = self._entries.pop(entry_name)
+            self._size -= size
+        try:
+            os.remove(self._entry_path(entry_name, sha256))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self, keep: str):
+        """Removes least recently used entries, until cache fits into max_size.
+        Entries locked by other tasks right now are skipped.
+        """
+        with self._lock:
+            victims = []
+            size = self._size
+            for entry_name, (entry_size, _, _) in self._entries.items():
+                if size <= self.config.max_size:
+                    break
+                if entry_name != keep:
+                    victims.append(entry_name)
+                    size -= entry_size
+        for entry_name in victims:
+            key_lock = self._acquire_key_lock(entry_name, blocking=False)
+            if key_lock is None:
+                continue
+            try:
+                if entry_name in self._entries:  # it could be removed as corrupted before lock was taken
+                    self._remove_entry(entry_name)
+                    with self._lock:
+                        self.evictions += 1
+            finally:
+                self._release_key_lock(entry_name, key_lock)
+
+    @staticmethod
+    def _place(entry_path: str, target_path: str):
+        target_dir = os.path.dirname(os.path.abspath(target_path))
+        os.makedirs(target_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, prefix='.dedalus-')
+        os.close(fd)
+        os.remove(tmp_path)
+        try:
+            if not ResourceCache._reflink(entry_path, tmp_path):
+                try:
+                    os.link(entry_path, tmp_path)
+                except OSError as ex:
+                    if ex.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                        raise
+                    shutil.copyfile(entry_path, tmp_path)
+            os.rename(tmp_path, target_path)
+        except BaseException:
+            if os.path.lexists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    @staticmethod
+    def _reflink(src_path: str, dst_path: str) -> bool:
+        """Makes copy-on-write clone of src_path, which is not shared with cache on modification
+        :returns false, if filesystem does not support it
+        """
+        with open(src_path, 'rb') as src_file, open(dst_path, 'wb') as dst_file:
+            try:
+                fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+                return True
+            except OSError as ex:
+                logging.debug('Reflink of %s is not possible: %s', src_path, ex)
+        os.remove(dst_path)
+        return False
@@ -0,0 +1,38 @@
+import os
+from typing import Iterable
+
+from common.retention import RetentionCandidate, RetentionConfig, RetentionService, remove_dir
+from worker.backend import WorkerBackend
+from worker.engine import Engine
+
+
+class TaskRetentionService(RetentionService):
+    """Removes tasks in terminal states together with their dirs in execution data root"""
+    archive_name = 'tasks'
+
+    def __init__(self, backend: WorkerBackend, engine: Engine, execution_data_root: str,
+                 config: RetentionConfig) -> None:
+        self.backend = backend
+        self.engine = engine
+        self.execution_data_root = execution_data_root
+        super().__init__(config, name='dedalus-worker-retention')
+
+    def _list_candidates(self) -> 'Iterable[RetentionCandidate]':
+        for task_id, task_info in self.backend.list_tasks(with_info=True):
+            exec_stats = task_info.exec_stats
+            if not exec_stats.state.is_terminal:
+                continue
+            if task_id in self.engine.tasks:
+                continue  # task can be finished, but its execution can still be not reaped by engine
+            finish_time = exec_stats.finish_time.to_json() or exec_stats.prep_finish_time.to_json()
+            yield RetentionCandidate(task_id, '', finish_time, exec_stats.state.is_failed)
+
+    def _read_record(self, record_id: str) -> dict:
+        return self.backend.read_task_info(record_id).to_json()
+
+    def _remove(self, record_id: str) -> int:
+        self.backend.delete_task_info(record_id)
+        return remove_dir(os.path.join(self.execution_data_root, record_id))
+
+    def _compact(self) -> int:
+        return self.backend.compact()
@@ -0,0 +1,322 @@
+"""Task log is stored as std{out,err}.log, which is the active segment appended to by worker.
+If log policy splits log into segments, finished segments are renamed to std{out,err}.log.<offset of segment in log>
+and can be compressed (.gz suffix). Dropped segments leave a gap in offsets, which is skipped by readers.
+"""
+import gzip
+import os
+import struct
+from collections import deque
+from typing import BinaryIO, List, NamedTuple, Optional
+
+from common.models.executor import LogPolicy
+
+# Max number of bytes returned by one ranged read, so memory used by a log request does not depend on log size
+MAX_READ_SIZE = 1 << 20
+STREAM_CHUNK_SIZE = 64 << 10
+GZIP_LEVEL = 6
+
+# Decoded data of log from offset till next_offset and size of the whole log at the moment of reading
+LogChunk = NamedTuple('LogChunk', [('data', str), ('offset', int), ('next_offset', int), ('size', int)])
+# Part of log stored in one file, size is the size of uncompressed data
+LogSegment = NamedTuple('LogSegment', [('offset', int), ('size', int), ('path', str), ('compressed', bool)])
+
+
+def task_log_path(execution_data_root: str, task_id: str, log_type: str) -> str:
+    return os.path.join(execution_data_root, task_id, 'std{}.log'.format(log_type))
+
+
+def _gzip_data_size(path: str) -> int:
+    """:returns size of uncompressed data stored in gzip trailer (modulo 4 GiB)"""
+    with open(path, 'rb') as gz_file:
+        gz_file.seek(-4, os.SEEK_END)
+        return struct.unpack('<I', gz_file.read(4))[0]
+
+
+def list_segments(path: str) -> 'List[LogSegment]':
+    """:returns all existing segments of log ordered by offset, the active one (if it exists) is the last"""
+    log_dir, log_name = os.path.split(path)
+    prefix = log_name + '.'
+    paths = {}
+    try:
+        file_names = os.listdir(log_dir)
+    except FileNotFoundError:
+        return []
+    for file_name in file_names:
+        if not file_name.startswith(prefix):
+            continue
+        suffix = file_name[len(prefix):]
+        compressed = suffix.endswith('.gz')
+        suffix = suffix[:-len('.gz')] if compressed else suffix
+        if suffix.isdigit() and (compressed or int(suffix) not in paths):  # compressed copy is complete, if exists
+            paths[int(suffix)] = (os.path.join(log_dir, file_name), compressed)
+    segments = []
+    for offset, (segment_path, compressed) in sorted(paths.items()):
+        try:
+            size = _gzip_data_size(segment_path) if compressed else os.path.getsize(segment_path)
+        except OSError:
+            continue  # segment is compressed or dropped right now
+        segments.append(LogSegment(offset, size, segment_path, compressed))
+    try:
+        active_offset = segments[-1].offset + segments[-1].size if segments else 0
+        segments.append(LogSegment(active_offset, os.path.getsize(path), path, False))
+    except FileNotFoundError:
+        pass
+    return segments
+
+
+def _cut_to_utf8_boundary(data: bytes) -> bytes:
+    """Drops incomplete utf-8 sequence from the end of data, so it can be decoded and continued from its end"""
+    for back in range(1, min(4, len(data)) + 1):
+        byte = data[-back]
+        if byte < 0x80:
+            return data
+        if byte >= 0xC0:  # first byte of a sequence
+            length = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return data if length <= back else data[:-back]
+    return data
+
+
+class TaskLogReader:
+    """Reads all segments of log as one file. Log can be appended to and rotated while it is read.
+    Data of dropped segments is skipped, so position can jump forward on read.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._segments = list_segments(path)
+        if not self._segments:
+            raise FileNotFoundError('Log {} is not found'.format(path))
+        self._offset = 0
+        self._file = None  # type: BinaryIO
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @property
+    def segments(self) -> 'List[LogSegment]':
+        """:returns segments of log, as they were listed last time"""
+        return self._segments
+
+    @property
+    def size(self) -> int:
+        """:returns size of log, when segments were listed last time"""
+        return self._segments[-1].offset + self._segments[-1].size
+
+    def tell(self) -> int:
+        return self._offset
+
+    def _refresh(self):
+        self._segments = list_segments(self.path) or self._segments
+
+    def _find_segment(self, offset: int) -> Optional[LogSegment]:
+        for segment in self._segments:
+            if offset < segment.offset + segment.size:
+                return segment
+        return None
+
+    def seek(self, offset: int) -> int:
+        """Moves to offset (negative one is counted from the end of log) or to the start of the next segment,
+        if data at offset is dropped.
+        :returns new position
+        """
+        self.close()
+        self._refresh()
+        offset = max(self.size + offset, 0) if offset < 0 else min(offset, self.size)
+        segment = self._find_segment(offset)
+        self._offset = offset if segment is None else max(offset, segment.offset)
+        return self._offset
+
+    def _open_segment(self) -> bool:
+        """:returns false, if there is no data at current position"""
+        segment = self._find_segment(self._offset)
+        if segment is None:
+            return False
+        try:
+            self._file = gzip.open(segment.path, 'rb') if segment.compressed else open(segment.path, 'rb')
+        except FileNotFoundError:  # segment is rotated or dropped, so it is looked up again on the next try
+            self._refresh()
+            return True
+        self._offset = max(self._offset, segment.offset)
+        self._file.seek(self._offset - segment.offset)
+        return True
+
+    def read(self, size: int = STREAM_CHUNK_SIZE) -> bytes:
+        """:returns at most size bytes of one segment from current position, empty bytes at the end of log"""
+        for _ in range(len(self._segments) + 3):
+            if self._file is None:
+                if self._find_segment(self._offset) is None:
+                    self._refresh()  # log could grow since segments were listed
+                if not self._open_segment():
+                    return b''
+                if self._file is None:
+                    continue
+            data = self._file.read(size)
+            if data:
+                self._offset += len(data)
+                return data
+            # end of segment is reached, but more data could be appended to it or to the next one since then
+            self.close()
+            self._refresh()
+            if self._find_segment(self._offset) is None:
+                return b''
+        return b''
+
+    def find_tail_offset(self, lines: int) -> int:
+        """:returns offset of the last lines of log, but not farther than MAX_READ_SIZE bytes from its end"""
+        size = self.size
+        start = self.seek(max(size - MAX_READ_SIZE, 0))
+        if lines <= 0:
+            return size
+        newlines = deque(maxlen=lines + 1)
+        while self._offset < size:
+            data = self.read(min(STREAM_CHUNK_SIZE, size - self._offset))
+            if not data:
+                break
+            data_offset = self._offset - len(data)
+            pos = data.find(b'\n')
+            while pos >= 0:
+                newlines.append(data_offset + pos)
+                pos = data.find(b'\n', pos + 1)
+        if newlines and newlines[-1] == size - 1:
+            newlines.pop()  # line feed in the last byte ends the last line
+        return newlines[-lines] + 1 if len(newlines) >= lines else start
+
+    def read_chunk(self, limit: Optional[int] = None) -> LogChunk:
+        """Reads at most limit (and at most MAX_READ_SIZE) bytes from current position"""
+        limit = MAX_READ_SIZE if limit is None else min(limit, MAX_READ_SIZE)
+        start = self._offset
+        parts = []
+        while limit > 0:
+            data = self.read(min(STREAM_CHUNK_SIZE, limit))
+            if not data:
+                break
+            if not parts:
+                start = self._offset - len(data)
+            parts.append(data)
+            limit -= len(data)
+        data = b''.join(parts)
+        if self._offset < self.size:
+            cut_data = _cut_to_utf8_boundary(data)
+            if len(cut_data) < len(data):
+                self.seek(self._offset - (len(data) - len(cut_data)))
+                data = cut_data
+        return LogChunk(data.decode(errors='replace'), start, self._offset, self.size)
+
+
+def read_range(path: str, offset: int = 0, limit: Optional[int] = None) -> LogChunk:
+    """Reads at most limit (and at most MAX_READ_SIZE) bytes of log starting from offset.
+    Negative offset is counted from the end of log.
+    """
+    with TaskLogReader(path) as reader:
+        reader.seek(offset)
+        return reader.read_chunk(limit)
+
+
+def read_tail_lines(path: str, lines: int) -> LogChunk:
+    """Reads last lines of log, but not more than MAX_READ_SIZE bytes of them"""
+    with TaskLogReader(path) as reader:
+        reader.seek(reader.find_tail_offset(lines))
+        return reader.read_chunk()
+
+
+def _copy(src: BinaryIO, dst: BinaryIO, size: int):
+    while size > 0:
+        data = src.read(min(STREAM_CHUNK_SIZE, size))
+        if not data:
+            break
+        dst.write(data)
+        size -= len(data)
+
+
+class TaskLogWriter:
+    """Appends data to the active segment of log, rotating, compressing and dropping segments according to policy.
+    Data appended to log file by others (like executors, which redirect output to it) is split into segments on close.
+    """
+
+    def __init__(self, path: str, policy: LogPolicy) -> None:
+        self.path = path
+        self.policy = policy
+        finished_segments = [_ for _ in list_segments(path) if _.path != path]
+        self._active_offset = finished_segments[-1].offset + finished_segments[-1].size if finished_segments else 0
+        self._file = open(path, 'ab')
+        self._active_size = self._file.tell()
+
+    def write(self, data: bytes):
+        segment_size = self.policy.segment_size
+        while data:
+            part = data[:segment_size - self._active_size] if segment_size else data
+            self._file.write(part)
+            self._active_size += len(part)
+            data = data[len(part):]
+            if segment_size and self._active_size >= segment_size:
+                self._rotate()
+
+    def write_line(self, line: str):
+        self.write('{}\n'.format(line).encode(errors='replace'))
+
+    def close(self):
+        """Finishes the active segment, if log is split into segments or compressed"""
+        self._file.close()
+        if not self.policy.segment_size and not self.policy.compress:
+            return
+        size = os.path.getsize(self.path)
+        if self.policy.segment_size and size > self.policy.segment_size:
+            with open(self.path, 'rb') as log_file:
+                for offset in range(0, size, self.policy.segment_size):
+                    self._write_segment(log_file, self._active_offset + offset, self.policy.segment_size)
+            os.remove(self.path)
+            self._drop_segments()
+        elif size:
+            self._active_size = size
+            self._rotate(reopen=False)
+        elif self._active_offset:
+            os.remove(self.path)  # empty log is kept only if there are no other segments
+
+    def _segment_path(self, offset: int) -> str:
+        return '{}.{}'.format(self.path, offset)
+
+    def _write_segment(self, log_file: BinaryIO, offset: int, size: int):
+        """Copies size bytes from current position of log_file to a new finished segment"""
+        segment_path = self._segment_path(offset)
+        if self.policy.compress:
+            with gzip.open(segment_path + '.gz.tmp', 'wb', compresslevel=GZIP_LEVEL) as segment_file:
+                _copy(log_file, segment_file, size)
+            os.rename(segment_path + '.gz.tmp', segment_path + '.gz')
+        else:
+            with open(segment_path, 'wb') as segment_file:
+                _copy(log_file, segment_file, size)
+
+    def _rotate(self, reopen: bool = True):
+        self._file.close()
+        segment_path = self._segment_path(self._active_offset)
+        os.rename(self.path, segment_path)
+        if self.policy.compress:
+            with open(segment_path, 'rb') as segment_file:
+                self._write_segment(segment_file, self._active_offset, self._active_size)
+            os.remove(segment_path)
+        self._active_offset += self._active_size
+        self._active_size = 0
+        self._drop_segments()
+        if reopen:
+            self._file = open(self.path, 'ab')
+
+    def _drop_segments(self):
+        if not self.policy.max_size:
+            return
+        segments = list_segments(self.path)
+        size = sum(_.size for _ in segments)
+        for segment in segments:
+            if size <= self.policy.max_size or segment.path == self.path:
+                break
+            if segment.offset < self.policy.head_size:
+                continue
+            os.remove(segment.path)
+            size -= segment.size
@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+"""Measures wall time and worker CPU time of running a high-output shell task through worker engine
+with every capture mode of shell executor. CPU time of the task itself is not counted.
+"""
+import argparse
+import os
+import resource
+import tempfile
+import time
+from typing import Tuple
+
+from plugins.backends.leveldb_backend import WorkerLevelDBBackend
+from worker.config import ExecutionPoolConfig
+from worker.engine import Engine
+from worker.executor import Executors
+from worker.notifier import TaskStateNotifier
+from worker.resource import Resources
+
+SCRIPT = '''
+line=$(printf '%*s' {line_size} '' | tr ' ' x)
+yes "$line" | head -c {size}
+yes "$line" | head -c {err_size} >&2
+'''
+
+
+def run_task(engine: Engine, task_id: str, script: str, capture_mode: str) -> 'Tuple[float, float]':
+    """:returns wall time and worker CPU time of task in seconds"""
+    engine.create_idle_task(task_id, {
+        'executor': {'name': 'shell', 'config': {'shell_script': script, 'capture_mode': capture_mode}},
+    })
+    start_cpu = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.time()
+    engine.set_task_state(task_id, 'preparing')
+    while not engine.backend.read_task_state(task_id).is_terminal:
+        time.sleep(0.01)
+    wall_time = time.time() - start
+    end_cpu = resource.getrusage(resource.RUSAGE_SELF)
+    return wall_time, (end_cpu.ru_utime - start_cpu.ru_utime) + (end_cpu.ru_stime - start_cpu.ru_stime)
+
+
+def main(args):
+    root = tempfile.mkdtemp(prefix='dedalus-bench-')
+    backend = WorkerLevelDBBackend({'db_path': os.path.join(root, 'db')})
+    executors = Executors(os.path.join(root, 'tasks'), 'plugins/executors')
+    engine = Engine(backend, Resources('plugins/resources'), executors, TaskStateNotifier(), ExecutionPoolConfig())
+    script = SCRIPT.format(line_size=args.line_size, size=args.size_mb << 20, err_size=args.size_mb << 18)
+    print('{:>8} {:>10} {:>10} {:>10} {:>10}'.format('mode', 'log, MiB', 'wall, s', 'cpu, s', 'MiB/s'))
+    for capture_mode in args.modes:
+        for repeat in range(args.repeats):
+            task_id = '{}-{}'.format(capture_mode, repeat)
+            wall_time, cpu_time = run_task(engine, task_id, script, capture_mode)
+            log_size = sum(os.path.getsize(os.path.join(root, 'tasks', task_id, 'std{}.log'.format(_)))
+                           for _ in ('out', 'err'))
+            print('{:>8} {:>10.1f} {:>10.2f} {:>10.2f} {:>10.1f}'.format(
+                capture_mode, log_size / (1 << 20), wall_time, cpu_time, log_size / (1 << 20) / wall_time))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modes', help='Capture modes to compare', nargs='+', default=['lines', 'direct'])
+    parser.add_argument('--size-mb', help='Size of stdout of the task in MiB, stderr is 4 times smaller',
+                        default=64, type=int)
+    parser.add_argument('--line-size', help='Size of one output line in bytes', default=100, type=int)
+    parser.add_argument('--repeats', help='Number of runs of every mode', default=3, type=int)
+    main(parser.parse_args())
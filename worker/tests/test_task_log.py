@@ -0,0 +1,106 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from common.models.executor import LogPolicy
+from worker.task_log import TaskLogReader, TaskLogWriter, list_segments, read_range, read_tail_lines
+
+
+def make_data(size: int, start: int = 0) -> bytes:
+    return bytes(ord('a') + idx % 26 for idx in range(start, start + size))
+
+
+class TaskLogTest(unittest.TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.log_dir, 'stdout.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    def write_log(self, data: bytes, close: bool = True, **policy) -> TaskLogWriter:
+        writer = TaskLogWriter(self.path, LogPolicy.create(policy))
+        writer.write(data)
+        if close:
+            writer.close()
+        return writer
+
+    def read_all(self, reader: TaskLogReader) -> bytes:
+        parts = []
+        while True:
+            data = reader.read()
+            if not data:
+                return b''.join(parts)
+            parts.append(data)
+
+    def test_read_across_segments(self):
+        data = make_data(35)
+        self.write_log(data, segment_size=10)
+        self.assertEqual([(_.offset, _.size) for _ in list_segments(self.path)], [(0, 10), (10, 10), (20, 10), (30, 5)])
+        chunk = read_range(self.path, 5, 20)
+        self.assertEqual(chunk.data.encode(), data[5:25])
+        self.assertEqual((chunk.offset, chunk.next_offset, chunk.size), (5, 25, 35))
+        chunk = read_range(self.path, -7)
+        self.assertEqual(chunk.data.encode(), data[28:])
+
+    def test_read_across_compressed_segments(self):
+        data = make_data(35)
+        self.write_log(data, segment_size=10, compress=True)
+        segments = list_segments(self.path)
+        self.assertTrue(all(_.compressed for _ in segments))
+        self.assertEqual(segments[-1].offset + segments[-1].size, 35)
+        self.assertEqual(read_range(self.path).data.encode(), data)
+
+    def test_dropped_gap_is_skipped(self):
+        data = make_data(50)
+        self.write_log(data, segment_size=10, max_size=30, head_size=10)
+        self.assertEqual([_.offset for _ in list_segments(self.path)], [0, 30, 40])
+        chunk = read_range(self.path, 15, 10)
+        self.assertEqual(chunk.data.encode(), data[30:40])
+        self.assertEqual((chunk.offset, chunk.next_offset), (30, 40))
+        chunk = read_range(self.path)
+        self.assertEqual(chunk.data.encode(), data[:10] + data[30:])
+        self.assertEqual((chunk.offset, chunk.next_offset, chunk.size), (0, 50, 50))
+
+    def test_tail_crosses_compressed_segment(self):
+        lines = [make_data(6, idx) for idx in range(5)]
+        data = b''.join(_ + b'\n' for _ in lines)
+        self.write_log(data, segment_size=16, compress=True)
+        segments = list_segments(self.path)
+        self.assertEqual([(_.offset, _.compressed) for _ in segments], [(0, True), (16, True), (32, True)])
+        tail_offset = len(data) - 3 * 7
+        self.assertLess(tail_offset, segments[1].offset)
+        chunk = read_tail_lines(self.path, 3)
+        self.assertEqual(chunk.data.encode(), data[tail_offset:])
+        self.assertEqual(chunk.offset, tail_offset)
+
+    def test_tail_of_log_without_line_feed(self):
+        self.write_log(b'one\ntwo\nthree', segment_size=5)
+        self.assertEqual(read_tail_lines(self.path, 2).data, 'two\nthree')
+        self.assertEqual(read_tail_lines(self.path, 10).data, 'one\ntwo\nthree')
+
+    def test_rotation_during_follow(self):
+        # writes end at segment boundaries, so all written data is on disk without closing the writer
+        data = make_data(45)
+        writer = self.write_log(data[:10], close=False, segment_size=10, compress=True)
+        with TaskLogReader(self.path) as reader:
+            self.assertEqual(self.read_all(reader), data[:10])
+            writer.write(data[10:30])  # segments are rotated and compressed, while reader follows the log
+            self.assertEqual(self.read_all(reader), data[10:30])
+            writer.write(data[30:])
+            writer.close()
+            self.assertEqual(self.read_all(reader), data[30:])
+            self.assertEqual(reader.tell(), len(data))
+
+    def test_chunk_is_cut_at_utf8_boundary(self):
+        data = 'abфф'.encode()
+        self.write_log(data)
+        chunk = read_range(self.path, 0, 3)
+        self.assertEqual((chunk.data, chunk.next_offset), ('ab', 2))
+        chunk = read_range(self.path, chunk.next_offset)
+        self.assertEqual(chunk.data, 'фф')
+
+
+if __name__ == '__main__':
+    unittest.main()